@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import settings
+from ai.prompt_templates import PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+_UNIT_ALIASES = [
+    (re.compile(r'(?<=\d)\s*(?:m²|кв\.?\s*м|kv\.?\s*m|sq\.?\s*m|sqm|m2)\b'), 'm2'),
+    (re.compile(r'(?<=\d)\s*(?:metres?|meters?|metrs?|metr|метр[а-я]*|м)\b'), 'm'),
+    (re.compile(r'(?<=\d)\s*m\b'), 'm'),
+]
+_DIMENSION = re.compile(r'(\d)\s*(?:x|х|×|\*|by)\s*(\d)')
+_DECIMAL_COMMA = re.compile(r'(\d),(\d)')
+_TRAILING_ZEROS = re.compile(r'(\d+)\.0+\b')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def canonicalize_prompt(prompt: str) -> str:
+    """Normalize case, whitespace and units so equivalent requests share a key.
+
+    "15 X 25 metr" and "15x25m" end up identical.
+    """
+    text = prompt.lower()
+    text = _DECIMAL_COMMA.sub(r'\1.\2', text)
+    text = _TRAILING_ZEROS.sub(r'\1', text)
+    for pattern, unit in _UNIT_ALIASES:
+        text = pattern.sub(unit, text)
+    text = _DIMENSION.sub(r'\1x\2', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class LLMCache:
+    """Two-tier cache for parsed LLM responses: in-memory LRU over SQLite.
+
+    Entries expire after ``ttl`` seconds; the disk tier is trimmed to
+    ``max_entries`` by least-recent access.
+    """
+
+    def __init__(self, path: Path = None, ttl: float = None, max_entries: int = None,
+                 memory_entries: int = None):
+        self.path = Path(path or settings.LLM_CACHE_PATH)
+        self.ttl = ttl if ttl is not None else settings.LLM_CACHE_TTL
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.memory_entries = memory_entries or settings.LLM_CACHE_MEMORY_ENTRIES
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def key(self, prompt: str, model: str) -> str:
+        raw = f"{model}\0{PROMPT_VERSION}\0{canonicalize_prompt(prompt)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS llm_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache(accessed)')
+        return self._db
+
+    def _remember(self, key: str, expires: float, value: str):
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(entry[1])
+            self._memory.pop(key, None)
+
+            db = self._conn()
+            row = db.execute('SELECT value, expires FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    db.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                    db.commit()
+                self.misses += 1
+                return None
+            db.execute('UPDATE llm_cache SET accessed = ? WHERE key = ?', (now, key))
+            db.commit()
+            self._remember(key, row[1], row[0])
+            self.disk_hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        expires = now + self.ttl
+        payload = json.dumps(value, separators=(',', ':'))
+        with self._lock:
+            self._remember(key, expires, payload)
+            db = self._conn()
+            db.execute('INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)', (key, payload, expires, now))
+            db.execute('DELETE FROM llm_cache WHERE expires <= ?', (now,))
+            db.execute(
+                'DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            db.commit()
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+            db = self._conn()
+            if db.execute('DELETE FROM llm_cache WHERE key = ?', (key,)).rowcount:
+                self.invalidations += 1
+            db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.memory_hits + self.disk_hits,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'memory_entries': len(self._memory),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -1,41 +1,61 @@
 import os
 import json
+import asyncio
 import requests
+import aiohttp
 import logging
-from typing import Dict, Any
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
 from config import settings
+from ai.cache import LLMCache
+from ai.stream import RoomStream, StreamAborted
+from utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_ENDPOINT = 'https://api.groq.com/openai/v1/chat/completions'
+
+
 class LLMClient:
-    def __init__(self, provider: str = None, api_key: str = None, endpoint: str = None):
+    def __init__(self, provider: str = None, api_key: str = None, endpoint: str = None,
+                 model: str = None, max_concurrency: int = None,
+                 connect_timeout: float = None, read_timeout: float = None,
+                 cache: Optional[LLMCache] = None):
         self.provider = provider or settings.AI_PROVIDER
         self.api_key = api_key or settings.AI_API_KEY
         self.endpoint = endpoint or settings.AI_ENDPOINT
+        self.model = model or settings.AI_MODEL
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.connect_timeout = connect_timeout or settings.LLM_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or settings.LLM_READ_TIMEOUT
+        # Keep-alive sessions, created lazily (sync for scripts, async for the bot)
+        self._sync_session: Optional[requests.Session] = None
+        self._async_session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        if cache is None and settings.LLM_CACHE_ENABLED:
+            cache = LLMCache()
+        self.cache = cache
 
-    def parse_to_json(self, prompt: str) -> Dict[str, Any]:
-        # Log which provider is being used
-        if self.provider == 'mock' or not self.api_key:
-            logger.info("Using MOCK AI provider (Professional Template)")
-            return self._mock_response()
+    def _use_mock(self) -> bool:
+        return self.provider == 'mock' or not self.api_key
 
-        logger.info(f"Using REAL AI provider: {self.provider}")
-        # ... logic for real API ...
+    def _build_request(self, prompt: str, sampling: Optional[Dict[str, Any]] = None
+                       ) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
         headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         }
         payload = {
-            'model': 'llama-3.3-70b-versatile',
+            'model': self.model,
             'messages': [{'role': 'user', 'content': prompt}],
             'response_format': {'type': 'json_object'},
-            'max_completion_tokens': 1000
+            'max_completion_tokens': 1000,
+            **(sampling or {})
         }
-        endpoint = self.endpoint or 'https://api.groq.com/openai/v1/chat/completions'
-        resp = requests.post(endpoint, headers=headers, json=payload, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-        
+        return self.endpoint or DEFAULT_ENDPOINT, headers, payload
+
+    @staticmethod
+    def _extract_json(data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             content = data['choices'][0]['message']['content']
             return json.loads(content)
@@ -47,54 +67,312 @@ class LLMClient:
                 return json.loads(text[start:end+1])
             raise
 
+    def parse_to_json(self, prompt: str) -> Dict[str, Any]:
+        """Blocking call, kept for scripts and tools outside the event loop."""
+        # Log which provider is being used
+        if self._use_mock():
+            logger.info("Using MOCK AI provider (Professional Template)")
+            return self._mock_response()
+
+        cached = self._cache_get(prompt)
+        if cached is not None:
+            return cached
+
+        logger.info(f"Using REAL AI provider: {self.provider}")
+        if self._sync_session is None:
+            self._sync_session = requests.Session()
+        endpoint, headers, payload = self._build_request(prompt)
+        resp = self._sync_session.post(endpoint, headers=headers, json=payload,
+                                       timeout=(self.connect_timeout, self.read_timeout))
+        resp.raise_for_status()
+        parsed = self._extract_json(resp.json())
+        self._cache_set(prompt, parsed)
+        return parsed
+
+    async def aparse_to_json(self, prompt: str, sampling: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Non-blocking variant used by the bot handlers.
+
+        ``sampling`` (e.g. ``{'temperature': 0.9, 'seed': 2}``) is sent with the
+        request and kept apart in the cache, so layout variants differ.
+        """
+        if self._use_mock():
+            logger.info("Using MOCK AI provider (Professional Template)")
+            return self._mock_response()
+
+        cached = await self._acache_get(prompt, sampling)
+        if cached is not None:
+            metrics.observe('llm_request_seconds', 0, provider=self.provider, outcome='cache')
+            return cached
+
+        logger.info(f"Using REAL AI provider: {self.provider} (async)")
+        session = self._get_async_session()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        endpoint, headers, payload = self._build_request(prompt, sampling)
+        t0 = time.perf_counter()
+        outcome = 'error'
+        metrics.inc('llm_in_flight')
+        try:
+            async with self._semaphore:
+                async with session.post(endpoint, headers=headers, json=payload) as resp:
+                    resp.raise_for_status()
+                    data = await resp.json(content_type=None)
+            parsed = self._extract_json(data)
+            outcome = 'ok'
+        finally:
+            metrics.dec('llm_in_flight')
+            metrics.observe('llm_request_seconds', time.perf_counter() - t0,
+                            provider=self.provider, outcome=outcome)
+        await self._acache_set(prompt, parsed, sampling)
+        return parsed
+
+    async def astream_to_json(self, prompt: str, checker=None,
+                              on_progress: Optional[Callable[[int], Awaitable[Any]]] = None) -> Dict[str, Any]:
+        """Streaming variant of ``aparse_to_json`` that checks rooms as they arrive.
+
+        ``checker`` (a ``schema.validator.RoomChecker``) sees every top-level
+        field and room; rooms and fields of ``floors[i]`` go to
+        ``checker.floor(i)``. The first room it rejects closes the connection and
+        raises StreamAborted, so the retry starts without waiting for the rest
+        of the completion. ``on_progress(rooms)`` is awaited after each good room.
+        """
+        if self._use_mock():
+            logger.info("Using MOCK AI provider (Professional Template, streamed)")
+            return await self._consume(self._mock_stream(), checker, on_progress)
+
+        cached = await self._acache_get(prompt)
+        if cached is not None:
+            metrics.observe('llm_request_seconds', 0, provider=self.provider, outcome='cache')
+            return cached
+
+        logger.info(f"Using REAL AI provider: {self.provider} (stream)")
+        session = self._get_async_session()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        endpoint, headers, payload = self._build_request(prompt)
+        payload['stream'] = True
+        t0 = time.perf_counter()
+        outcome = 'error'
+        metrics.inc('llm_in_flight')
+        try:
+            async with self._semaphore:
+                async with session.post(endpoint, headers=headers, json=payload) as resp:
+                    resp.raise_for_status()
+                    parsed = await self._consume(self._sse_deltas(resp), checker, on_progress)
+            outcome = 'ok'
+        except StreamAborted:
+            outcome = 'aborted'
+            raise
+        finally:
+            metrics.dec('llm_in_flight')
+            metrics.observe('llm_request_seconds', time.perf_counter() - t0,
+                            provider=self.provider, outcome=outcome)
+        await self._acache_set(prompt, parsed)
+        return parsed
+
+    @staticmethod
+    async def _sse_deltas(resp: aiohttp.ClientResponse) -> AsyncIterator[str]:
+        """Content deltas of an OpenAI-style server-sent event stream."""
+        async for raw in resp.content:
+            line = raw.decode('utf-8').strip()
+            if not line.startswith('data:'):
+                continue
+            data = line[5:].strip()
+            if data == '[DONE]':
+                break
+            choices = json.loads(data).get('choices') or [{}]
+            delta = (choices[0].get('delta') or {}).get('content')
+            if delta:
+                yield delta
+
+    async def _mock_stream(self) -> AsyncIterator[str]:
+        text = json.dumps(self._mock_response())
+        for i in range(0, len(text), 64):
+            yield text[i:i + 64]
+            await asyncio.sleep(0)
+
+    @staticmethod
+    async def _consume(chunks: AsyncIterator[str], checker, on_progress) -> Dict[str, Any]:
+        stream = RoomStream()
+        async for chunk in chunks:
+            for kind, value in stream.feed(chunk):
+                if kind == 'field':
+                    if checker is not None:
+                        checker.field(*value)
+                    continue
+                if kind == 'floor_field':
+                    if checker is not None:
+                        checker.floor(value[0]).field(*value[1:])
+                    continue
+                floor, room = value
+                if checker is None:
+                    errors = []
+                else:
+                    errors = (checker if floor is None else checker.floor(floor)).check(room)
+                if errors:
+                    metrics.inc('llm_stream_aborts_total')
+                    logger.warning(f"Stream aborted at room {stream.rooms}: {errors[0]}")
+                    raise StreamAborted(errors, stream.rooms)
+                if on_progress is not None:
+                    await on_progress(stream.rooms)
+            if stream.done:
+                break
+        return stream.result()
+
+    def _cache_key(self, prompt: str, sampling: Optional[Dict[str, Any]] = None) -> str:
+        model = self.model
+        if sampling:
+            model += ''.join(f"|{k}={sampling[k]}" for k in sorted(sampling))
+        return self.cache.key(prompt, model)
+
+    def _cache_get(self, prompt: str, sampling: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        if self.cache is None:
+            return None
+        cached = self.cache.get(self._cache_key(prompt, sampling))
+        if cached is not None:
+            logger.info(f"LLM cache hit ({self.cache.stats()})")
+        return cached
+
+    def _cache_set(self, prompt: str, parsed: Dict[str, Any], sampling: Optional[Dict[str, Any]] = None):
+        if self.cache is not None:
+            self.cache.set(self._cache_key(prompt, sampling), parsed)
+
+    def invalidate(self, prompt: str, sampling: Optional[Dict[str, Any]] = None):
+        """Drop a cached response, e.g. after it failed validation."""
+        if self.cache is not None and not self._use_mock():
+            self.cache.invalidate(self._cache_key(prompt, sampling))
+
+    # SQLite reads, writes and commits run in a thread so they never stall the event loop
+    async def _acache_get(self, prompt: str, sampling: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        if self.cache is None:
+            return None
+        return await asyncio.to_thread(self._cache_get, prompt, sampling)
+
+    async def _acache_set(self, prompt: str, parsed: Dict[str, Any], sampling: Optional[Dict[str, Any]] = None):
+        if self.cache is not None:
+            await asyncio.to_thread(self._cache_set, prompt, parsed, sampling)
+
+    async def ainvalidate(self, prompt: str, sampling: Optional[Dict[str, Any]] = None):
+        """``invalidate`` for the bot handlers."""
+        if self.cache is not None and not self._use_mock():
+            await asyncio.to_thread(self.invalidate, prompt, sampling)
+
+    def _get_async_session(self) -> aiohttp.ClientSession:
+        if self._async_session is None or self._async_session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            timeout = aiohttp.ClientTimeout(total=None, connect=self.connect_timeout,
+                                            sock_read=self.read_timeout)
+            self._async_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._async_session
+
+    async def close(self):
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+        self._async_session = None
+        if self._sync_session is not None:
+            self._sync_session.close()
+            self._sync_session = None
+        if self.cache is not None:
+            self.cache.close()
+
     def _mock_response(self) -> Dict[str, Any]:
         # Return a HIGHLY PROFESSIONAL complex villa plan (15x25m)
         return {
-            'total_area': 160.0,
+            'total_area': 304.0,
             'land_width': 15.0, # As requested by user
             'land_height': 25.0,
             'floor_count': 2,
             'style': 'Modern',
-            'rooms': [
+            'rooms': [],
+            'floors': [
                 {
-                    'name': 'Dahliz (Entrance Hall)', 
-                    'type': 'hall', 
-                    'x': 5, 'y': 0, 'width': 5, 'height': 4,
-                    'openings': [{'type': 'door', 'wall': 'south', 'pos': 2.0}]
-                },
-                {
-                    'name': 'Zinapoya (Stairs)', 
-                    'type': 'stairs', 
-                    'x': 5, 'y': 4, 'width': 3, 'height': 2,
-                    'openings': [{'type': 'door', 'wall': 'south', 'pos': 1.0}]
-                },
-                {
-                    'name': 'Mehmonxona (Modern Living)', 
-                    'type': 'living_room', 
-                    'x': 0, 'y': 6, 'width': 8, 'height': 6,
-                    'openings': [
-                        {'type': 'door', 'wall': 'south', 'pos': 4.0},
-                        {'type': 'window', 'wall': 'north', 'pos': 2.0},
-                        {'type': 'window', 'wall': 'north', 'pos': 5.0}
+                    'name': '1-qavat',
+                    'rooms': [
+                        {
+                            'name': 'Dahliz (Entrance Hall)', 
+                            'type': 'hall', 
+                            'x': 5, 'y': 0, 'width': 5, 'height': 4,
+                            'openings': [{'type': 'door', 'wall': 'south', 'pos': 2.0}]
+                        },
+                        {
+                            'name': 'Zinapoya (Stairs)', 
+                            'type': 'stairs', 
+                            'x': 5, 'y': 4, 'width': 3, 'height': 2,
+                            'openings': [{'type': 'door', 'wall': 'south', 'pos': 1.0}]
+                        },
+                        {
+                            'name': 'Mehmonxona (Modern Living)', 
+                            'type': 'living_room', 
+                            'x': 0, 'y': 6, 'width': 8, 'height': 6,
+                            'openings': [
+                                {'type': 'door', 'wall': 'south', 'pos': 4.0},
+                                {'type': 'window', 'wall': 'north', 'pos': 2.0},
+                                {'type': 'window', 'wall': 'north', 'pos': 5.0}
+                            ]
+                        },
+                        {
+                            'name': 'Oshxona (Kitchen Studio)', 
+                            'type': 'kitchen', 
+                            'x': 8, 'y': 6, 'width': 6, 'height': 6,
+                            'openings': [{'type': 'door', 'wall': 'west', 'pos': 2.0}, {'type': 'window', 'wall': 'north', 'pos': 2.0}]
+                        },
+                        {
+                            'name': 'Yotoqxona (Master Bed)', 
+                            'type': 'bedroom', 
+                            'x': 10, 'y': 0, 'width': 5, 'height': 5,
+                            'openings': [{'type': 'door', 'wall': 'west', 'pos': 1.0}, {'type': 'window', 'wall': 'east', 'pos': 2.0}]
+                        },
+                        {
+                            'name': 'Trenajyor Zal (Gym)', 
+                            'type': 'gym', 
+                            'x': 0, 'y': 0, 'width': 5, 'height': 5,
+                            'openings': [{'type': 'door', 'wall': 'east', 'pos': 2.0}]
+                        }
                     ]
                 },
                 {
-                    'name': 'Oshxona (Kitchen Studio)', 
-                    'type': 'kitchen', 
-                    'x': 8, 'y': 6, 'width': 6, 'height': 6,
-                    'openings': [{'type': 'door', 'wall': 'west', 'pos': 2.0}, {'type': 'window', 'wall': 'north', 'pos': 2.0}]
-                },
-                {
-                    'name': 'Yotoqxona (Master Bed)', 
-                    'type': 'bedroom', 
-                    'x': 10, 'y': 0, 'width': 5, 'height': 5,
-                    'openings': [{'type': 'door', 'wall': 'west', 'pos': 1.0}, {'type': 'window', 'wall': 'east', 'pos': 2.0}]
-                },
-                {
-                    'name': 'Trenajyor Zal (Gym)', 
-                    'type': 'gym', 
-                    'x': 0, 'y': 0, 'width': 5, 'height': 5,
-                    'openings': [{'type': 'door', 'wall': 'east', 'pos': 2.0}]
+                    'name': '2-qavat',
+                    'rooms': [
+                        {
+                            'name': 'Yuqori dahliz (Upper Hall)',
+                            'type': 'hall',
+                            'x': 5, 'y': 0, 'width': 5, 'height': 4,
+                            'openings': [{'type': 'door', 'wall': 'north', 'pos': 1.0}]
+                        },
+                        {
+                            'name': 'Zinapoya (Stairs)',
+                            'type': 'stairs',
+                            'x': 5, 'y': 4, 'width': 3, 'height': 2,
+                            'openings': [{'type': 'door', 'wall': 'south', 'pos': 1.0}]
+                        },
+                        {
+                            'name': 'Hammom (Bathroom)',
+                            'type': 'bathroom',
+                            'x': 8, 'y': 4, 'width': 2, 'height': 2,
+                            'openings': [{'type': 'door', 'wall': 'south', 'pos': 0.5}]
+                        },
+                        {
+                            'name': 'Yotoqxona (Kids Bed)',
+                            'type': 'bedroom',
+                            'x': 0, 'y': 0, 'width': 5, 'height': 5,
+                            'openings': [{'type': 'door', 'wall': 'east', 'pos': 2.0}, {'type': 'window', 'wall': 'west', 'pos': 2.0}]
+                        },
+                        {
+                            'name': 'Yotoqxona (Guest Bed)',
+                            'type': 'bedroom',
+                            'x': 10, 'y': 0, 'width': 5, 'height': 5,
+                            'openings': [{'type': 'door', 'wall': 'west', 'pos': 1.0}, {'type': 'window', 'wall': 'east', 'pos': 2.0}]
+                        },
+                        {
+                            'name': 'Oilaviy zal (Family Room)',
+                            'type': 'living_room',
+                            'x': 0, 'y': 6, 'width': 8, 'height': 6,
+                            'openings': [
+                                {'type': 'door', 'wall': 'south', 'pos': 4.0},
+                                {'type': 'window', 'wall': 'north', 'pos': 2.0}
+                            ]
+                        }
+                    ]
                 }
             ],
             'entrance': 'south',
@@ -1,3 +1,6 @@
+# Bump whenever SCHEMA_PROMPT changes so cached LLM responses are not reused
+PROMPT_VERSION = '2'
+
 SCHEMA_PROMPT = '''
 Convert user architectural requirements into a PLATINUM LEVEL professional CAD JSON.
 The output will be rendered as a high-fidelity blueprint with "uz.archdesign" vertical title block and detailed blocks.
@@ -9,6 +12,7 @@ ARCHITECTURAL RULES (PLATINUM STANDARDS):
 4. STAIRS: For multistory plans, place a 3x2m stairs block in the entrance hall.
 5. WINDOWS: Place on EXTERIOR walls only. Minimum 1.5m width for living rooms.
 6. STYLE: If user says "Modern", use large windows and open-plan kitchen/living layouts.
+7. FLOORS: For 2+ storeys, put each storey's rooms in "floors" (ground floor first) and leave "rooms" empty. Stairs stay at the same x/y on every floor.
 
 JSON SCHEMA:
 {
@@ -27,6 +31,7 @@ JSON SCHEMA:
       ]
     }
   ],
+  "floors": [{"name": "string", "rooms": ["same as rooms"]}],
   "entrance": "north|south|east|west",
   "walls_thickness": "number"
 }
@@ -0,0 +1,348 @@
+"""Local layout solver: questionnaire answers to a plan without an LLM.
+
+The plan is a slicing layout around one corridor. The corridor (the
+hall) starts at the entrance wall and runs into the plot. Rooms are
+cut as slices from one strip on each side of it, so every room opens
+onto the hall with a door in the middle of the shared wall and gets a
+window on its outer wall. Each room starts at its minimum area
+(``config.standards``) and is grown towards a comfortable size. The
+result passes ``validate_and_fill`` in a few milliseconds.
+"""
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from config.standards import DOOR_WIDTH, GRID, MIN_ROOM_AREAS, MIN_ROOM_WIDTH, WINDOW_WIDTH
+
+CORRIDOR_WIDTH = 1.5
+# A slice must fit a door with some wall on both sides
+MIN_SLICE = 1.5
+# Strips deeper than this leave the rest of a wide plot free
+MAX_DEPTH = 7.0
+
+# Comfortable areas the solver aims for once the minimums fit (sq.m)
+PREFERRED_AREAS = {
+    'living_room': 20.0,
+    'bedroom': 14.0,
+    'kitchen': 10.0,
+    'office': 10.0,
+    'gym': 14.0,
+    'stairs': 6.0,
+    'bathroom': 4.5,
+    'basement': 10.0,
+    'terrace': 10.0,
+    'other': 8.0,
+}
+# Rooms nearest the entrance first
+ORDER = ['stairs', 'living_room', 'kitchen', 'office', 'gym', 'other', 'terrace', 'basement', 'bathroom', 'bedroom']
+NO_WINDOW = {'bathroom', 'stairs', 'basement'}
+
+# Keyword (lowercase, uz/en/ru) -> room type; the first match wins
+KEYWORDS = [
+    ('sport', 'gym'), ('gym', 'gym'), ('trenajyor', 'gym'), ('спортзал', 'gym'),
+    ('yotoq', 'bedroom'), ('bedroom', 'bedroom'), ('спальн', 'bedroom'),
+    ('mehmonxona', 'living_room'), ('living', 'living_room'), ('zal', 'living_room'),
+    ('гостин', 'living_room'), ('зал', 'living_room'),
+    ('oshxona', 'kitchen'), ('kitchen', 'kitchen'), ('кухн', 'kitchen'),
+    ('hammom', 'bathroom'), ('vanna', 'bathroom'), ('hojatxona', 'bathroom'), ('sanuzel', 'bathroom'),
+    ('bath', 'bathroom'), ('toilet', 'bathroom'), ('wc', 'bathroom'), ('ванн', 'bathroom'),
+    ('туалет', 'bathroom'), ('санузел', 'bathroom'),
+    ('zina', 'stairs'), ('stair', 'stairs'), ('лестниц', 'stairs'),
+    ('kabinet', 'office'), ('office', 'office'), ('study', 'office'), ('кабинет', 'office'),
+    ('terras', 'terrace'), ('terrace', 'terrace'), ('айвон', 'terrace'), ('ayvon', 'terrace'),
+    ('podval', 'basement'), ('yerto', 'basement'), ('basement', 'basement'), ('подвал', 'basement'),
+    ('dahliz', 'hall'), ('koridor', 'hall'), ("yo'lak", 'hall'), ('hol', 'hall'), ('xol', 'hall'),
+    ('hall', 'hall'), ('corridor', 'hall'), ('коридор', 'hall'), ('прихож', 'hall'),
+]
+NAMES = {
+    'bedroom': ('Yotoqxona', 'Bedroom'),
+    'living_room': ('Mehmonxona', 'Living Room'),
+    'kitchen': ('Oshxona', 'Kitchen'),
+    'bathroom': ('Hammom', 'Bathroom'),
+    'stairs': ('Zinapoya', 'Stairs'),
+    'office': ('Kabinet', 'Office'),
+    'gym': ('Sport zal', 'Gym'),
+    'terrace': ('Ayvon', 'Terrace'),
+    'basement': ('Yerto\'la', 'Basement'),
+    'hall': ('Dahliz', 'Hall'),
+}
+NUMBER_WORDS = {
+    'bir': 1, 'ikki': 2, 'uch': 3, "to'rt": 4, 'besh': 5, 'olti': 6,
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'одна': 1, 'один': 1, 'две': 2, 'два': 2, 'три': 3, 'четыре': 4,
+}
+
+_APOSTROPHES = re.compile(r"[‘’`ʻʼ]")
+_LAND = re.compile(r'(\d+(?:[.,]\d+)?)\s*(?:m|м|metr)?\s*(?:x|х|×|\*|ga|by|на)\s*(\d+(?:[.,]\d+)?)')
+_FLOORS = re.compile(r'(\d+)\s*(?:-?\s*(?:ta\s*)?qavat|\s*(?:floors?|storeys?|stories|этаж))')
+_ITEM_SPLIT = re.compile(r"[,;\n]|\s+(?:va|and|и)\s+|\s*\+\s*")
+_NUMBER = '|'.join([r'\d+'] + [re.escape(w) for w in sorted(NUMBER_WORDS, key=len, reverse=True)])
+# A count anywhere in an item and the word it counts: '3 bedrooms', 'uchta yotoqxona', '2x hammom'
+_COUNT = re.compile(rf"(?<!\S)({_NUMBER})(?:\s*-?\s*ta|x)?(?:\s+(\S+)|\s*$)")
+
+
+def _normalize(text: str) -> str:
+    return _APOSTROPHES.sub("'", text or '').lower()
+
+
+def parse_land(text: str) -> Tuple[float, float]:
+    """``'12x15m'``, ``'12 ga 15'``, ``'12 by 15'`` -> (12.0, 15.0)."""
+    match = _LAND.search(_normalize(text))
+    if not match:
+        raise ValueError(f"Could not read land dimensions from '{text}'.")
+    w, h = (float(v.replace(',', '.')) for v in match.groups())
+    if w <= 0 or h <= 0:
+        raise ValueError(f"Land dimensions must be positive, got {w:g}x{h:g}.")
+    return w, h
+
+
+def parse_floors(text: str) -> int:
+    """Floor count from an answer like ``'2'``, ``'ikki'`` or ``'2 qavatli'``; 1 when absent."""
+    norm = _normalize(text).strip()
+    match = _FLOORS.search(norm) or re.fullmatch(r'(\d+)', norm)
+    if match:
+        return max(1, int(match.group(1)))
+    words = norm.split()
+    return NUMBER_WORDS.get(words[0].removesuffix('ta'), 1) if words else 1
+
+
+def _room_type(item: str) -> Optional[str]:
+    return next((r_type for word, r_type in KEYWORDS if word in item), None)
+
+
+def parse_rooms(text: str, keep_unknown: bool = True) -> List[str]:
+    """Room types from a list like ``'3 ta yotoqxona, zal va hol'`` or ``'2 bedrooms, kitchen'``.
+
+    A count applies to the word right after it, wherever it stands in the
+    item (``'house with 3 bedrooms'``); an item without a count is one room.
+    Unknown items become ``'other'`` rooms, or are skipped with
+    ``keep_unknown=False`` (for free text, where most words are not rooms).
+    Raises ValueError for a count that does not name a room.
+    """
+    rooms = []
+    for item in _ITEM_SPLIT.split(_normalize(text)):
+        item = item.strip()
+        if not item:
+            continue
+        counts = _COUNT.findall(item)
+        if not counts:
+            r_type = _room_type(item)
+            if r_type is not None or keep_unknown:
+                rooms.append(r_type or 'other')
+            continue
+        for number, word in counts:
+            r_type = _room_type(word) if word else None
+            if r_type is None and not (word and keep_unknown):
+                raise ValueError(f"Could not tell which room '{number}' counts in '{item}'.")
+            count = int(number) if number.isdigit() else NUMBER_WORDS[number]
+            rooms.extend([r_type or 'other'] * min(count, 20))
+    return rooms
+
+
+def _lengths(types: List[str], depth: float, length: float) -> List[float]:
+    """Slice lengths along the corridor: minimums first, then growth towards the preferred areas."""
+    least = [max(MIN_SLICE, math.ceil(MIN_ROOM_AREAS.get(t, 0) / depth / GRID - 1e-9) * GRID) for t in types]
+    target = [max(lo, PREFERRED_AREAS.get(t, 8.0) / depth) for lo, t in zip(least, types)]
+    spare = length - sum(least)
+    if spare < -1e-9:
+        raise ValueError(f"The rooms need {sum(least):.1f}m along the corridor, the land has {length:.1f}m.")
+    want = sum(target) - sum(least)
+    share = min(1.0, spare / want) if want > 0 else 0.0
+    return [lo + math.floor((t - lo) * share / GRID + 1e-9) * GRID for lo, t in zip(least, target)]
+
+
+def _split(types: List[str], sides: int, taken: Optional[List[float]] = None) -> List[List[str]]:
+    """Strips of similar total area, each ordered from the entrance inwards.
+
+    ``taken`` is area already used per strip (a reserved stairs cell).
+    """
+    strips: List[List[str]] = [[] for _ in range(sides)]
+    totals = list(taken) if taken else [0.0] * sides
+    for t in sorted(types, key=lambda t: -PREFERRED_AREAS.get(t, 8.0)):
+        side = totals.index(min(totals))
+        strips[side].append(t)
+        totals[side] += PREFERRED_AREAS.get(t, 8.0)
+    rank = {t: i for i, t in enumerate(ORDER)}
+    return [sorted(s, key=lambda t: rank.get(t, len(ORDER))) for s in strips]
+
+
+# Entrance wall -> (corridor runs along y, u is measured from the far edge, walls on the v-/v+ sides).
+# u runs along the corridor from the entrance, v across it.
+_FRAMES = {
+    'south': (True, False, ('west', 'east')),
+    'north': (True, True, ('west', 'east')),
+    'west': (False, False, ('south', 'north')),
+    'east': (False, True, ('south', 'north')),
+}
+ENTRANCES = tuple(_FRAMES)
+
+
+def _r(v: float) -> float:
+    return round(v, 2)
+
+
+def _opening(kind: str, wall: str, wall_length: float) -> Dict[str, Any]:
+    width = DOOR_WIDTH if kind == 'door' else WINDOW_WIDTH
+    return {'type': kind, 'wall': wall, 'pos': _r((wall_length - width) / 2)}
+
+
+def _pack(land_width: float, land_height: float, types: List[str], floors: int, entrance: str,
+          style: str, stairs: Optional[Tuple[int, float]] = None) -> Tuple[Dict[str, Any], Optional[Tuple[int, float]]]:
+    """One floor plan and its stairs cell as (strip, length), or None without stairs.
+
+    Stairs sort first in their strip, so the cell always starts at the
+    entrance end. Passing the ground floor's cell as ``stairs`` reserves
+    the same rectangle on an upper floor and packs the other rooms behind it.
+    """
+    along_y, flipped, (v_low, v_high) = _FRAMES[entrance]
+    length, across = (land_height, land_width) if along_y else (land_width, land_height)
+
+    # The corridor is the hall; listed halls are folded into it
+    types = [t for t in types if t != 'hall']
+    if floors > 1 and 'stairs' not in types:
+        types.insert(0, 'stairs')
+    if not types:
+        raise ValueError("No rooms to lay out.")
+
+    if across >= CORRIDOR_WIDTH + 2 * MIN_ROOM_WIDTH:
+        sides = 2
+    elif across >= CORRIDOR_WIDTH + MIN_ROOM_WIDTH:
+        sides = 1
+    else:
+        raise ValueError(f"The land is too narrow: {across:g}m leaves no room beside a corridor.")
+    depth = math.floor(min(MAX_DEPTH, (across - CORRIDOR_WIDTH) / sides) / GRID + 1e-9) * GRID
+    # Strip 0 lies on the v- side of the corridor, strip 1 on the v+ side
+    strip_v = [0.0, depth + CORRIDOR_WIDTH]
+    outer_walls, inner_walls = [v_low, v_high], [v_high, v_low]
+
+    rest, taken = types, [0.0] * sides
+    if stairs is not None:
+        rest = list(types)
+        rest.remove('stairs')
+        taken[stairs[0]] = stairs[1] * depth
+
+    cells = []  # per strip: [type, u0, u_len]
+    for side, strip in enumerate(_split(rest, sides, taken)):
+        u, row = 0.0, []
+        if stairs is not None and side == stairs[0]:
+            u, row = stairs[1], [['stairs', 0.0, stairs[1]]]
+        for t, ln in zip(strip, _lengths(strip, depth, length - u)):
+            row.append([t, u, ln])
+            u += ln
+        cells.append(row)
+    used = max(row[-1][1] + row[-1][2] for row in cells if row)
+    # Strips end flush with the corridor; the stairs keep their size so upper floors can match them
+    for row in cells:
+        if row and row[-1][0] != 'stairs':
+            row[-1][2] = _r(used - row[-1][1])
+    cell = next(((side, row[0][2]) for side, row in enumerate(cells) if row and row[0][0] == 'stairs'), None)
+
+    def place(u0, v0, ul, vl):
+        if along_y:
+            x, y, w, h = v0, u0, vl, ul
+            if flipped:
+                y = land_height - u0 - ul
+        else:
+            x, y, w, h = u0, v0, ul, vl
+            if flipped:
+                x = land_width - u0 - ul
+        return {'x': _r(x), 'y': _r(y), 'width': _r(w), 'height': _r(h)}
+
+    hall_uz, hall_en = NAMES['hall']
+    rooms = [{
+        'name': f"{hall_uz} ({hall_en})", 'type': 'hall',
+        **place(0.0, depth, used, CORRIDOR_WIDTH),
+        'openings': [_opening('door', entrance, CORRIDOR_WIDTH)],
+    }]
+    counts = {t: types.count(t) for t in types}
+    seen: Dict[str, int] = {}
+    for side, row in enumerate(cells):
+        for t, u0, ul in row:
+            seen[t] = seen.get(t, 0) + 1
+            uz, en = NAMES.get(t, ('Xona', t.replace('_', ' ').title()))
+            suffix = f" {seen[t]}" if counts[t] > 1 else ''
+            openings = [_opening('door', inner_walls[side], ul)]
+            if t not in NO_WINDOW and ul >= WINDOW_WIDTH + 0.4:
+                openings.append(_opening('window', outer_walls[side], ul))
+            rooms.append({'name': f"{uz}{suffix} ({en})", 'type': t,
+                          **place(u0, strip_v[side], ul, depth), 'openings': openings})
+
+    return {
+        'land_width': float(land_width),
+        'land_height': float(land_height),
+        'total_area': _r(sum(r['width'] * r['height'] for r in rooms) * floors),
+        'floor_count': floors,
+        'entrance': entrance,
+        'style': style,
+        'rooms': rooms,
+    }, cell
+
+
+def _floor_types(types: List[str], floors: int) -> List[List[str]]:
+    """Day rooms and one bathroom downstairs; bedrooms and other bathrooms shared out upstairs."""
+    upper = [t for t in types if t == 'bedroom']
+    ground = [t for t in types if t != 'bedroom']
+    if 'bathroom' in ground:
+        first = ground.index('bathroom')
+        upper += [t for t in ground[first + 1:] if t == 'bathroom']
+        ground = ground[:first + 1] + [t for t in ground[first + 1:] if t != 'bathroom']
+    groups = [ground] + [[] for _ in range(floors - 1)]
+    for i, t in enumerate(upper):
+        groups[1 + i % (floors - 1)].append(t)
+    return groups
+
+
+def solve_layout(land_width: float, land_height: float, types: List[str], floors: int = 1,
+                 entrance: str = None, style: str = 'Modern') -> Dict[str, Any]:
+    """Pack ``types`` around an entrance corridor; raises ValueError when they do not fit.
+
+    When the rooms do not fit behind the requested entrance, the other
+    sides are tried so the corridor can run along the longer side. Houses
+    with more floors get one plan per floor under ``floors``, all packed
+    behind the same entrance around the ground floor's stairs cell, so the
+    stairs line up on every floor.
+    """
+    entrance = entrance if entrance in _FRAMES else settings.DEFAULT_ENTRANCE
+    groups = _floor_types(types, floors) if floors > 1 else [types]
+    first_error = None
+    for side in [entrance] + [s for s in _FRAMES if s != entrance]:
+        try:
+            ground, stairs = _pack(land_width, land_height, groups[0], floors, side, style)
+            plans = [ground] + [_pack(land_width, land_height, group, floors, side, style, stairs)[0]
+                                for group in groups[1:]]
+        except ValueError as e:
+            first_error = first_error or e
+            continue
+        if len(plans) == 1:
+            return plans[0]
+        spec = dict(plans[0], rooms=[], total_area=_r(sum(p['total_area'] for p in plans) / floors))
+        spec['floors'] = [{'name': f"{i + 1}-qavat", 'rooms': p['rooms']} for i, p in enumerate(plans)]
+        return spec
+    raise first_error
+
+
+def _style(notes: str) -> str:
+    norm = _normalize(notes)
+    return 'Classic' if any(w in norm for w in ('klassik', 'classic', 'классич')) else 'Modern'
+
+
+def solve_request(land_dims: str, floors: str, rooms: str, notes: str = '',
+                  entrance: str = None) -> Dict[str, Any]:
+    """Plan from the four questionnaire answers."""
+    land_w, land_h = parse_land(land_dims)
+    types = parse_rooms(rooms)
+    if not types:
+        raise ValueError(f"Could not read any rooms from '{rooms}'.")
+    return solve_layout(land_w, land_h, types, parse_floors(floors), entrance, _style(notes))
+
+
+def solve_text(text: str, entrance: str = None) -> Dict[str, Any]:
+    """Plan from a free-text request that names the land size and the rooms."""
+    land_w, land_h = parse_land(text)
+    # Land size and floor count are not room counts
+    types = parse_rooms(_FLOORS.sub(' ', _LAND.sub(' ', _normalize(text))), keep_unknown=False)
+    if not types:
+        raise ValueError("Could not find any rooms in the request.")
+    match = _FLOORS.search(_normalize(text))
+    return solve_layout(land_w, land_h, types, int(match.group(1)) if match else 1, entrance, _style(text))
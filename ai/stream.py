@@ -0,0 +1,156 @@
+"""Incremental parsing of a streamed JSON plan.
+
+The model's answer arrives a few tokens at a time. ``RoomStream`` scans it
+once, character by character, and reports every top-level field and every
+room (of ``rooms`` or of any ``floors[i].rooms``) the moment its closing
+bracket arrives, so a bad room can be rejected long before the completion
+ends.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+Event = Tuple[str, Any]
+
+
+class StreamAborted(ValueError):
+    """The stream was cut short because a finished room broke a hard rule."""
+
+    def __init__(self, errors: List[str], rooms: int):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+        self.rooms = rooms
+
+
+class _Frame:
+    """An open object or array."""
+    __slots__ = ('kind', 'slot', 'start', 'key', 'expect_key', 'value_start', 'items')
+
+    def __init__(self, kind: str, slot: Any, start: int):
+        self.kind = kind
+        # Key (or index) of this container in its parent
+        self.slot = slot
+        self.start = start
+        self.key = None
+        self.expect_key = kind == '{'
+        self.value_start = -1
+        self.items = 0
+
+
+class RoomStream:
+    """Feed text chunks, get back events:
+
+    * ``('field', (name, value))`` for a top-level field other than the rooms and floors
+    * ``('floor_field', (floor, name, value))`` for a field of ``floors[floor]`` other than its rooms
+    * ``('room', (floor, dict))`` for each room; ``floor`` is None for top-level rooms
+
+    Text before the first ``{`` (prose, code fences) is skipped, as is
+    anything after the object closes.
+    """
+
+    def __init__(self, array_key: str = 'rooms', floors_key: str = 'floors'):
+        self.array_key = array_key
+        self.floors_key = floors_key
+        self.text = ''
+        self.rooms = 0
+        self.done = False
+        self._pos = 0
+        self._start = -1
+        self._end = -1
+        self._stack: List[_Frame] = []
+        self._in_str = False
+        self._escape = False
+        self._key_start = -1
+
+    def _floor(self) -> Optional[int]:
+        """Index of the floor object at depth 3, if the stack is inside one."""
+        stack = self._stack
+        if len(stack) >= 3 and stack[1].kind == '[' and stack[1].slot == self.floors_key and stack[2].kind == '{':
+            return stack[2].slot
+        return None
+
+    def _tracked(self) -> bool:
+        """Whether the innermost object is the root or a floor, whose fields are reported."""
+        depth = len(self._stack)
+        return depth == 1 or (depth == 3 and self._floor() is not None)
+
+    def _field(self, frame: _Frame, end: int, events: List[Event]):
+        if frame.key is not None and frame.value_start >= 0:
+            raw = self.text[frame.value_start:end].strip()
+            if len(self._stack) == 1:
+                if raw and frame.key not in (self.array_key, self.floors_key):
+                    events.append(('field', (frame.key, json.loads(raw))))
+            elif raw and frame.key != self.array_key:
+                events.append(('floor_field', (self._floor(), frame.key, json.loads(raw))))
+        frame.value_start = -1
+
+    def feed(self, chunk: str) -> List[Event]:
+        events: List[Event] = []
+        if self.done:
+            return events
+        self.text += chunk
+        text = self.text
+        stack = self._stack
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+                    if self._key_start >= 0:
+                        stack[-1].key = json.loads(text[self._key_start:i + 1])
+                        self._key_start = -1
+                continue
+            if not stack:
+                if ch == '{':
+                    self._start = i
+                    stack.append(_Frame('{', None, i))
+                continue
+
+            top = stack[-1]
+            if ch == '"':
+                self._in_str = True
+                if top.expect_key and self._tracked():
+                    self._key_start = i
+            elif ch in '{[':
+                if top.kind == '[':
+                    slot = top.items
+                    top.items += 1
+                else:
+                    slot = top.key
+                stack.append(_Frame(ch, slot, i))
+            elif ch in '}]':
+                depth = len(stack)
+                if ch == '}':
+                    if self._tracked():
+                        self._field(top, i, events)
+                    parent = stack[-2] if depth > 1 else None
+                    if parent is not None and parent.kind == '[' and parent.slot == self.array_key:
+                        floor = None if depth == 3 else self._floor()
+                        if depth == 3 or (depth == 5 and floor is not None):
+                            self.rooms += 1
+                            events.append(('room', (floor, json.loads(text[top.start:i + 1]))))
+                stack.pop()
+                if not stack:
+                    self._end = i
+                    self.done = True
+                    self._pos = i + 1
+                    return events
+            elif top.kind == '{':
+                if ch == ':':
+                    top.expect_key = False
+                    top.value_start = i + 1
+                elif ch == ',':
+                    if self._tracked():
+                        self._field(top, i, events)
+                    top.expect_key = True
+        self._pos = len(text)
+        return events
+
+    def result(self) -> Dict[str, Any]:
+        """The whole object, once the stream is complete."""
+        if not self.done:
+            raise ValueError(f"Incomplete JSON from the model after {self.rooms} rooms.")
+        return json.loads(self.text[self._start:self._end + 1])
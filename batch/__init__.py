@@ -0,0 +1 @@
+from .runner import finished_ids, process_item, read_items, run_batch
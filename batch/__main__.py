@@ -0,0 +1,69 @@
+"""Generate plans in bulk from a JSONL file (or stdin) without the bot.
+
+Usage: python -m batch requests.jsonl [--out DIR] [--workers N] [--format asc|bin|zip]
+                                      [--results FILE] [--errors FILE] [--restart]
+
+DXF and PNG files land in ``--out`` as ``<id>.<ext>``. One JSON record per
+item goes to ``--results`` (``<out>/results.jsonl``, ``-`` for stdout) as soon
+as it is done; failed items also go to ``--errors``. Running the same
+command again skips items the results file already has as ``ok``, so an
+interrupted run resumes; bad input lines it already has are listed in
+``--errors`` again but not appended twice. ``--restart`` starts over
+instead. The exit code is 1 when any item failed.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from config import settings
+from dxf_gen.generator import DXF_FORMATS
+from .runner import finished_ids, read_items, run_batch
+
+
+def _last_byte(path: Path) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(-1, 2)
+        return f.read(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m batch', description=__doc__.splitlines()[0])
+    parser.add_argument('input', help="JSONL file with one spec or request per line, - for stdin")
+    parser.add_argument('--out', type=Path, default=settings.OUTPUT_DIR / 'batch', help="directory for DXF/PNG files")
+    parser.add_argument('--workers', type=int, default=None, help="pool processes (default: CPU count)")
+    parser.add_argument('--format', choices=list(DXF_FORMATS), default=settings.DXF_FORMAT)
+    parser.add_argument('--results', help="per-item records (default: <out>/results.jsonl, - for stdout)")
+    parser.add_argument('--errors', help="failed items only (default: <out>/errors.jsonl)")
+    parser.add_argument('--restart', action='store_true', help="regenerate items an earlier run finished")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(name)s: %(message)s')
+
+    results_path = None if args.results == '-' else Path(args.results or args.out / 'results.jsonl')
+    errors_path = Path(args.errors or args.out / 'errors.jsonl')
+    skip = set() if args.restart or results_path is None else finished_ids(results_path)
+    args.out.mkdir(parents=True, exist_ok=True)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    results = sys.stdout if results_path is None else open(results_path, 'w' if args.restart else 'a',
+                                                           encoding='utf-8')
+    if results is not sys.stdout and results.tell() and _last_byte(results_path) != b'\n':
+        results.write('\n')  # a killed run may have left half a line
+    try:
+        with open(errors_path, 'w', encoding='utf-8') as errors:
+            counts = run_batch(read_items(source), args.out, results, workers=args.workers,
+                               dxf_format=args.format, skip=skip, errors=errors)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if results is not sys.stdout:
+            results.close()
+
+    stages = ', '.join(f"{k[len('failed_'):]} {v}" for k, v in counts.items() if k.startswith('failed_'))
+    print(f"ok {counts['ok']}  failed {counts['error']}  skipped {counts['skipped']}"
+          + (f"  ({stages}; see {errors_path})" if stages else ''), file=sys.stderr)
+    return 1 if counts['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
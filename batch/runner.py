@@ -0,0 +1,250 @@
+"""Bulk plan generation from a JSONL stream, outside the bot.
+
+Each input line is one plan: a ready spec (``{"id": ..., "spec": {...}}``),
+questionnaire answers (``land_dims``, ``floors``, ``rooms``, ``notes``) or a
+free-text request (``text``). Items go through the same LLM/solver ->
+``validate_and_fill`` -> ``create_plan`` -> ``render_preview`` steps as the
+bot, one item per pool process, and every finished item is appended to the
+results file at once. Items already marked ``ok`` there are skipped, so an
+interrupted run picks up where it stopped. Bad input lines are recorded
+under ``line-<n>``; a worker process that dies fails its items with stage
+``worker`` and the rest continue on a fresh pool.
+"""
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, IO, Iterable, Iterator, Optional, Set, Tuple
+
+from ai.llm_client import llm_client
+from ai.prompt_templates import SCHEMA_PROMPT
+from ai.solver import solve_request, solve_text
+from config import settings
+from dxf_gen.generator import DXF_FORMATS, create_plan
+from preview.renderer import render_preview
+from schema.repair import repair_spec
+from schema.validator import validate_and_fill
+from worker.executor import warm_up
+
+logger = logging.getLogger(__name__)
+
+ANSWER_KEYS = ('land_dims', 'floors', 'rooms')
+# Validation errors fed back to the model before giving up, as in the bot
+LLM_RETRIES = 2
+_UNSAFE = re.compile(r'[^\w.-]+')
+
+
+def item_id(item: Dict[str, Any], line_no: int) -> str:
+    """The item's ``id``, or its line number; also the stem of its output files."""
+    raw = str(item.get('id') or f"line-{line_no}")
+    return _UNSAFE.sub('_', raw).strip('._') or f"line-{line_no}"
+
+
+def read_items(stream: IO[str]) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """(line number, item, parse error) per non-blank line, read lazily."""
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(item, dict):
+            yield line_no, None, "Each line must be a JSON object."
+            continue
+        yield line_no, item, None
+
+
+def finished_ids(path: Path) -> Set[str]:
+    """Ids already generated by an earlier run into ``path``, and its bad input lines."""
+    done = set()
+    if not path.exists():
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # last line of a run that was killed mid-write
+            if record.get('status') == 'ok' or record.get('stage') == 'input':
+                done.add(record['id'])
+    return done
+
+
+def _llm_plan(prompt: str):
+    """Blocking version of the bot's LLM loop: validate, repair, retry with the errors."""
+    last_error = ''
+    for attempt in range(LLM_RETRIES + 1):
+        attempt_prompt = prompt if attempt == 0 else (
+            f"{prompt}\n\nERROR IN PREVIOUS ATTEMPT:\n{last_error}\nFIX THESE ERRORS AND RETURN VALID JSON.")
+        try:
+            parsed = llm_client.parse_to_json(attempt_prompt)
+            try:
+                return validate_and_fill(parsed), []
+            except ValueError as e:
+                if not settings.SPEC_REPAIR:
+                    raise
+                try:
+                    repaired = repair_spec(parsed)
+                except ValueError:
+                    raise e
+                # Only valid answers stay cached
+                llm_client.invalidate(attempt_prompt)
+                return repaired
+        except Exception as e:
+            llm_client.invalidate(attempt_prompt)
+            last_error = str(e)
+    raise ValueError(last_error)
+
+
+def _plan(item: Dict[str, Any]) -> Tuple[Dict[str, Any], str, list]:
+    """Validated spec for one item, where it came from and any local repairs."""
+    if 'spec' in item:
+        try:
+            return validate_and_fill(item['spec']), 'spec', []
+        except ValueError as e:
+            if not settings.SPEC_REPAIR:
+                raise
+            try:
+                validated, fixes = repair_spec(item['spec'])
+            except ValueError:
+                raise e
+            return validated, 'spec', fixes
+    if all(k in item for k in ANSWER_KEYS):
+        answers = {k: str(item[k]) for k in ANSWER_KEYS}
+        answers['notes'] = str(item.get('notes', ''))
+        requirements = (f"Land: {answers['land_dims']}. Floors: {answers['floors']}. "
+                        f"Rooms: {answers['rooms']}. Notes: {answers['notes']}")
+        prompt = f"{SCHEMA_PROMPT}\n\nUSER REQUIREMENTS:\n{requirements}"
+        solve = lambda: solve_request(**answers)
+    elif 'text' in item:
+        prompt = f"{SCHEMA_PROMPT}\nUser Request: {item['text']}"
+        solve = lambda: solve_text(item['text'])
+    else:
+        raise ValueError("Item needs 'spec', 'text' or land_dims/floors/rooms.")
+
+    if settings.AI_PROVIDER == 'solver':
+        return validate_and_fill(solve()), 'solver', []
+    try:
+        validated, fixes = _llm_plan(prompt)
+        return validated, 'llm', fixes
+    except Exception as e:
+        if not settings.SOLVER_FALLBACK:
+            raise
+        try:
+            return validate_and_fill(solve()), 'solver', []
+        except ValueError:
+            raise e
+
+
+def process_item(item: Dict[str, Any], key: str, out_dir: str, dxf_format: str) -> Dict[str, Any]:
+    """Pool job: plan, DXF and PNG for one item; never raises, failures become the record."""
+    record: Dict[str, Any] = {'id': key}
+    timings: Dict[str, float] = {}
+    stage = 'plan'
+    t = time.perf_counter()
+    try:
+        validated, record['source'], fixes = _plan(item)
+        if fixes:
+            record['fixes'] = fixes
+        timings['plan'], t = time.perf_counter() - t, time.perf_counter()
+        stage = 'dxf'
+        dxf_path = os.path.join(out_dir, f"{key}.{DXF_FORMATS[dxf_format]}")
+        create_plan(validated, dxf_path, fmt=dxf_format, arcname=f"{key}.dxf")
+        timings['dxf'], t = time.perf_counter() - t, time.perf_counter()
+        stage = 'png'
+        png_path = os.path.join(out_dir, f"{key}.png")
+        render_preview(validated, png_path)
+        timings['png'] = time.perf_counter() - t
+    except Exception as e:
+        record.update(status='error', stage=stage, error=str(e) or type(e).__name__)
+        return record
+    record.update(status='ok', dxf=os.path.basename(dxf_path), png=os.path.basename(png_path),
+                  seconds={k: round(v, 3) for k, v in timings.items()})
+    return record
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(workers, mp_context=get_context('spawn'), initializer=warm_up)
+
+
+def run_batch(items: Iterable[Tuple[int, Optional[Dict[str, Any]], Optional[str]]], out_dir: Path,
+              results: IO[str], workers: int = None, dxf_format: str = None,
+              skip: Set[str] = frozenset(), errors: Optional[IO[str]] = None) -> Dict[str, int]:
+    """Run ``items`` (from ``read_items``) through a process pool, writing one record per item.
+
+    Failed items are also written to ``errors`` when given; input errors
+    already in ``skip`` (from ``finished_ids``) go only there, not to
+    ``results`` again. At most two items per worker are in flight, so the
+    input is read as the pool frees up and memory stays flat on any input
+    size. Returns counts of ok / error / skipped items, plus
+    ``failed_<stage>`` per stage that failed.
+    """
+    workers = workers or os.cpu_count() or 1
+    dxf_format = dxf_format or settings.DXF_FORMAT
+    if dxf_format not in DXF_FORMATS:
+        raise ValueError(f"Unknown DXF format '{dxf_format}' (expected {', '.join(DXF_FORMATS)})")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    counts = {'ok': 0, 'error': 0, 'skipped': 0}
+    seen: Set[str] = set()
+
+    def write(record, recorded=False):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        counts[record['status']] += 1
+        if not recorded:
+            results.write(line)
+            results.flush()
+        if record['status'] == 'error':
+            stage = f"failed_{record['stage']}"
+            counts[stage] = counts.get(stage, 0) + 1
+            logger.warning(f"{record['id']}: {record['stage']} failed: {record['error']}")
+            if errors is not None:
+                errors.write(line)
+                errors.flush()
+
+    pending: Dict[Future, str] = {}
+
+    def collect(futures):
+        for future in futures:
+            key = pending.pop(future)
+            try:
+                record = future.result()
+            except Exception as e:  # BrokenProcessPool: the worker was killed (OOM, segfault)
+                record = {'id': key, 'status': 'error', 'stage': 'worker', 'error': str(e) or type(e).__name__}
+            write(record)
+
+    pool = _pool(workers)
+    try:
+        for line_no, item, error in items:
+            key = item_id(item or {}, line_no)
+            if error or key in seen:
+                # Keyed by line: a duplicate must not share the id of the item it repeats
+                line_key = f"line-{line_no}"
+                write({'id': line_key, 'status': 'error', 'stage': 'input',
+                       'error': error or f"Duplicate id '{key}' on line {line_no}."}, recorded=line_key in skip)
+                continue
+            seen.add(key)
+            if key in skip:
+                counts['skipped'] += 1
+                continue
+            try:
+                future = pool.submit(process_item, item, key, str(out_dir), dxf_format)
+            except BrokenProcessPool:
+                # Items in flight on the broken pool fail one by one in collect()
+                pool.shutdown(wait=False)
+                pool = _pool(workers)
+                future = pool.submit(process_item, item, key, str(out_dir), dxf_format)
+            pending[future] = key
+            while len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(as_completed(list(pending)))
+    finally:
+        pool.shutdown()
+    return counts
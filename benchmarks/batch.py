@@ -0,0 +1,45 @@
+"""Throughput of the batch CLI's process pool against its worker count.
+
+Usage: python -m benchmarks.batch [--count 32] [--rooms 8] [--workers 1 2 4]
+
+Synthetic specs (no LLM) go through ``run_batch`` into a temporary
+directory; the table shows plans per second and the speedup over one
+worker. It can only scale up to the number of cores.
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from batch.runner import read_items, run_batch
+from schema.synthetic import iter_specs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=32)
+    parser.add_argument('--rooms', type=int, default=8)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args(argv)
+
+    lines = ''.join(json.dumps({'id': f"plan-{i}", 'spec': spec}) + '\n'
+                    for i, spec in enumerate(iter_specs(args.count, rooms=args.rooms)))
+    print(f"cores {os.cpu_count()}")
+    print(f"{'workers':>8}{'wall s':>9}{'plans/s':>9}{'speedup':>9}")
+    base = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = io.StringIO()
+            t0 = time.perf_counter()
+            counts = run_batch(read_items(io.StringIO(lines)), Path(tmp), results, workers=workers)
+            wall = time.perf_counter() - t0
+        rate = counts['ok'] / wall
+        base = base or rate
+        print(f"{workers:>8}{wall:>9.2f}{rate:>9.1f}{rate / base:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
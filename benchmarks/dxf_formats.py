@@ -0,0 +1,55 @@
+"""Write time and size of the DXF output formats (asc, bin, zip) on large plans.
+
+Usage: python -m benchmarks.dxf_formats [--sizes 500 1000 2000] [--repeat 3] [--output formats.json]
+
+Plan geometry is built once per case before timing, so the numbers cover
+entity creation plus serialization, which is where the formats differ.
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from benchmarks.specs import grid_spec, mock_spec
+from dxf_gen.generator import DXF_FORMATS, create_plan
+from geometry.plan import build_plan_geometry
+from schema.validator import validate_and_fill
+
+
+def measure(spec: Dict[str, Any], fmt: str, repeat: int) -> Dict[str, Any]:
+    best = float('inf')
+    size = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        size = len(create_plan(spec, fmt=fmt))
+        best = min(best, time.perf_counter() - t0)
+    return {'wall_s': round(best, 4), 'bytes': size}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1000, 2000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    cases = [('mock', mock_spec())] + [(str(n), validate_and_fill(grid_spec(n))) for n in args.sizes]
+    results: List[Dict[str, Any]] = []
+    print(f"{'rooms':>8}{'format':>8}{'write s':>10}{'KiB':>10}{'vs asc':>8}")
+    for name, spec in cases:
+        build_plan_geometry(spec)  # warm the geometry cache
+        asc = None
+        for fmt in DXF_FORMATS:
+            res = measure(spec, fmt, args.repeat)
+            asc = asc or res['bytes']
+            results.append({'case': name, 'format': fmt, **res})
+            print(f"{name:>8}{fmt:>8}{res['wall_s']:>10.3f}{res['bytes'] / 1024:>10.0f}"
+                  f"{res['bytes'] / asc:>7.0%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Serial vs per-floor parallel generation of a multi-storey plan.
+
+Usage: python -m benchmarks.floors [--floors 2 3 4] [--workers 4] [--repeat 3]
+
+Every floor is a copy of the mock villa's ground floor. ``serial`` is one
+worker job rendering the DXF and the composite preview; ``parallel`` is what
+the bot does: the DXF and one preview per floor as concurrent jobs, then the
+composite. Wall time is the best of ``--repeat`` runs.
+"""
+import argparse
+import asyncio
+import time
+from copy import deepcopy
+
+from benchmarks.specs import mock_spec
+from schema.schema import floor_plans
+from schema.validator import validate_and_fill
+from worker.executor import GenerationExecutor
+from worker.jobs import compose_floor_previews, render_artifacts, render_floor_preview, render_plan_dxf
+
+
+def _spec(floors: int):
+    ground = deepcopy(mock_spec(validated=False)['floors'][0]['rooms'])
+    spec = dict(mock_spec(validated=False), floors=[{'rooms': deepcopy(ground)} for _ in range(floors)])
+    return validate_and_fill(spec)
+
+
+async def _serial(executor, spec):
+    await executor.run(render_artifacts, spec)
+
+
+async def _parallel(executor, spec):
+    jobs = [executor.run(render_plan_dxf, spec)] + [executor.run(render_floor_preview, f) for f in floor_plans(spec)]
+    _, *previews = await asyncio.gather(*jobs)
+    await executor.run(compose_floor_previews, [p for p, _ in previews])
+
+
+async def _best_of(run, executor, spec, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await run(executor, spec)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+async def _main(args):
+    executor = GenerationExecutor(workers=args.workers, timeout=600)
+    await executor.start()
+    try:
+        print(f"{'floors':>7}{'serial s':>10}{'parallel s':>12}{'speedup':>9}")
+        for n in args.floors:
+            spec = _spec(n)
+            serial = await _best_of(_serial, executor, spec, args.repeat)
+            parallel = await _best_of(_parallel, executor, spec, args.repeat)
+            print(f"{n:>7}{serial:>10.2f}{parallel:>12.2f}{serial / parallel:>8.1f}x")
+    finally:
+        await executor.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--floors', type=int, nargs='+', default=[2, 3, 4])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    asyncio.run(_main(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Compare sweep-line ``check_overlaps`` with the original pairwise loop.
+
+Usage: python -m benchmarks.overlaps [--sizes 10 100 1000 5000] [--repeat 3]
+"""
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from schema.spatial_logic import check_overlaps
+
+# Pairwise scan is quadratic; skip it above this size
+NAIVE_LIMIT = 5000
+
+
+def naive_check_overlaps(rooms: List[Dict[str, Any]]) -> List[str]:
+    """The original O(n^2) implementation, kept as the reference."""
+    errors = []
+    for i, r1 in enumerate(rooms):
+        for j, r2 in enumerate(rooms):
+            if i >= j: continue
+            x1, y1 = float(r1['x']), float(r1['y'])
+            w1, h1 = float(r1['width']), float(r1['height'])
+            x2, y2 = float(r2['x']), float(r2['y'])
+            w2, h2 = float(r2['width']), float(r2['height'])
+            if not (x1 + w1 <= x2 or x2 + w2 <= x1 or y1 + h1 <= y2 or y2 + h2 <= y1):
+                overlap_w = min(x1 + w1, x2 + w2) - max(x1, x2)
+                overlap_h = min(y1 + h1, y2 + h2) - max(y1, y2)
+                if overlap_w > 0.05 and overlap_h > 0.05:
+                    n1 = r1.get('name', f"Room {i}")
+                    n2 = r2.get('name', f"Room {j}")
+                    errors.append(f"{n1} and {n2} overlap by {overlap_w:.2f}m x {overlap_h:.2f}m")
+    return errors
+
+
+def grid_rooms(n: int, seed: int = 0, jitter: float = 0.0) -> List[Dict[str, Any]]:
+    """Tightly packed rooms of mixed size; ``jitter`` shifts rooms to create overlaps."""
+    rng = random.Random(seed)
+    cols = max(1, int(n ** 0.5))
+    rooms = []
+    for k in range(n):
+        row, col = divmod(k, cols)
+        x, y = col * 4.0, row * 3.0
+        if jitter:
+            x += rng.uniform(-jitter, jitter)
+            y += rng.uniform(-jitter, jitter)
+        rooms.append({'name': f"R{k}", 'x': round(x, 2), 'y': round(y, 2), 'width': 4.0, 'height': 3.0})
+    rng.shuffle(rooms)
+    return rooms
+
+
+def strip_rooms(n: int) -> List[Dict[str, Any]]:
+    """Full-width apartments stacked vertically (worst case for a pure x-sweep)."""
+    return [{'name': f"S{k}", 'x': 0, 'y': k * 3.0, 'width': 40.0, 'height': 3.0} for k in range(n)]
+
+
+def corridor_rooms(n: int) -> List[Dict[str, Any]]:
+    """Grid with one full-height corridor down the middle (a single tall room)."""
+    rooms = grid_rooms(n - 1)
+    top = max(r['y'] + r['height'] for r in rooms)
+    rooms.append({'name': 'Corridor', 'x': -1.5, 'y': 0.0, 'width': 1.5, 'height': top})
+    return rooms
+
+
+def _best_of(fn, rooms, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(rooms)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500, 1000, 2000, 5000, 20000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'layout':<9}{'rooms':>8}{'naive ms':>12}{'sweep ms':>12}{'speedup':>10}")
+    for name, make in (('grid', grid_rooms), ('jitter', lambda n: grid_rooms(n, jitter=0.3)), ('strips', strip_rooms),
+                       ('corridor', corridor_rooms)):
+        for n in args.sizes:
+            rooms = make(n)
+            sweep = _best_of(check_overlaps, rooms, args.repeat)
+            if n <= NAIVE_LIMIT:
+                assert naive_check_overlaps(rooms) == check_overlaps(rooms), f"{name}/{n}: results differ"
+                naive = _best_of(naive_check_overlaps, rooms, 1)
+                print(f"{name:<9}{n:>8}{naive*1e3:>12.2f}{sweep*1e3:>12.2f}{naive/sweep:>9.1f}x")
+            else:
+                print(f"{name:<9}{n:>8}{'-':>12}{sweep*1e3:>12.2f}{'-':>10}")
+
+
+if __name__ == '__main__':
+    main()
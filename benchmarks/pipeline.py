@@ -0,0 +1,153 @@
+"""Time and memory per stage of validate -> DXF -> PNG, plus the full pipeline.
+
+Usage: python -m benchmarks.pipeline [--sizes 100 500 1000 2000] [--stages validate dxf png pipeline]
+                                     [--repeat 3] [--output bench.json]
+                                     [--baseline old.json] [--threshold 0.25]
+
+Every (case, stage) runs in a fresh spawned process so peak RSS belongs to
+that stage alone. Wall time is the best of ``--repeat`` runs. With
+``--baseline`` the exit code is 1 when wall time, peak RSS or output size
+grew by more than ``--threshold`` (relative) against the stored results.
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+from benchmarks.specs import grid_spec, mock_spec
+from schema.schema import floor_plans
+
+STAGES = ['validate', 'dxf', 'png', 'pipeline']
+METRICS = ['wall_s', 'peak_rss_mb', 'output_bytes']
+# Differences below these are noise, whatever the relative change
+NOISE_FLOOR = {'wall_s': 0.02, 'peak_rss_mb': 5.0, 'output_bytes': 1024}
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_stage(stage: str, raw_spec: Dict[str, Any], repeat: int, workdir: str) -> Dict[str, Any]:
+    """Child process body: import everything, then measure only the stage."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from dxf_gen.generator import create_plan
+    from geometry import plan
+    from preview.renderer import render_preview
+    from schema.validator import validate_and_fill
+
+    dxf_path = os.path.join(workdir, f"{stage}.dxf")
+    png_path = os.path.join(workdir, f"{stage}.png")
+    spec = validate_and_fill(copy.deepcopy(raw_spec)) if stage in ('dxf', 'png') else None
+    base_rss = _peak_rss_mb()
+
+    best = float('inf')
+    size = 0
+    for _ in range(repeat):
+        plan._CACHE.clear()  # each run builds its own geometry
+        raw = copy.deepcopy(raw_spec)
+        t0 = time.perf_counter()
+        if stage == 'validate':
+            size = len(json.dumps(validate_and_fill(raw)))
+        elif stage == 'dxf':
+            size = os.path.getsize(create_plan(spec, dxf_path))
+        elif stage == 'png':
+            size = os.path.getsize(render_preview(spec, png_path))
+        else:
+            # Same path as the bot: rendered in memory, nothing written to disk
+            validated = validate_and_fill(raw)
+            size = len(create_plan(validated)) + len(render_preview(validated))
+        best = min(best, time.perf_counter() - t0)
+
+    return {'wall_s': best, 'peak_rss_mb': _peak_rss_mb(), 'base_rss_mb': base_rss, 'output_bytes': size}
+
+
+def measure(stage: str, raw_spec: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp, \
+            ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(_run_stage, stage, raw_spec, repeat, tmp).result()
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """Return one message per metric that regressed beyond ``threshold``."""
+    old = {(r['case'], r['stage']): r for r in baseline}
+    regressions = []
+    for r in results:
+        ref = old.get((r['case'], r['stage']))
+        if ref is None:
+            continue
+        for metric in METRICS:
+            new_val, old_val = r.get(metric), ref.get(metric)
+            if new_val is None or not old_val:
+                continue
+            if new_val - old_val > NOISE_FLOOR[metric] and new_val > old_val * (1 + threshold):
+                regressions.append(f"{r['case']}/{r['stage']} {metric}: {old_val:g} -> {new_val:g} "
+                                   f"(+{(new_val / old_val - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 1000, 2000])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--baseline', help="JSON from an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed relative growth before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    cases = [('mock', mock_spec(validated=False))] + \
+            [(str(n), grid_spec(n, validated=False)) for n in args.sizes]
+
+    results = []
+    print(f"{'case':>8}{'rooms':>7}{'stage':>10}{'wall s':>9}{'peak MB':>9}{'output KB':>11}")
+    for name, spec in cases:
+        for stage in args.stages:
+            rooms = sum(len(floor['rooms']) for floor in floor_plans(spec))
+            row = {'case': name, 'rooms': rooms, 'stage': stage,
+                   **measure(stage, spec, args.repeat)}
+            results.append(row)
+            rss = f"{row['peak_rss_mb']:.0f}" if row['peak_rss_mb'] is not None else '-'
+            print(f"{name:>8}{row['rooms']:>7}{stage:>10}{row['wall_s']:>9.3f}{rss:>9}"
+                  f"{row['output_bytes'] / 1024:>11.1f}")
+
+    if args.output:
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for msg in regressions:
+            print(f"REGRESSION {msg}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
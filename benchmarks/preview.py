@@ -0,0 +1,43 @@
+"""Time batched (collection based) vs per-element preview rendering.
+
+Usage: python -m benchmarks.preview [--sizes 6 100 500 1000] [--repeat 2]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+
+from benchmarks.specs import grid_spec, mock_spec
+from preview.renderer import render_preview
+
+
+def _best_of(spec, batched: bool, repeat: int, path: str) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        render_preview(spec, path, batched=batched)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--repeat', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    cases = [('mock', mock_spec())] + [(str(n), grid_spec(n)) for n in args.sizes]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'preview.png')
+        print(f"{'rooms':>8}{'per-artist s':>14}{'batched s':>12}{'speedup':>10}")
+        for name, spec in cases:
+            legacy = _best_of(spec, False, args.repeat, path)
+            batched = _best_of(spec, True, args.repeat, path)
+            print(f"{name:>8}{legacy:>14.2f}{batched:>12.2f}{legacy/batched:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""How often local repair saves an LLM retry on typical near-miss specs.
+
+Usage: python -m benchmarks.repair [--count 200] [--rooms 8] [--seed 0]
+
+Valid synthetic plans get one defect of the kind models tend to produce
+(small overlap, small overshoot, missing door, undersized room, or a big
+overlap the repair must refuse). Every damaged spec fails
+``validate_and_fill``; the table shows how many ``repair_spec`` turns back
+into a valid plan and how long it takes next to a multi-second LLM call.
+"""
+import argparse
+import random
+import time
+from copy import deepcopy
+from typing import Any, Callable, Dict
+
+from config.standards import MIN_ROOM_AREAS
+from schema.repair import repair_spec
+from schema.synthetic import iter_specs
+from schema.validator import validate_and_fill
+
+
+def small_overlap(spec, rng):
+    r = rng.choice(spec['rooms'])
+    size = rng.choice(['width', 'height'])
+    r[size] = round(r[size] + rng.uniform(0.1, 0.3), 2)
+
+
+def overshoot(spec, rng):
+    edge = [r for r in spec['rooms'] if r['x'] + r['width'] >= spec['land_width'] - 0.01]
+    r = rng.choice(edge)
+    r['width'] = round(r['width'] + rng.uniform(0.1, 0.3), 2)
+
+
+def no_door(spec, rng):
+    r = rng.choice(spec['rooms'])
+    r['openings'] = [op for op in r['openings'] if op['type'] != 'door']
+
+
+def small_room(spec, rng):
+    rooms = [r for r in spec['rooms'] if MIN_ROOM_AREAS.get(r['type'], 0) > 0]
+    r = rng.choice(rooms)
+    need = MIN_ROOM_AREAS[r['type']]
+    r['width'] = round(min(r['width'], need / r['height'] * rng.uniform(0.8, 0.95)), 2)
+
+
+def big_overlap(spec, rng):
+    r = rng.choice(spec['rooms'])
+    r['x'] = round(r['x'] + r['width'] / 2, 2)
+    r['y'] = round(r['y'] + r['height'] / 2, 2)
+
+
+DEFECTS: Dict[str, Callable[[Dict[str, Any], random.Random], None]] = {
+    'small_overlap': small_overlap,
+    'overshoot': overshoot,
+    'no_door': no_door,
+    'small_room': small_room,
+    'big_overlap': big_overlap,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=200, help="damaged specs per defect")
+    parser.add_argument('--rooms', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    base = list(iter_specs(args.count, seed=args.seed, rooms=args.rooms))
+    print(f"{'defect':<15}{'invalid':>9}{'repaired':>10}{'saved':>8}{'us/spec':>10}")
+    for name, damage in DEFECTS.items():
+        rng = random.Random(f"{args.seed}:{name}")
+        invalid = repaired = 0
+        elapsed = 0.0
+        for spec in base:
+            spec = deepcopy(spec)
+            damage(spec, rng)
+            try:
+                validate_and_fill(deepcopy(spec))
+                continue
+            except ValueError:
+                invalid += 1
+            t0 = time.perf_counter()
+            try:
+                repair_spec(spec)
+                repaired += 1
+            except ValueError:
+                pass
+            elapsed += time.perf_counter() - t0
+        per = elapsed / invalid * 1e6 if invalid else 0.0
+        print(f"{name:<15}{invalid:>9}{repaired:>10}{repaired / max(invalid, 1):>8.0%}{per:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
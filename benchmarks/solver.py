@@ -0,0 +1,55 @@
+"""Time and success rate of the local layout solver on typical questionnaire answers.
+
+Usage: python -m benchmarks.solver [--repeat 5]
+
+Every combination of land size, floor count and room list is solved and
+validated; the table shows how many fit and the latency including
+``validate_and_fill``, to set against a multi-second LLM call.
+"""
+import argparse
+import itertools
+import time
+
+from ai.solver import solve_request
+from schema.validator import validate_and_fill
+
+LANDS = ['8x12', '10x10', '12x15m', '15 ga 25', '20x30', '6x20']
+FLOORS = ['1', '2']
+ROOMS = [
+    '2 ta yotoqxona, oshxona, hammom',
+    '3 ta yotoqxona, zal va hol',
+    '4 yotoqxona, mehmonxona, oshxona, 2 hammom, kabinet',
+    '3 bedrooms, living room, kitchen, 2 bathrooms, gym, office',
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    times, failed = [], []
+    for land, floors, rooms in itertools.product(LANDS, FLOORS, ROOMS):
+        best = float('inf')
+        try:
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                validate_and_fill(solve_request(land, floors, rooms))
+                best = min(best, time.perf_counter() - t0)
+        except ValueError as e:
+            failed.append(f"{land} / {floors} / {rooms}: {e}")
+            continue
+        times.append(best)
+
+    times.sort()
+    total = len(times) + len(failed)
+    print(f"solved {len(times)}/{total}")
+    if times:
+        print(f"ms p50 {times[len(times) // 2] * 1e3:.2f}  p95 {times[int(len(times) * 0.95)] * 1e3:.2f}  "
+              f"max {times[-1] * 1e3:.2f}")
+    for line in failed:
+        print(f"  no fit: {line}")
+
+
+if __name__ == '__main__':
+    main()
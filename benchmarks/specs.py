@@ -0,0 +1,38 @@
+"""Spec fixtures shared by the benchmarks."""
+from typing import Any, Dict
+
+from ai.llm_client import LLMClient
+from schema.validator import validate_and_fill
+
+_TYPES = ['bedroom', 'living_room', 'kitchen', 'bathroom', 'hall', 'stairs']
+
+
+def mock_spec(validated: bool = True) -> Dict[str, Any]:
+    """The two-floor villa returned by the mock provider."""
+    spec = LLMClient(provider='mock')._mock_response()
+    return validate_and_fill(spec) if validated else spec
+
+
+def grid_spec(n: int, room_w: float = 4.0, room_h: float = 4.0, validated: bool = True) -> Dict[str, Any]:
+    """``n`` rooms packed in a square grid with a door and a window each."""
+    cols = max(1, int(round(n ** 0.5)))
+    rows = (n + cols - 1) // cols
+    rooms = []
+    for k in range(n):
+        row, col = divmod(k, cols)
+        rooms.append({
+            'name': f"Room {k + 1}",
+            'type': _TYPES[k % len(_TYPES)],
+            'x': col * room_w, 'y': row * room_h, 'width': room_w, 'height': room_h,
+            'openings': [
+                {'type': 'door', 'wall': 'south', 'pos': 1.0},
+                {'type': 'window', 'wall': 'north', 'pos': 1.5},
+            ],
+        })
+    spec = {
+        'land_width': cols * room_w,
+        'land_height': rows * room_h,
+        'total_area': n * room_w * room_h,
+        'rooms': rooms,
+    }
+    return validate_and_fill(spec) if validated else spec
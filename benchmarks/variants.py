@@ -0,0 +1,60 @@
+"""Cost of ranking layout variants and what stopping at the first K valid ones saves.
+
+Usage: python -m benchmarks.variants [--count 4] [--top-k 2] [--invalid 0.3] [--trials 2000] [--seed 0]
+
+``score_spec`` is timed on synthetic plans. The early-stop figures are
+simulated: each of ``--count`` LLM candidates takes a log-normal latency
+(median 6 s, like a long JSON completion) and fails validation with
+probability ``--invalid``. The table compares waiting for all candidates
+with returning once ``--top-k`` are valid and cancelling the rest.
+"""
+import argparse
+import random
+import time
+
+from schema.scoring import score_spec
+from schema.synthetic import iter_specs
+from schema.validator import validate_and_fill
+
+MEDIAN_LATENCY = 6.0
+LATENCY_SIGMA = 0.5
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=4)
+    parser.add_argument('--top-k', type=int, default=2)
+    parser.add_argument('--invalid', type=float, default=0.3)
+    parser.add_argument('--trials', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    specs = [validate_and_fill(s) for s in iter_specs(200, seed=args.seed)]
+    t0 = time.perf_counter()
+    for spec in specs:
+        score_spec(spec)
+    print(f"score_spec: {(time.perf_counter() - t0) / len(specs) * 1e6:.0f} us/spec")
+
+    rng = random.Random(args.seed)
+    wait_all = wait_k = cancelled = short = 0.0
+    for _ in range(args.trials):
+        runs = sorted((rng.lognormvariate(0, LATENCY_SIGMA) * MEDIAN_LATENCY, rng.random() >= args.invalid)
+                      for _ in range(args.count))
+        wait_all += runs[-1][0]
+        valid = [t for t, ok in runs if ok]
+        if len(valid) >= args.top_k:
+            stop = valid[args.top_k - 1]
+            cancelled += sum(1 for t, _ in runs if t > stop)
+        else:
+            stop = runs[-1][0]
+            short += 1
+        wait_k += stop
+    n = args.trials
+    print(f"{'':<24}{'wait all':>10}{'first K':>10}")
+    print(f"{'mean latency s':<24}{wait_all / n:>10.2f}{wait_k / n:>10.2f}")
+    print(f"{'LLM calls cancelled':<24}{0:>10.2f}{cancelled / n:>10.2f}")
+    print(f"fewer than {args.top_k} valid (solver fills in): {short / n:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+"""End-to-end run of webhook mode against a local fake Telegram Bot API.
+
+Usage: python -m benchmarks.webhook [--users 20] [--workers 2] [--timeout 120]
+                                    [--storage redis|sqlite|memory] [--output webhook.json]
+
+Starts a fake Bot API server, launches ``python -m bot.main`` in webhook mode
+pointed at it, and posts the full questionnaire for every user at once
+(each user's updates in order). SIGTERM is sent right after the last update
+is accepted, so every plan has to be finished by the graceful drain. The
+run fails (exit code 1) when a user is missing replies, gets them out of
+order, or the bot does not exit cleanly.
+
+With ``--storage redis`` (the default) the bot keeps its FSM in an
+in-process RESP stand-in. Before the bot starts, two storage clients update
+one user's data concurrently against it; the run also fails when a field
+is lost.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from aiohttp import ClientSession, web
+from aiogram.fsm.storage.base import StorageKey
+
+from bot.storage import RedisStorage, RespClient
+from bot.strings import STRINGS
+
+TOKEN = '123456:TEST'
+SECRET = 'bench-secret'
+STEPS = [
+    ('/start', 'welcome'),
+    (STRINGS['uz']['btn_create'], 'ask_dimensions'),
+    ('12x15', 'ask_floors'),
+    ('1', 'ask_rooms'),
+    ('3 yotoqxona, oshxona, mehmonxona', 'ask_notes'),
+    ("yo'q", 'parsing'),
+]
+# What every user must receive, in this order
+EXPECTED = [reply for _, reply in STEPS] + ['generating', 'sendDocument', 'sendPhoto']
+# Replies that depend on load, not on the conversation
+OPTIONAL = {'queued'}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class FakeTelegramAPI:
+    """Answers Bot API calls with minimal valid results and records them per chat."""
+
+    def __init__(self):
+        self.calls: Dict[int, List[tuple]] = {}
+        self.webhook: Dict[str, Any] = {}
+        self.ready = asyncio.Event()
+        self._message_id = 0
+        self._texts = {text: key for key, text in STRINGS['uz'].items() if '{' not in text}
+        self._templates = [(text.split('{')[0], key) for key, text in STRINGS['uz'].items() if '{' in text]
+
+    def _classify(self, method: str, fields) -> str:
+        if method != 'sendMessage':
+            return method
+        text = fields.get('text', '')
+        if text in self._texts:
+            return self._texts[text]
+        return next((key for prefix, key in self._templates if text.startswith(prefix)), f'text:{text[:40]}')
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        fields = await request.post()
+        result: Any = True
+        if method == 'setWebhook':
+            self.webhook = dict(fields)
+            self.ready.set()
+        elif method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+        elif method.startswith('send'):
+            chat_id = int(fields['chat_id'])
+            self.calls.setdefault(chat_id, []).append((time.perf_counter(), self._classify(method, fields)))
+            self._message_id += 1
+            result = {'message_id': self._message_id, 'date': int(time.time()),
+                      'chat': {'id': chat_id, 'type': 'private'}}
+        return web.json_response({'ok': True, 'result': result})
+
+    async def start(self, port: int) -> web.AppRunner:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', port).start()
+        return runner
+
+
+# EXEC reply when a watched key changed
+NIL_ARRAY = object()
+
+
+class FakeRedis:
+    """In-memory RESP2 server with the commands RedisStorage uses.
+
+    GET, SET [EX], DEL, WATCH/UNWATCH, MULTI/EXEC/DISCARD, AUTH, SELECT and
+    PING. Commands run one at a time on the event loop, so EXEC is atomic.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, tuple] = {}
+        self.versions: Dict[str, int] = {}
+        self.commands = 0
+        self.aborted = 0
+
+    def _lookup(self, key: str):
+        value, expires = self.values.get(key, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            del self.values[key]
+            return None
+        return value
+
+    def _touch(self, key: str):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _apply(self, name: str, args: List[bytes]) -> Any:
+        if name == 'GET':
+            return self._lookup(args[0].decode())
+        if name == 'SET':
+            key, value, expires = args[0].decode(), args[1], None
+            if len(args) >= 4 and args[2].upper() == b'EX':
+                expires = time.monotonic() + int(args[3])
+            self.values[key] = (value, expires)
+            self._touch(key)
+            return 'OK'
+        if name == 'DEL':
+            removed = 0
+            for key in (a.decode() for a in args):
+                if self._lookup(key) is not None:
+                    del self.values[key]
+                    self._touch(key)
+                    removed += 1
+            return removed
+        if name in ('AUTH', 'SELECT'):
+            return 'OK'
+        if name == 'PING':
+            return 'PONG'
+        return RuntimeError(f"ERR unknown command '{name}'")
+
+    @classmethod
+    def _encode(cls, reply: Any) -> bytes:
+        if reply is None:
+            return b'$-1\r\n'
+        if reply is NIL_ARRAY:
+            return b'*-1\r\n'
+        if isinstance(reply, Exception):
+            return b'-%s\r\n' % str(reply).encode()
+        if isinstance(reply, str):
+            return b'+%s\r\n' % reply.encode()
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, bytes):
+            return b'$%d\r\n%s\r\n' % (len(reply), reply)
+        return b'*%d\r\n' % len(reply) + b''.join(cls._encode(r) for r in reply)
+
+    @staticmethod
+    async def _read_command(reader) -> List[bytes]:
+        header = await reader.readline()
+        if not header:
+            raise ConnectionError
+        args = []
+        for _ in range(int(header[1:])):
+            size = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    async def _serve(self, reader, writer):
+        watched: Dict[str, int] = {}
+        queued = None
+        try:
+            while True:
+                args = await self._read_command(reader)
+                self.commands += 1
+                name = args[0].decode().upper()
+                if name == 'WATCH':
+                    watched.update((k.decode(), self.versions.get(k.decode(), 0)) for k in args[1:])
+                    reply = 'OK'
+                elif name == 'UNWATCH':
+                    watched.clear()
+                    reply = 'OK'
+                elif name == 'MULTI':
+                    queued = []
+                    reply = 'OK'
+                elif name == 'DISCARD':
+                    queued = None
+                    watched.clear()
+                    reply = 'OK'
+                elif name == 'EXEC':
+                    if queued is None:
+                        reply = RuntimeError('ERR EXEC without MULTI')
+                    elif any(self.versions.get(k, 0) != v for k, v in watched.items()):
+                        self.aborted += 1
+                        reply = NIL_ARRAY
+                    else:
+                        reply = [self._apply(n, a) for n, a in queued]
+                    queued = None
+                    watched.clear()
+                elif queued is not None:
+                    queued.append((name, args[1:]))
+                    reply = 'QUEUED'
+                else:
+                    reply = self._apply(name, args[1:])
+                writer.write(self._encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, port: int) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._serve, '127.0.0.1', port)
+
+
+async def check_storage(url: str, fields: int = 50) -> Dict[str, int]:
+    """Two RedisStorage clients update one user's data at once; count lost fields."""
+    key = StorageKey(bot_id=1, chat_id=1, user_id=1)
+    stores = [RedisStorage(client=RespClient(url)) for _ in range(2)]
+    try:
+        await stores[0].set_state(key, 'Form:rooms')
+        state = await stores[1].get_state(key)
+
+        async def writer(n: int):
+            for i in range(fields):
+                await stores[n].update_data(key, {f'c{n}_{i}': i})
+        await asyncio.gather(writer(0), writer(1))
+        data = await stores[1].get_data(key)
+        await stores[0].set_state(key, None)
+        await stores[0].set_data(key, {})
+        cleared = await stores[1].get_state(key) is None and await stores[1].get_data(key) == {}
+    finally:
+        for store in stores:
+            await store.close()
+    return {'storage_lost_fields': 2 * fields - len(data),
+            'storage_roundtrip_ok': int(state == 'Form:rooms' and cleared)}
+
+
+def _update(update_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'}
+    return {'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': int(time.time()), 'text': text,
+        'chat': {'id': user_id, 'type': 'private'}, 'from': user,
+    }}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def run(users: int, workers: int, timeout: float, storage: str = 'redis') -> Dict[str, Any]:
+    api = FakeTelegramAPI()
+    api_port, hook_port = _free_port(), _free_port()
+    api_runner = await api.start(api_port)
+    workdir = tempfile.mkdtemp(prefix='webhook-bench-')
+    storage_checks: Dict[str, int] = {}
+    redis = redis_server = None
+    if storage == 'redis':
+        redis, redis_port = FakeRedis(), _free_port()
+        redis_server = await redis.start(redis_port)
+        redis_url = f'redis://127.0.0.1:{redis_port}/0'
+        storage_checks = await check_storage(redis_url)
+
+    env = dict(os.environ, TELEGRAM_BOT_TOKEN=TOKEN, TELEGRAM_API_URL=f'http://127.0.0.1:{api_port}',
+               BOT_MODE='webhook', WEBHOOK_URL=f'http://127.0.0.1:{hook_port}', WEBHOOK_SECRET=SECRET,
+               WEBHOOK_HOST='127.0.0.1', WEBHOOK_PORT=str(hook_port), WEBHOOK_WORKERS=str(workers),
+               WEBHOOK_DRAIN_TIMEOUT=str(timeout), AI_PROVIDER='mock', FSM_STORAGE=storage,
+               FSM_SQLITE_PATH=os.path.join(workdir, 'fsm.sqlite3'),
+               LLM_CACHE_ENABLED='0', ARTIFACT_CACHE_ENABLED='0', METRICS_PORT='0',
+               OUTPUT_DIR=workdir, JOB_QUEUE_SIZE=str(users), JOB_DEADLINE=str(timeout))
+    if redis_server is not None:
+        env['FSM_REDIS_URL'] = redis_url
+    proc = await asyncio.create_subprocess_exec(sys.executable, '-m', 'bot.main', env=env)
+    try:
+        await asyncio.wait_for(api.ready.wait(), 60)
+        url = api.webhook['url']
+        headers = {'X-Telegram-Bot-Api-Secret-Token': SECRET}
+
+        user_ids = [1000 + i for i in range(users)]
+        started: Dict[int, float] = {}
+        update_id = 0
+        rejected = 0
+        t0 = time.perf_counter()
+        async with ClientSession() as session:
+            # Step by step across users, so updates of different users interleave
+            for text, _ in STEPS:
+                for uid in user_ids:
+                    update_id += 1
+                    started.setdefault(uid, time.perf_counter())
+                    async with session.post(url, json=_update(update_id, uid, text), headers=headers) as resp:
+                        rejected += resp.status != 200
+        posted = time.perf_counter()
+
+        proc.send_signal(signal.SIGTERM)
+        exit_code = await asyncio.wait_for(proc.wait(), timeout + 30)
+        stopped = time.perf_counter()
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        await api_runner.cleanup()
+        if redis_server is not None:
+            redis_server.close()
+            await redis_server.wait_closed()
+
+    latencies, missing, out_of_order = [], 0, 0
+    for uid in user_ids:
+        got = [kind for _, kind in api.calls.get(uid, []) if kind not in OPTIONAL]
+        if got != EXPECTED:
+            if sorted(got) == sorted(EXPECTED):
+                out_of_order += 1
+            else:
+                missing += 1
+                print(f"user {uid}: got {got}", file=sys.stderr)
+        photos = [ts for ts, kind in api.calls.get(uid, []) if kind == 'sendPhoto']
+        if photos:
+            latencies.append(photos[-1] - started[uid])
+
+    return {
+        'users': users,
+        'workers': workers,
+        'storage': storage,
+        'updates': update_id,
+        'rejected': rejected,
+        'post_s': round(posted - t0, 3),
+        'total_s': round(max((ts for calls in api.calls.values() for ts, _ in calls), default=t0) - t0, 3),
+        'shutdown_s': round(stopped - posted, 3),
+        'latency_p50_s': round(_percentile(latencies, 0.5), 3),
+        'latency_p95_s': round(_percentile(latencies, 0.95), 3),
+        'completed': len(latencies),
+        'missing': missing,
+        'out_of_order': out_of_order,
+        'exit_code': exit_code,
+        **storage_checks,
+        **({'redis_commands': redis.commands, 'redis_exec_aborted': redis.aborted} if redis else {}),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--timeout', type=float, default=120.0,
+                        help="drain timeout handed to the bot, in seconds")
+    parser.add_argument('--storage', choices=['redis', 'sqlite', 'memory'], default='redis',
+                        help="FSM storage for the bot (redis uses the in-process stand-in)")
+    parser.add_argument('--output', help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args.users, args.workers, args.timeout, args.storage))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    ok = not result['missing'] and not result['out_of_order'] and not result['rejected'] and result['exit_code'] == 0
+    if args.storage == 'redis':
+        ok = ok and not result['storage_lost_fields'] and result['storage_roundtrip_ok']
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,29 @@
 
 from ai.llm_client import llm_client
+import asyncio
 import json
+import logging
+import os
+import time
+from typing import Optional
 from ai.prompt_templates import SCHEMA_PROMPT
-from schema.validator import validate_and_fill
-from dxf_gen.generator import create_plan
-from preview.renderer import render_preview
-from utils.files import unique_name
-from aiogram.types import Message, FSInputFile
+from ai.solver import ENTRANCES, solve_request, solve_text
+from schema import floor_plans, score_spec
+from schema.repair import repair_spec
+from schema.validator import RoomChecker, failed_rules, validate_and_fill
+from utils.artifacts import artifact_store, spec_hash
+from utils.files import human_size, unique_stem
+from utils.metrics import metrics
+from config import settings
+from dxf_gen.generator import DXF_FORMATS
+from worker import JobExpired, JobSuperseded, QueueFull, generation_executor, job_scheduler
+from worker.jobs import compose_floor_previews, render_artifacts, render_floor_preview, render_plan_dxf
+from aiogram.types import BufferedInputFile, FSInputFile, Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from .strings import STRINGS
 from .keyboards import get_main_keyboard, get_language_keyboard, get_cancel_keyboard
+from .webhook import release_turn
 
 
 class Questionnaire(StatesGroup):
@@ -20,11 +33,277 @@ class Questionnaire(StatesGroup):
     notes = State()
 
 
+def _validate(parsed):
+    """validate_and_fill with timing and per-rule failure counts."""
+    try:
+        with metrics.timer('validation_seconds'):
+            return validate_and_fill(parsed)
+    except ValueError as e:
+        for rule in failed_rules(str(e)):
+            metrics.inc('validation_failures_total', rule=rule)
+        raise
+
+
+def _repair(parsed, error: ValueError):
+    """Fix a spec that failed validation locally; re-raises ``error`` when that is not enough."""
+    if not settings.SPEC_REPAIR:
+        raise error
+    try:
+        validated, fixes = repair_spec(parsed)
+    except ValueError:
+        metrics.inc('spec_repairs_total', result='failed')
+        raise error
+    metrics.inc('spec_repairs_total', result='fixed')
+    logging.getLogger(__name__).info(f"Spec repaired locally: {'; '.join(fixes)}")
+    return validated
+
+
+def _solve(solve, reason: str):
+    """Plan from the local solver, validated like an LLM answer."""
+    with metrics.timer('solver_seconds'):
+        validated = _validate(solve())
+    metrics.inc('solver_plans_total', reason=reason)
+    logging.getLogger(__name__).info(f"Plan made by the local solver ({reason})")
+    return validated
+
+
+async def _plan(ask_llm, solve):
+    """Validated plan from ``ask_llm()``, or from ``solve()`` when the solver is the
+    provider or the LLM fails or is slower than SOLVER_FALLBACK_AFTER."""
+    if settings.AI_PROVIDER == 'solver':
+        return _solve(solve, 'provider')
+    if not settings.SOLVER_FALLBACK:
+        return await ask_llm()
+    try:
+        return await asyncio.wait_for(ask_llm(), settings.SOLVER_FALLBACK_AFTER or None)
+    except asyncio.TimeoutError:
+        error = ValueError(f"The AI did not answer within {settings.SOLVER_FALLBACK_AFTER:g}s.")
+        reason = 'timeout'
+    except Exception as e:
+        error, reason = e, 'error'
+    try:
+        return _solve(solve, reason)
+    except ValueError as e:
+        logging.getLogger(__name__).warning(f"Solver fallback failed: {e}")
+        raise error
+
+
+async def _ask_variant(prompt: str, sampling: dict):
+    """One LLM candidate, validated or repaired locally; the other candidates stand in for retries."""
+    try:
+        parsed = await llm_client.aparse_to_json(prompt, sampling)
+        try:
+            return _validate(parsed)
+        except ValueError as e:
+            validated = _repair(parsed, e)
+            # The raw answer is invalid; do not serve it (and repair it) again
+            await llm_client.ainvalidate(prompt, sampling)
+            return validated
+    except Exception:
+        await llm_client.ainvalidate(prompt, sampling)
+        raise
+
+
+async def _plan_variants(prompt: str, solve):
+    """Up to VARIANT_TOP_K distinct validated plans, best first, as (score, parts, spec).
+
+    VARIANT_COUNT LLM samples are requested at once and the rest are
+    cancelled as soon as VARIANT_TOP_K distinct plans are valid. The solver,
+    with a different entrance per variant, is the provider or makes up for
+    candidates the LLM could not deliver in time.
+    """
+    top_k = max(1, settings.VARIANT_TOP_K)
+    found = {}  # spec hash -> spec, so identical answers count once
+    error = None
+    if settings.AI_PROVIDER != 'solver':
+        tasks = {asyncio.ensure_future(_ask_variant(prompt, {'temperature': settings.VARIANT_TEMPERATURE, 'seed': i}))
+                 for i in range(max(1, settings.VARIANT_COUNT))}
+        wait_for = settings.SOLVER_FALLBACK and settings.SOLVER_FALLBACK_AFTER
+        deadline = time.monotonic() + settings.SOLVER_FALLBACK_AFTER if wait_for else None
+        try:
+            while tasks and len(found) < top_k:
+                timeout = max(0.0, deadline - time.monotonic()) if deadline else None
+                done, tasks = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    error = ValueError(f"The AI did not answer within {settings.SOLVER_FALLBACK_AFTER:g}s.")
+                    break
+                for task in done:
+                    try:
+                        spec = task.result()
+                    except Exception as e:
+                        error = e
+                        metrics.inc('variant_candidates_total', result='invalid')
+                        continue
+                    found.setdefault(spec_hash(spec), spec)
+                    metrics.inc('variant_candidates_total', result='valid')
+        finally:
+            for task in tasks:
+                task.cancel()
+            metrics.inc('variant_candidates_total', len(tasks), result='cancelled')
+    if settings.AI_PROVIDER == 'solver' or settings.SOLVER_FALLBACK:
+        for side in ENTRANCES:
+            if len(found) >= top_k:
+                break
+            try:
+                spec = _solve(lambda: solve(side), 'variant')
+            except ValueError as e:
+                error = error or e
+                continue
+            found.setdefault(spec_hash(spec), spec)
+    if not found:
+        raise error or ValueError("No layout variant could be made.")
+    ranked = sorted((score_spec(spec) + (spec,) for spec in found.values()), key=lambda v: -v[0])
+    return ranked[:top_k]
+
+
+async def _generate(validated, dxf_format: str):
+    """Render DXF + PNG in the worker pool so the event loop keeps serving other users.
+
+    Returns files ready for upload; nothing touches the disk unless archiving is on.
+    """
+    ext = DXF_FORMATS[dxf_format]
+    key = spec_hash(validated) if settings.ARTIFACT_ARCHIVE and settings.ARTIFACT_CACHE_ENABLED else None
+    if key and dxf_format != 'asc':
+        key = f"{key}-{dxf_format}"
+    stem = unique_stem()
+    if key:
+        # First use rebuilds the index from disk, and the reaper may hold the store lock
+        cached = await asyncio.to_thread(artifact_store.lookup, key)
+        metrics.inc('artifact_cache_total', result='hit' if cached else 'miss')
+        if cached:
+            return tuple(FSInputFile(str(p), filename=f"{stem}{p.suffix}") for p in cached)
+    floors = floor_plans(validated)
+    if len(floors) > 1:
+        dxf, png, timings = await _render_floors(validated, floors, dxf_format, stem)
+    else:
+        dxf, png, timings = await generation_executor.run(render_artifacts, validated, dxf_format, stem)
+    if metrics.enabled:
+        for stage, seconds in timings.items():
+            metrics.observe('generation_seconds', seconds, stage=stage)
+        metrics.observe('artifact_bytes', len(dxf), kind='dxf', format=dxf_format)
+        metrics.observe('artifact_bytes', len(png), kind='png')
+    if settings.ARTIFACT_ARCHIVE:
+        _archive(key, dxf, png, ext)
+    return BufferedInputFile(dxf, f"{stem}.{ext}"), BufferedInputFile(png, f"{stem}.png")
+
+
+async def _render_floors(validated, floors, dxf_format: str, stem: str):
+    """The DXF and every floor's preview as parallel worker jobs, then the composite preview.
+
+    Latency is about that of the slowest floor rather than the sum of all.
+    """
+    jobs = [asyncio.ensure_future(generation_executor.run(render_plan_dxf, validated, dxf_format, stem))]
+    jobs += [asyncio.ensure_future(generation_executor.run(render_floor_preview, floor)) for floor in floors]
+    try:
+        (dxf, dxf_seconds), *previews = await asyncio.gather(*jobs)
+    except BaseException:
+        for job in jobs:
+            job.cancel()
+        raise
+    png, compose_seconds = await generation_executor.run(compose_floor_previews, [p for p, _ in previews])
+    return dxf, png, {'dxf': dxf_seconds, 'png': max(s for _, s in previews), 'compose': compose_seconds}
+
+
+def _file_size(file) -> int:
+    return len(file.data) if isinstance(file, BufferedInputFile) else os.path.getsize(file.path)
+
+
+def _sizes_line(lang: str, dxf, png, dxf_format: str) -> str:
+    return STRINGS[lang]['file_sizes'].format(dxf=human_size(_file_size(dxf)), fmt=dxf_format,
+                                              png=human_size(_file_size(png)))
+
+
+# Archive writes still running (kept referenced until they finish)
+_archiving = set()
+
+
+def _archive(key, dxf: bytes, png: bytes, dxf_ext: str):
+    """Save a copy in the artifact store off the event loop, without delaying the upload."""
+    def _done(task):
+        _archiving.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.getLogger(__name__).error(f"Archiving artifacts failed: {task.exception()}")
+
+    task = asyncio.ensure_future(asyncio.to_thread(artifact_store.store, key, dxf, png, dxf_ext))
+    _archiving.add(task)
+    task.add_done_callback(_done)
+
+
+async def _send_artifacts(message: Message, dxf, png, caption=None):
+    t0 = time.perf_counter()
+    await message.answer_document(dxf)
+    t1 = time.perf_counter()
+    if caption:
+        await message.answer_photo(png, caption=caption, parse_mode='HTML')
+    else:
+        await message.answer_photo(png)
+    metrics.observe('upload_seconds', t1 - t0, kind='dxf')
+    metrics.observe('upload_seconds', time.perf_counter() - t1, kind='png')
+
+
+async def _parse(prompt: str, lang: str, status: Message):
+    """Ask the LLM for a plan; streamed with per-room checks and progress when LLM_STREAM is on."""
+    if not settings.LLM_STREAM:
+        return await llm_client.aparse_to_json(prompt)
+
+    last_edit = 0.0
+    editing: Optional[asyncio.Task] = None
+
+    async def on_progress(count):
+        nonlocal last_edit, editing
+        now = time.monotonic()
+        # Telegram throttles edits; never queue more than one
+        if now - last_edit < settings.LLM_PROGRESS_INTERVAL or (editing and not editing.done()):
+            return
+        last_edit = now
+        text = f"{STRINGS[lang]['parsing']}\n\n{STRINGS[lang]['progress_rooms'].format(count=count)}"
+        editing = asyncio.ensure_future(status.edit_text(text))
+        editing.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    checker = RoomChecker(settings.SPEC_REPAIR_TOLERANCE if settings.SPEC_REPAIR else 0.0)
+    return await llm_client.astream_to_json(prompt, checker=checker, on_progress=on_progress)
+
+
+async def _schedule(message: Message, lang: str, pipeline):
+    """Run ``pipeline()`` through the job scheduler (one job per user)."""
+    async def on_queued(position):
+        await message.answer(STRINGS[lang]['queued'].format(position=position))
+
+    user_id = message.from_user.id if message.from_user else message.chat.id
+    # The user's next update may supersede this job, so it must not wait for it
+    release_turn()
+    try:
+        await job_scheduler.submit(user_id, pipeline, on_queued=on_queued)
+    except QueueFull:
+        await message.answer(STRINGS[lang]['busy'])
+    except JobExpired:
+        await message.answer(STRINGS[lang]['expired'])
+    except JobSuperseded:
+        await message.answer(STRINGS[lang]['superseded'])
+
+
 async def get_lang(state: FSMContext):
     data = await state.get_data()
     return data.get('lang', 'uz')
 
 
+# User settings that survive /cancel and finished questionnaires
+_PREFS = ('lang', 'dxf_format', 'variants')
+
+
+async def _reset(state: FSMContext) -> dict:
+    """Clear state and answers but keep user settings; returns the old data."""
+    data = await state.get_data()
+    await state.clear()
+    await state.update_data({k: data[k] for k in _PREFS if k in data})
+    return data
+
+
+def _dxf_format(data: dict) -> str:
+    fmt = data.get('dxf_format', settings.DXF_FORMAT)
+    return fmt if fmt in DXF_FORMATS else 'asc'
+
+
 async def start(message: Message, state: FSMContext):
     lang = await get_lang(state)
     await message.answer(STRINGS[lang]['welcome'], reply_markup=get_main_keyboard(lang))
@@ -32,11 +311,36 @@ async def start(message: Message, state: FSMContext):
 
 async def cmd_cancel(message: Message, state: FSMContext):
     lang = await get_lang(state)
-    await state.clear()
-    await state.update_data(lang=lang)
+    await _reset(state)
     await message.answer(STRINGS[lang]['canceled'], reply_markup=get_main_keyboard(lang))
 
 
+async def cmd_format(message: Message, state: FSMContext):
+    """/format [asc|bin|zip]: show or change the user's DXF format."""
+    data = await state.get_data()
+    lang = data.get('lang', 'uz')
+    args = (message.text or '').split()[1:]
+    fmt = args[0].lower() if args else ''
+    if fmt not in DXF_FORMATS:
+        return await message.answer(STRINGS[lang]['format_current'].format(fmt=_dxf_format(data)))
+    await state.update_data(dxf_format=fmt)
+    await message.answer(STRINGS[lang]['format_set'].format(fmt=fmt))
+
+
+async def cmd_variants(message: Message, state: FSMContext):
+    """/variants [on|off]: several ranked layouts per request instead of one."""
+    data = await state.get_data()
+    lang = data.get('lang', 'uz')
+    args = (message.text or '').split()[1:]
+    arg = args[0].lower() if args else ''
+    if arg not in ('on', 'off'):
+        key = 'variants_on' if data.get('variants') else 'variants_off'
+        return await message.answer(STRINGS[lang][key].format(top_k=settings.VARIANT_TOP_K))
+    await state.update_data(variants=arg == 'on')
+    key = 'variants_on' if arg == 'on' else 'variants_off'
+    await message.answer(STRINGS[lang][key].format(top_k=settings.VARIANT_TOP_K))
+
+
 async def create_project(message: Message, state: FSMContext):
     lang = await get_lang(state)
     await state.set_state(Questionnaire.land_dims)
@@ -74,57 +378,124 @@ async def process_notes_and_gen(message: Message, state: FSMContext):
     lang = await get_lang(state)
     if message.text == STRINGS[lang]['btn_cancel']:
         return await cmd_cancel(message, state)
-    data = await state.get_data()
-    await state.clear()
-    await state.update_data(lang=lang)
+    data = await _reset(state)
+    dxf_format = _dxf_format(data)
 
     user_requirements = f"Land: {data['land_dims']}. Floors: {data['floors']}. Rooms: {data['rooms']}. Notes: {message.text}"
     prompt = f"{SCHEMA_PROMPT}\n\nUSER REQUIREMENTS:\n{user_requirements}"
-    
-    await message.answer(STRINGS[lang]['parsing'], reply_markup=get_main_keyboard(lang))
-    
+    answers = {'land_dims': data['land_dims'], 'floors': data['floors'], 'rooms': data['rooms'],
+               'notes': message.text or ''}
+    variants = data.get('variants', False)
+    await _schedule(message, lang,
+                    lambda: _questionnaire_pipeline(message, lang, prompt, dxf_format, answers, variants))
+
+
+async def _ask_llm(prompt: str, lang: str, status: Message):
+    """LLM plan, feeding validation errors back for up to two retries."""
     max_retries = 2
     last_error = ""
-    import logging
     logger = logging.getLogger(__name__)
     
     for attempt in range(max_retries + 1):
+        if attempt > 0:
+            attempt_prompt = f"{prompt}\n\nERROR IN PREVIOUS ATTEMPT:\n{last_error}\nFIX THESE ERRORS AND RETURN VALID JSON."
+        else:
+            attempt_prompt = prompt
         try:
-            if attempt > 0:
-                retry_prompt = f"{prompt}\n\nERROR IN PREVIOUS ATTEMPT:\n{last_error}\nFIX THESE ERRORS AND RETURN VALID JSON."
-                parsed = llm_client.parse_to_json(retry_prompt)
-            else:
-                parsed = llm_client.parse_to_json(prompt)
+            parsed = await _parse(attempt_prompt, lang, status)
             
             # LOG THE RAW AI RESPONSE
             logger.info(f"AI Response (Attempt {attempt+1}):\n{json.dumps(parsed, indent=2)}")
                 
-            validated = validate_and_fill(parsed)
-            break
+            try:
+                validated = _validate(parsed)
+            except ValueError as e:
+                validated = _repair(parsed, e)
+                await llm_client.ainvalidate(attempt_prompt)
+                if attempt < max_retries:
+                    metrics.inc('llm_calls_saved_total')
+                    logger.info(f"Local repair saved an LLM retry (Attempt {attempt+1})")
+            metrics.observe('llm_attempts', attempt + 1)
+            return validated
         except Exception as e:
+            # Never serve a cached answer that failed validation again
+            await llm_client.ainvalidate(attempt_prompt)
             last_error = str(e)
             logger.warning(f"Validation failed (Attempt {attempt+1}): {last_error}")
             if attempt == max_retries:
-                await message.answer(STRINGS[lang]['error_parse'].format(error=last_error))
-                return
-            continue
+                metrics.observe('llm_attempts', attempt + 1)
+                raise ValueError(last_error)
 
-    # Generate files
-    dxf_path = unique_name('dxf')
-    png_path = unique_name('png')
-    create_plan(validated, str(dxf_path))
-    render_preview(validated, str(png_path))
 
+def _room_report(lang: str, validated) -> str:
+    report = f"<b>{STRINGS[lang]['room_dims']}</b>\n"
+    floors = floor_plans(validated)
+    for floor in floors:
+        if len(floors) > 1:
+            report += f"\n<b>{floor['floor_name']}</b>\n"
+        for r in floor['rooms']:
+            name = r.get('name', r.get('type', 'room'))
+            report += f"• {name}: {r['width']}m x {r['height']}m\n"
+    return report
+
+
+async def _variants_pipeline(message: Message, lang: str, prompt: str, dxf_format: str, solve, with_rooms: bool):
+    """Variant mode: rank candidate plans on their spec, then render and send only the best ones."""
+    await message.answer(STRINGS[lang]['parsing'])
+    try:
+        ranked = await _plan_variants(prompt, solve)
+    except Exception as e:
+        await message.answer(STRINGS[lang]['error_parse'].format(error=str(e)))
+        return
+
+    await message.answer(STRINGS[lang]['generating_variants'].format(count=len(ranked)))
+    jobs = [asyncio.ensure_future(_generate(spec, dxf_format)) for _, _, spec in ranked]
+    try:
+        files = await asyncio.gather(*jobs)
+    except Exception as e:
+        for job in jobs:
+            job.cancel()
+        logging.getLogger(__name__).error(f"Generation failed: {e}")
+        await message.answer(STRINGS[lang]['error_generate'].format(error=str(e)))
+        return
+
+    for n, ((score, parts, spec), (dxf, png)) in enumerate(zip(ranked, files), 1):
+        caption = STRINGS[lang]['variant_caption'].format(
+            n=n, count=len(ranked), score=round(score * 100), area=round(parts['area_fit'] * 100),
+            corridor=round(parts['corridor_share'] * 100), windows=parts['exterior_windows'])
+        if with_rooms:
+            caption += f"\n\n{_room_report(lang, spec)}"
+        caption += f"\n{_sizes_line(lang, dxf, png, dxf_format)}"
+        await _send_artifacts(message, dxf, png, caption=caption)
+
+
+async def _questionnaire_pipeline(message: Message, lang: str, prompt: str, dxf_format: str, answers: dict,
+                                  variants: bool = False):
+    if variants:
+        solve = lambda side=None: solve_request(**answers, entrance=side)
+        return await _variants_pipeline(message, lang, prompt, dxf_format, solve, with_rooms=True)
+    status = await message.answer(STRINGS[lang]['parsing'], reply_markup=get_main_keyboard(lang))
+    logger = logging.getLogger(__name__)
+    try:
+        validated = await _plan(lambda: _ask_llm(prompt, lang, status), lambda: solve_request(**answers))
+    except Exception as e:
+        await message.answer(STRINGS[lang]['error_parse'].format(error=str(e)))
+        return
+
+    # Generate files
     await message.answer(STRINGS[lang]['generating'])
+    try:
+        dxf, png = await _generate(validated, dxf_format)
+    except Exception as e:
+        logger.error(f"Generation failed: {e}")
+        await message.answer(STRINGS[lang]['error_generate'].format(error=str(e)))
+        return
     
     # Format report
-    report = f"<b>{STRINGS[lang]['room_dims']}</b>\n"
-    for r in validated['rooms']:
-        name = r.get('name', r.get('type', 'room'))
-        report += f"• {name}: {r['width']}m x {r['height']}m\n"
-    
-    await message.answer_document(FSInputFile(str(dxf_path)))
-    await message.answer_photo(FSInputFile(str(png_path)), caption=report, parse_mode='HTML')
+    report = _room_report(lang, validated)
+    report += f"\n{_sizes_line(lang, dxf, png, dxf_format)}"
+
+    await _send_artifacts(message, dxf, png, caption=report)
 
 
 async def show_help(message: Message, state: FSMContext):
@@ -134,7 +505,8 @@ async def show_help(message: Message, state: FSMContext):
 # ... (rest of the file simplified for replacement) ...
 
 async def handle_message(message: Message, state: FSMContext):
-    lang = await get_lang(state)
+    data = await state.get_data()
+    lang = data.get('lang', 'uz')
     
     # Check for keyboard buttons
     if message.text == STRINGS[lang]['btn_help']:
@@ -153,21 +525,45 @@ async def handle_message(message: Message, state: FSMContext):
     # Legacy handling or free text if not in state
     user_text = message.text or ''
     prompt = f"{SCHEMA_PROMPT}\nUser Request: {user_text}"
-    await message.answer(STRINGS[lang]['parsing'])
+    dxf_format = _dxf_format(data)
+    variants = data.get('variants', False)
+    await _schedule(message, lang,
+                    lambda: _free_text_pipeline(message, lang, prompt, dxf_format, user_text, variants))
+
+
+async def _free_text_pipeline(message: Message, lang: str, prompt: str, dxf_format: str, user_text: str,
+                              variants: bool = False):
+    if variants:
+        solve = lambda side=None: solve_text(user_text, entrance=side)
+        return await _variants_pipeline(message, lang, prompt, dxf_format, solve, with_rooms=False)
+    status = await message.answer(STRINGS[lang]['parsing'])
+
+    async def ask_llm():
+        try:
+            parsed = await _parse(prompt, lang, status)
+            try:
+                return _validate(parsed)
+            except ValueError as e:
+                validated = _repair(parsed, e)
+                await llm_client.ainvalidate(prompt)
+                return validated
+        except Exception:
+            await llm_client.ainvalidate(prompt)
+            raise
+
     try:
-        parsed = llm_client.parse_to_json(prompt)
-        validated = validate_and_fill(parsed)
+        validated = await _plan(ask_llm, lambda: solve_text(user_text))
     except Exception as e:
         await message.answer(STRINGS[lang]['error_parse'].format(error=str(e)))
         return
 
     # Generate files
-    dxf_path = unique_name('dxf')
-    png_path = unique_name('png')
-    create_plan(validated, str(dxf_path))
-    render_preview(validated, str(png_path))
-
     await message.answer(STRINGS[lang]['generating'])
-    await message.answer_document(FSInputFile(str(dxf_path)))
-    await message.answer_photo(FSInputFile(str(png_path)))
+    try:
+        dxf, png = await _generate(validated, dxf_format)
+    except Exception as e:
+        await message.answer(STRINGS[lang]['error_generate'].format(error=str(e)))
+        return
+
+    await _send_artifacts(message, dxf, png, caption=_sizes_line(lang, dxf, png, dxf_format))
 
@@ -1,48 +1,59 @@
 
+import asyncio
 import logging
 import os
 from aiogram import Bot, Dispatcher
+from aiogram.client.bot import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.filters import Command
 from aiogram.types import Message
 from aiogram import Router
 from dotenv import load_dotenv
 from config import settings
 from bot import handlers
+from bot.storage import build_storage
+from worker import generation_executor
+from ai.llm_client import llm_client
+from utils.artifacts import artifact_store
+from utils.metrics import start_metrics_server
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
-async def main():
-    token = os.getenv('TELEGRAM_BOT_TOKEN', settings.TELEGRAM_BOT_TOKEN)
-    if not token:
-        logging.error('TELEGRAM_BOT_TOKEN not set!')
-        print("\n[ERROR] TELEGRAM_BOT_TOKEN kiritilmagan.\n")
-        print(".env faylini to‘ldiring. BotFather’dan token oling va .env faylga quyidagicha yozing:")
-        print("TELEGRAM_BOT_TOKEN=your_token_here")
-        print("\nBotni ishga tushirish uchun .env faylni to‘ldirib, run.py ni qayta ishga tushiring.")
-        return
+def create_bot(token: str) -> Bot:
+    """Bot with HTML parse mode, talking to TELEGRAM_API_URL when it is set."""
+    session = None
+    if settings.TELEGRAM_API_URL:
+        # Local Bot API server or a fake one for end-to-end tests
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL))
+    return Bot(token=token, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
 
-    from aiogram.client.bot import DefaultBotProperties
+async def set_commands(bot: Bot):
     from aiogram.types import BotCommand
     from bot.strings import STRINGS
 
-    bot = Bot(token=token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-    
     # Set Commands Menu
     commands = [
         BotCommand(command="start", description=STRINGS['uz']['cmd_start']),
         BotCommand(command="yordam", description=STRINGS['uz']['cmd_help']),
+        BotCommand(command="format", description=STRINGS['uz']['cmd_format']),
+        BotCommand(command="variants", description=STRINGS['uz']['cmd_variants']),
     ]
     await bot.set_my_commands(commands)
 
-    dp = Dispatcher(storage=MemoryStorage())
+
+def build_dispatcher() -> Dispatcher:
+    dp = Dispatcher(storage=build_storage())
     router = Router()
 
     router.message.register(handlers.start, Command("start"))
     router.message.register(handlers.show_help, Command("yordam"))
     router.message.register(handlers.cmd_cancel, Command("cancel"))
+    router.message.register(handlers.cmd_format, Command("format"))
+    router.message.register(handlers.cmd_variants, Command("variants"))
     
     # Questionnaire Flow
     router.message.register(handlers.process_dims, handlers.Questionnaire.land_dims)
@@ -53,9 +64,41 @@ async def main():
     # Generic Messages
     router.message.register(handlers.handle_message)
     dp.include_router(router)
+    return dp
+
+
+async def main():
+    token = os.getenv('TELEGRAM_BOT_TOKEN', settings.TELEGRAM_BOT_TOKEN)
+    if not token:
+        logging.error('TELEGRAM_BOT_TOKEN not set!')
+        print("\n[ERROR] TELEGRAM_BOT_TOKEN kiritilmagan.\n")
+        print(".env faylini to‘ldiring. BotFather’dan token oling va .env faylga quyidagicha yozing:")
+        print("TELEGRAM_BOT_TOKEN=your_token_here")
+        print("\nBotni ishga tushirish uchun .env faylni to‘ldirib, run.py ni qayta ishga tushiring.")
+        return
+
+    if settings.BOT_MODE == 'webhook':
+        from bot.webhook import run_webhook
+        await run_webhook(token)
+        return
+
+    bot = create_bot(token)
+    await set_commands(bot)
+    dp = build_dispatcher()
 
-    await dp.start_polling(bot)
+    # Warm up DXF/PNG workers before the first request arrives
+    await generation_executor.start()
+    metrics_runner = await start_metrics_server() if settings.METRICS_PORT else None
+    reaper = asyncio.create_task(artifact_store.run_reaper()) if settings.ARTIFACT_ARCHIVE else None
+    try:
+        await dp.start_polling(bot)
+    finally:
+        if reaper is not None:
+            reaper.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await generation_executor.shutdown()
+        await llm_client.close()
 
 if __name__ == '__main__':
-    import asyncio
     asyncio.run(main())
@@ -0,0 +1,372 @@
+"""Persistent FSM storage backends for the dispatcher.
+
+State and data are stored under separate keys so each can expire on its own:
+a questionnaire abandoned half way disappears after FSM_STATE_TTL, while the
+user's data (language, last answers) lives for FSM_DATA_TTL since its last
+write. Values are compact JSON; every read or write is atomic on its own and
+``update_data`` merges in one transaction, so several bot processes can share
+one database or Redis server.
+"""
+import abc
+import asyncio
+import contextlib
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Union
+from urllib.parse import unquote, urlparse
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+def _dumps(data: Mapping[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class _KeyValueStorage(BaseStorage):
+    """FSM storage on top of get/set/delete of string values with a TTL."""
+
+    def __init__(self, key_builder: Optional[KeyBuilder] = None, state_ttl: Optional[float] = None,
+                 data_ttl: Optional[float] = None):
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.state_ttl = state_ttl or settings.FSM_STATE_TTL
+        self.data_ttl = data_ttl or settings.FSM_DATA_TTL
+
+    @abc.abstractmethod
+    async def _get(self, key: str) -> Optional[str]:
+        """Value of ``key``, None when missing or expired."""
+
+    @abc.abstractmethod
+    async def _set(self, key: str, value: str, ttl: float):
+        """Store ``value`` under ``key`` for ``ttl`` seconds."""
+
+    @abc.abstractmethod
+    async def _delete(self, key: str):
+        """Remove ``key`` (no error when missing)."""
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        name = _state_name(state)
+        skey = self.key_builder.build(key, 'state')
+        if name is None:
+            await self._delete(skey)
+        else:
+            await self._set(skey, name, self.state_ttl)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._get(self.key_builder.build(key, 'state'))
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        dkey = self.key_builder.build(key, 'data')
+        if not data:
+            await self._delete(dkey)
+        else:
+            await self._set(dkey, _dumps(data), self.data_ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        raw = await self._get(self.key_builder.build(key, 'data'))
+        return json.loads(raw) if raw else {}
+
+
+class SQLiteStorage(_KeyValueStorage):
+    """FSM storage in a local SQLite file (WAL, safe for several processes).
+
+    Queries run on one background thread so a locked database never stalls
+    the event loop.
+    """
+
+    # Purge expired rows every this many writes
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: Union[str, Path, None] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path or settings.FSM_SQLITE_PATH)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fsm-sqlite')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS fsm ('
+                         'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL) WITHOUT ROWID')
+            conn.execute('DELETE FROM fsm WHERE expires < ?', (time.time(),))
+            self._conn = conn
+        return self._conn
+
+    async def _call(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _get_sync(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT value FROM fsm WHERE key = ? AND expires >= ?', (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set_sync(self, key: str, value: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO fsm (key, value, expires) VALUES (?, ?, ?)',
+                         (key, value, now + ttl))
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                conn.execute('DELETE FROM fsm WHERE expires < ?', (now,))
+
+    def _update_sync(self, key: str, data: Mapping[str, Any], ttl: float) -> Dict[str, Any]:
+        # Read-modify-write in one transaction so concurrent processes never lose a field
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT value FROM fsm WHERE key = ? AND expires >= ?', (key, now)).fetchone()
+                merged = json.loads(row[0]) if row else {}
+                merged.update(data)
+                if merged:
+                    conn.execute('INSERT OR REPLACE INTO fsm (key, value, expires) VALUES (?, ?, ?)',
+                                 (key, _dumps(merged), now + ttl))
+                else:
+                    conn.execute('DELETE FROM fsm WHERE key = ?', (key,))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        return merged
+
+    def _delete_sync(self, key: str):
+        with self._lock:
+            self._connect().execute('DELETE FROM fsm WHERE key = ?', (key,))
+
+    async def _get(self, key: str) -> Optional[str]:
+        return await self._call(self._get_sync, key)
+
+    async def _set(self, key: str, value: str, ttl: float):
+        await self._call(self._set_sync, key, value, ttl)
+
+    async def _delete(self, key: str):
+        await self._call(self._delete_sync, key)
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> Dict[str, Any]:
+        merged = await self._call(self._update_sync, self.key_builder.build(key, 'data'), data, self.data_ttl)
+        return merged.copy()
+
+    async def close(self) -> None:
+        def _close():
+            with self._lock:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+        await self._call(_close)
+        self._executor.shutdown(wait=False)
+
+
+class RespError(RuntimeError):
+    """Error reply from a Redis-protocol server."""
+
+
+# Failures after which a pooled connection is dropped and the command retried on a new one
+_CONNECTION_ERRORS = (ConnectionError, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError)
+
+
+class RespClient:
+    """Minimal RESP2 client: enough for GET/SET/DEL and WATCH/MULTI/EXEC on any
+    Redis-compatible server.
+
+    Keeps a small pool of connections, one command in flight per connection.
+    """
+
+    def __init__(self, url: Optional[str] = None, pool_size: int = 4, timeout: float = 5.0):
+        parsed = urlparse(url or settings.FSM_REDIS_URL)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle: List = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _open(self):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        conn = (reader, writer)
+        if self.password:
+            auth = [self.username, self.password] if self.username else [self.password]
+            await self._roundtrip(conn, 'AUTH', *auth)
+        if self.db:
+            await self._roundtrip(conn, 'SELECT', str(self.db))
+        return conn
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            out.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        return b''.join(out)
+
+    async def _read(self, reader):
+        line = await reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode('utf-8')
+        if kind == b'-':
+            raise RespError(rest.decode('utf-8'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            size = int(rest)
+            if size < 0:
+                return None
+            data = await reader.readexactly(size + 2)
+            return data[:-2].decode('utf-8')
+        if kind == b'*':
+            count = int(rest)
+            return None if count < 0 else [await self._read(reader) for _ in range(count)]
+        raise ConnectionError(f"unexpected reply {line[:20]!r}")
+
+    async def _roundtrip(self, conn, *args):
+        reader, writer = conn
+        writer.write(self._encode(args))
+        await writer.drain()
+        return await asyncio.wait_for(self._read(reader), self.timeout)
+
+    async def execute(self, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await self._open()
+            try:
+                reply = await self._roundtrip(conn, *args)
+            except RespError:
+                self._idle.append(conn)
+                raise
+            except _CONNECTION_ERRORS:
+                conn[1].close()
+                # One retry on a fresh connection (server restarts, idle timeouts)
+                conn = await self._open()
+                reply = await self._roundtrip(conn, *args)
+            self._idle.append(conn)
+            return reply
+
+    @contextlib.asynccontextmanager
+    async def session(self):
+        """One pooled connection for commands that must share it (WATCH/MULTI/EXEC).
+
+        Yields a coroutine function like ``execute``. The connection is closed
+        instead of pooled when the block fails, so no WATCH or MULTI outlives it.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await self._open()
+
+            async def call(*args):
+                return await self._roundtrip(conn, *args)
+            try:
+                yield call
+            except BaseException:
+                conn[1].close()
+                raise
+            self._idle.append(conn)
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+
+class RedisStorage(_KeyValueStorage):
+    """FSM storage on a Redis-protocol server, shared by all bot processes.
+
+    ``update_data`` is an optimistic WATCH/MULTI/EXEC transaction: when
+    another client writes the key in between, EXEC is refused and the merge
+    is redone on the fresh value.
+    """
+
+    # Attempts before update_data gives up on a key that keeps changing
+    UPDATE_ATTEMPTS = 20
+
+    def __init__(self, url: Optional[str] = None, client: Optional[RespClient] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client or RespClient(url)
+
+    async def _get(self, key: str) -> Optional[str]:
+        return await self.client.execute('GET', key)
+
+    async def _set(self, key: str, value: str, ttl: float):
+        await self.client.execute('SET', key, value, 'EX', max(1, int(ttl)))
+
+    async def _delete(self, key: str):
+        await self.client.execute('DEL', key)
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> Dict[str, Any]:
+        dkey = self.key_builder.build(key, 'data')
+        reconnected = False
+        for attempt in range(self.UPDATE_ATTEMPTS):
+            if attempt:
+                # Jitter so two writers retrying in lockstep do not keep colliding
+                await asyncio.sleep(random.uniform(0, 0.002 * attempt))
+            try:
+                async with self.client.session() as call:
+                    await call('WATCH', dkey)
+                    raw = await call('GET', dkey)
+                    merged = json.loads(raw) if raw else {}
+                    merged.update(data)
+                    await call('MULTI')
+                    if merged:
+                        await call('SET', dkey, _dumps(merged), 'EX', max(1, int(self.data_ttl)))
+                    else:
+                        await call('DEL', dkey)
+                    # Nil reply: the key changed after WATCH and nothing was written
+                    if await call('EXEC') is not None:
+                        return merged.copy()
+            except _CONNECTION_ERRORS:
+                # One retry on a fresh connection; merging the same fields twice is harmless
+                if reconnected:
+                    raise
+                reconnected = True
+        raise RespError(f"update_data: {dkey} kept changing, gave up after {self.UPDATE_ATTEMPTS} attempts")
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+def build_storage(backend: Optional[str] = None) -> BaseStorage:
+    """Storage selected by FSM_STORAGE (memory | sqlite | redis)."""
+    backend = (backend or settings.FSM_STORAGE).lower()
+    if backend == 'sqlite':
+        return SQLiteStorage()
+    if backend == 'redis':
+        return RedisStorage()
+    if backend == 'memory':
+        return MemoryStorage()
+    raise ValueError(f"Unknown FSM_STORAGE '{backend}' (expected memory, sqlite or redis)")
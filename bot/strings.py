@@ -5,6 +5,11 @@ STRINGS = {
         'parsing': "🔍 <b>AI sizning talablaringizni tahlil qilmoqda va professional layout yaratmoqda...</b>",
         'error_parse': "❌ <b>Xatolik yuz berdi:</b>\n\n{error}\n\nIltimos, talablaringizni aniqroq yozing.",
         'generating': "📐 <b>Sizning loyihangiz professional standartlar asosida chizilmoqda...</b>",
+        'error_generate': "❌ <b>Chizmani yaratishda xatolik:</b>\n\n{error}\n\nIltimos, birozdan so'ng qayta urinib ko'ring.",
+        'queued': "⏳ <b>So'rovingiz navbatda:</b> {position}-o'rin. Tez orada boshlaymiz.",
+        'busy': "🚦 <b>Hozir so'rovlar juda ko'p.</b> Iltimos, bir necha daqiqadan so'ng qayta urinib ko'ring.",
+        'expired': "⌛ <b>So'rovingiz navbatda juda uzoq kutib qoldi.</b> Iltimos, qayta yuboring.",
+        'superseded': "↪️ Oldingi so'rov bekor qilindi, eng oxirgisi bajariladi.",
         'btn_help': "❓ Yordam",
         'btn_settings': "⚙️ Sozlamalar",
         'btn_create': "🏗️ Loyiha yaratish",
@@ -19,7 +24,17 @@ STRINGS = {
         'room_dims': "📊 <b>Loyiha hisoboti:</b>",
         'canceled': "❌ Jarayon bekor qilindi.",
         'cmd_start': "Botni ishga tushirish",
-        'cmd_help': "Yordam ko'rsatish"
+        'cmd_help': "Yordam ko'rsatish",
+        'cmd_format': "DXF formatini tanlash",
+        'file_sizes': "📦 <b>Fayllar:</b> DXF {dxf} ({fmt}), PNG {png}",
+        'format_current': "📄 Joriy DXF formati: <b>{fmt}</b>\n\nO'zgartirish: /format asc | bin | zip\n• asc — oddiy DXF\n• bin — ikkilik DXF (kichikroq, tezroq ochiladi)\n• zip — siqilgan DXF (eng kichik fayl)",
+        'format_set': "✅ DXF formati: <b>{fmt}</b>",
+        'progress_rooms': "🧱 Hozircha {count} ta xona joylashtirildi...",
+        'cmd_variants': "Bir nechta reja variantlari",
+        'variants_on': "🔀 Variantlar rejimi <b>yoqilgan</b>: har bir so'rovga eng yaxshi {top_k} ta reja yuboriladi.\n\nO'chirish: /variants off",
+        'variants_off': "🔀 Variantlar rejimi <b>o'chirilgan</b>: har bir so'rovga bitta reja.\n\nYoqish: /variants on",
+        'generating_variants': "📐 <b>Eng yaxshi {count} ta variant chizilmoqda...</b>",
+        'variant_caption': "🔀 <b>Variant {n}/{count}</b> — baho {score}/100\nMaydon mosligi {area}%, koridor {corridor}%, tashqi derazalar {windows} ta"
     },
     'en': {
         'welcome': "<b>Welcome to the Professional Architect Bot!</b>\n\nI generate professional architectural plans (DXF & PNG) based on your requirements and international standards.\n\nPress '🏗️ Create Project' to start.",
@@ -27,6 +42,11 @@ STRINGS = {
         'parsing': "🔍 <b>AI is analyzing your requirements and designing a professional layout...</b>",
         'error_parse': "❌ <b>An error occurred:</b>\n\n{error}\n\nPlease try to be more specific with your requirements.",
         'generating': "📐 <b>Your project is being drafted according to professional standards...</b>",
+        'error_generate': "❌ <b>Failed to draw the plan:</b>\n\n{error}\n\nPlease try again in a moment.",
+        'queued': "⏳ <b>Your request is queued:</b> position {position}. We will start shortly.",
+        'busy': "🚦 <b>Too many requests right now.</b> Please try again in a few minutes.",
+        'expired': "⌛ <b>Your request waited too long in the queue.</b> Please send it again.",
+        'superseded': "↪️ Your previous request was cancelled; only the latest one will be processed.",
         'btn_help': "❓ Help",
         'btn_settings': "⚙️ Settings",
         'btn_create': "🏗️ Create Project",
@@ -41,6 +61,16 @@ STRINGS = {
         'room_dims': "📊 <b>Project Report:</b>",
         'canceled': "❌ Canceled.",
         'cmd_start': "Start the bot",
-        'cmd_help': "Show help"
+        'cmd_help': "Show help",
+        'cmd_format': "Choose the DXF format",
+        'file_sizes': "📦 <b>Files:</b> DXF {dxf} ({fmt}), PNG {png}",
+        'format_current': "📄 Current DXF format: <b>{fmt}</b>\n\nChange it with /format asc | bin | zip\n• asc — plain DXF\n• bin — binary DXF (smaller, opens faster)\n• zip — zipped DXF (smallest file)",
+        'format_set': "✅ DXF format set to <b>{fmt}</b>",
+        'progress_rooms': "🧱 {count} rooms laid out so far...",
+        'cmd_variants': "Several layout variants",
+        'variants_on': "🔀 Variant mode is <b>on</b>: you get the best {top_k} layouts for each request.\n\nTurn off: /variants off",
+        'variants_off': "🔀 Variant mode is <b>off</b>: one layout per request.\n\nTurn on: /variants on",
+        'generating_variants': "📐 <b>Drawing the best {count} variants...</b>",
+        'variant_caption': "🔀 <b>Variant {n}/{count}</b> — score {score}/100\nArea fit {area}%, corridors {corridor}%, exterior windows {windows}"
     }
 }
@@ -0,0 +1,312 @@
+"""Webhook mode: one aiohttp front process and N update worker processes.
+
+The front process only checks the secret header, picks a worker by user id
+and answers Telegram right away. Each worker runs its own Dispatcher, LLM
+client and generation pool, so CPU-bound rendering spreads over all cores.
+A user always lands on the same worker and their updates are handled one at
+a time in the order they arrived, so questionnaire steps never overtake each
+other. Only /cancel skips the line (dropping the user's updates that have
+not started yet), and an update that hands a plan to the job scheduler lets
+the next one start, so a newer request can supersede a long generation.
+
+On SIGTERM/SIGINT the front stops accepting updates, the workers finish
+what they already received (up to WEBHOOK_DRAIN_TIMEOUT) and exit. The
+webhook stays registered, so Telegram keeps new updates until restart.
+"""
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import queue
+import signal
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from config import settings
+from .strings import STRINGS
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+CANCEL_TEXTS = {strings['btn_cancel'] for strings in STRINGS.values()}
+# How often the front checks that its workers are alive
+SUPERVISE_INTERVAL = 1.0
+WORKER_START_TIMEOUT = 120.0
+
+
+def route_key(update: Dict[str, Any]) -> int:
+    """User id the update belongs to (chat id, then update id as fallbacks)."""
+    for field, body in update.items():
+        if not isinstance(body, dict):
+            continue
+        user = body.get('from') or body.get('user')
+        if isinstance(user, dict) and 'id' in user:
+            return int(user['id'])
+        chat = body.get('chat') or (body.get('message') or {}).get('chat')
+        if isinstance(chat, dict) and 'id' in chat:
+            return int(chat['id'])
+    return int(update.get('update_id', 0))
+
+
+def is_cancel(update: Dict[str, Any]) -> bool:
+    """True for /cancel and the cancel button, which do not wait their turn."""
+    text = (update.get('message') or {}).get('text') or ''
+    if text in CANCEL_TEXTS:
+        return True
+    return text.startswith('/') and text.split(maxsplit=1)[0].split('@')[0] == '/cancel'
+
+
+# ---------------------------------------------------------------- worker side
+
+# Turn of the update being handled in this task (unset in polling mode)
+_turn: contextvars.ContextVar[asyncio.Event] = contextvars.ContextVar('webhook_turn')
+
+
+def release_turn():
+    """Let the user's next update start while the current one keeps running.
+
+    Called once an update has done its FSM work and only waits for its
+    generation job, which the next request may supersede.
+    """
+    turn = _turn.get(None)
+    if turn is not None:
+        turn.set()
+
+
+class _Turn:
+    """An update's place in its user's line."""
+    __slots__ = ('previous', 'done', 'started', 'dropped')
+
+    def __init__(self, previous: Optional['_Turn']):
+        self.previous = previous
+        self.done = asyncio.Event()
+        self.started = False
+        self.dropped = False
+
+
+async def _process(dp, bot, update: Dict[str, Any], turn: _Turn):
+    try:
+        if turn.previous is not None:
+            await turn.previous.done.wait()
+        turn.previous = None
+        turn.started = True
+        if turn.dropped:
+            logger.info(f"Update {update.get('update_id')} dropped by /cancel")
+            return
+        _turn.set(turn.done)
+        await dp.feed_raw_update(bot, update)
+    except Exception:
+        logger.exception(f"Update {update.get('update_id')} failed")
+    finally:
+        turn.done.set()
+
+
+async def _worker_loop(index: int, token: str, updates, ready):
+    from ai.llm_client import llm_client
+    from bot.main import build_dispatcher, create_bot
+    from utils.metrics import start_metrics_server
+    from worker import generation_executor
+
+    bot = create_bot(token)
+    dp = build_dispatcher()
+    await generation_executor.start()
+    metrics_runner = None
+    if settings.METRICS_PORT:
+        # One endpoint per worker: METRICS_PORT, METRICS_PORT + 1, ...
+        metrics_runner = await start_metrics_server(port=settings.METRICS_PORT + index)
+
+    loop = asyncio.get_running_loop()
+    parent = multiprocessing.parent_process()
+    last: Dict[int, _Turn] = {}
+    in_flight = set()
+
+    def _done(key, turn, task):
+        in_flight.discard(task)
+        if last.get(key) is turn:
+            del last[key]
+
+    ready.set()
+    logger.info(f"Update worker {index} ready")
+    try:
+        while True:
+            try:
+                item = await loop.run_in_executor(None, updates.get, True, 1.0)
+            except queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    logger.error(f"Update worker {index}: front process is gone, stopping")
+                    break
+                continue
+            if item is None:
+                break
+            key, update = item
+            turn = _Turn(last.get(key))
+            if is_cancel(update):
+                # Skip the line; what the user sent before /cancel and is still waiting is dropped
+                waiting = turn.previous
+                while waiting is not None and not waiting.started:
+                    waiting.dropped = True
+                    waiting = waiting.previous
+                turn.previous = None
+            last[key] = turn
+            task = asyncio.create_task(_process(dp, bot, update, turn))
+            in_flight.add(task)
+            task.add_done_callback(lambda t, k=key, u=turn: _done(k, u, t))
+
+        if in_flight:
+            logger.info(f"Update worker {index}: draining {len(in_flight)} updates")
+            _, pending = await asyncio.wait(set(in_flight), timeout=settings.WEBHOOK_DRAIN_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"Update worker {index}: cancelled {len(pending)} updates after "
+                               f"{settings.WEBHOOK_DRAIN_TIMEOUT:g}s")
+                await asyncio.gather(*pending, return_exceptions=True)
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await generation_executor.shutdown()
+        await llm_client.close()
+        await dp.storage.close()
+        await bot.session.close()
+        logger.info(f"Update worker {index} stopped")
+
+
+def _worker_main(index: int, token: str, updates, ready):
+    # The front decides when workers stop; Ctrl+C reaches the whole group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_worker_loop(index, token, updates, ready))
+
+
+# ----------------------------------------------------------------- front side
+
+class WebhookServer:
+    """aiohttp front that routes updates to worker processes by user id."""
+
+    def __init__(self, token: str, workers: Optional[int] = None):
+        self.token = token
+        self.workers = max(1, workers or settings.WEBHOOK_WORKERS)
+        self._ctx = multiprocessing.get_context('spawn')
+        self._queues = [self._ctx.Queue(maxsize=settings.WEBHOOK_QUEUE_SIZE) for _ in range(self.workers)]
+        self._ready = [self._ctx.Event() for _ in range(self.workers)]
+        self._procs: List[Optional[multiprocessing.Process]] = [None] * self.workers
+        self._draining = False
+
+    def _spawn(self, index: int):
+        self._ready[index].clear()
+        proc = self._ctx.Process(target=_worker_main, name=f'update-worker-{index}',
+                                 args=(index, self.token, self._queues[index], self._ready[index]))
+        proc.start()
+        self._procs[index] = proc
+
+    async def _supervise(self):
+        while not self._draining:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for i, proc in enumerate(self._procs):
+                if not self._draining and proc is not None and not proc.is_alive():
+                    logger.error(f"Update worker {i} exited with {proc.exitcode}, restarting")
+                    self._spawn(i)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if settings.WEBHOOK_SECRET and request.headers.get(SECRET_HEADER) != settings.WEBHOOK_SECRET:
+            return web.Response(status=401)
+        if self._draining:
+            # Telegram retries later, after the restart
+            return web.Response(status=503)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(update, dict):
+            return web.Response(status=400)
+        key = route_key(update)
+        try:
+            self._queues[key % self.workers].put_nowait((key, update))
+        except queue.Full:
+            logger.warning(f"Update worker {key % self.workers} is backed up, asking Telegram to retry")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def run(self):
+        from bot.main import build_dispatcher, create_bot, set_commands
+        from utils.artifacts import artifact_store
+
+        for i in range(self.workers):
+            self._spawn(i)
+
+        app = web.Application()
+        app.router.add_post(settings.WEBHOOK_PATH, self.handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT).start()
+        logger.info(f"Webhook listening on {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}"
+                    f"{settings.WEBHOOK_PATH} with {self.workers} workers")
+
+        bot = create_bot(self.token)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):  # Windows
+                pass
+
+        supervisor = asyncio.create_task(self._supervise())
+        # One reaper for the whole store, not one per worker
+        reaper = asyncio.create_task(artifact_store.run_reaper()) if settings.ARTIFACT_ARCHIVE else None
+        try:
+            await set_commands(bot)
+            # Register the webhook only once every worker can take updates
+            await loop.run_in_executor(None, self._wait_ready, WORKER_START_TIMEOUT)
+            if settings.WEBHOOK_URL:
+                dp = build_dispatcher()
+                await bot.set_webhook(url=settings.WEBHOOK_URL.rstrip('/') + settings.WEBHOOK_PATH,
+                                      secret_token=settings.WEBHOOK_SECRET or None,
+                                      allowed_updates=dp.resolve_used_update_types())
+                await dp.storage.close()
+            else:
+                logger.warning("WEBHOOK_URL is not set; the webhook must be registered by hand")
+            await stop.wait()
+        finally:
+            logger.info("Shutting down: draining update workers")
+            self._draining = True
+            supervisor.cancel()
+            if reaper is not None:
+                reaper.cancel()
+            await runner.cleanup()
+            await self._drain()
+            await bot.session.close()
+
+    def _wait_ready(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        for i, event in enumerate(self._ready):
+            if not event.wait(max(0.0, deadline - time.monotonic())):
+                logger.warning(f"Update worker {i} is not ready after {timeout:g}s")
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        grace = settings.WEBHOOK_DRAIN_TIMEOUT + 10
+
+        async def stop(i: int, q, proc: Optional[multiprocessing.Process]):
+            if proc is None:
+                return
+            if proc.is_alive():
+                try:
+                    # Off the loop: a full queue only takes the stop signal once the worker catches up
+                    await loop.run_in_executor(None, q.put, None, True, settings.WEBHOOK_DRAIN_TIMEOUT)
+                except queue.Full:
+                    logger.warning(f"Update worker {i} is stalled with a full queue, terminating")
+                    proc.terminate()
+            await loop.run_in_executor(None, proc.join, grace)
+            if proc.is_alive():
+                logger.warning(f"Update worker {i} did not stop in {grace:g}s, terminating")
+                proc.terminate()
+                await loop.run_in_executor(None, proc.join, 5)
+
+        await asyncio.gather(*(stop(i, q, proc) for i, (q, proc) in enumerate(zip(self._queues, self._procs))))
+
+
+async def run_webhook(token: str, workers: Optional[int] = None):
+    await WebhookServer(token, workers).run()
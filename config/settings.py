@@ -8,13 +8,87 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent.parent
 OUTPUT_DIR = Path(os.getenv('OUTPUT_DIR', BASE_DIR / 'output'))
 
-# AI provider selection (mock | groq | other)
+# AI provider selection (mock | groq | solver | other); solver lays plans out locally, without an LLM
 AI_PROVIDER = os.getenv('AI_PROVIDER', 'mock')
 AI_API_KEY = os.getenv('AI_API_KEY', '')
 AI_ENDPOINT = os.getenv('AI_ENDPOINT', '')
+AI_MODEL = os.getenv('AI_MODEL', 'llama-3.3-70b-versatile')
+
+# LLM HTTP client (persistent keep-alive session)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', '30'))
+# Stream completions, checking rooms as they arrive; seconds between progress updates
+LLM_STREAM = os.getenv('LLM_STREAM', '1') == '1'
+LLM_PROGRESS_INTERVAL = float(os.getenv('LLM_PROGRESS_INTERVAL', '1.5'))
+# Fix near-valid specs locally before another LLM round trip; largest overlap/overshoot it closes (m)
+SPEC_REPAIR = os.getenv('SPEC_REPAIR', '1') == '1'
+SPEC_REPAIR_TOLERANCE = float(os.getenv('SPEC_REPAIR_TOLERANCE', '0.5'))
+# Use the local layout solver when the LLM fails, or takes longer than this many seconds (0 = wait)
+SOLVER_FALLBACK = os.getenv('SOLVER_FALLBACK', '1') == '1'
+SOLVER_FALLBACK_AFTER = float(os.getenv('SOLVER_FALLBACK_AFTER', '20'))
+# Variant mode (/variants): candidates requested at once, how many are drawn, and their sampling temperature
+VARIANT_COUNT = int(os.getenv('VARIANT_COUNT', '4'))
+VARIANT_TOP_K = int(os.getenv('VARIANT_TOP_K', '2'))
+VARIANT_TEMPERATURE = float(os.getenv('VARIANT_TEMPERATURE', '0.9'))
+
+# LLM response cache (memory LRU + SQLite)
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') == '1'
+LLM_CACHE_PATH = Path(os.getenv('LLM_CACHE_PATH', BASE_DIR / 'cache' / 'llm_cache.sqlite3'))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000'))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', '256'))
 
 # Telegram
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
+# Base URL of a local Bot API server (empty = api.telegram.org)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')
+# How updates arrive: polling (one process) or webhook (aiohttp front + worker processes)
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+
+# Webhook mode
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '2'))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '30'))
+
+# FSM storage for questionnaire state and user data (memory | sqlite | redis)
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite')
+FSM_SQLITE_PATH = Path(os.getenv('FSM_SQLITE_PATH', BASE_DIR / 'cache' / 'fsm.sqlite3'))
+FSM_REDIS_URL = os.getenv('FSM_REDIS_URL', 'redis://127.0.0.1:6379/0')
+FSM_STATE_TTL = float(os.getenv('FSM_STATE_TTL', str(24 * 3600)))
+FSM_DATA_TTL = float(os.getenv('FSM_DATA_TTL', str(90 * 24 * 3600)))
+
+# DXF output format: asc (ASCII), bin (binary DXF) or zip (zipped ASCII)
+DXF_FORMAT = os.getenv('DXF_FORMAT', 'asc').lower()
+
+# Generation workers (DXF/PNG rendering runs in separate processes)
+GEN_WORKERS = int(os.getenv('GEN_WORKERS', '2'))
+GEN_JOB_TIMEOUT = float(os.getenv('GEN_JOB_TIMEOUT', '60'))
+
+# Job scheduler in front of the LLM + generation pipeline
+JOB_CONCURRENCY = int(os.getenv('JOB_CONCURRENCY', '4'))
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', '20'))
+JOB_DEADLINE = float(os.getenv('JOB_DEADLINE', '180'))
+
+# Artifact store in OUTPUT_DIR. Files are generated and uploaded from memory;
+# with archiving off nothing is written there (read-only / tmpfs containers)
+ARTIFACT_ARCHIVE = os.getenv('ARTIFACT_ARCHIVE', '0') == '1'
+# Reuse archived files of identical specs (needs ARTIFACT_ARCHIVE)
+ARTIFACT_CACHE_ENABLED = os.getenv('ARTIFACT_CACHE_ENABLED', '1') == '1'
+ARTIFACT_INDEX_PATH = Path(os.getenv('ARTIFACT_INDEX_PATH', OUTPUT_DIR / 'index.sqlite3'))
+ARTIFACT_MAX_BYTES = int(float(os.getenv('ARTIFACT_MAX_MB', '2000')) * 1024 * 1024)
+ARTIFACT_MAX_AGE = float(os.getenv('ARTIFACT_MAX_AGE_DAYS', '30')) * 24 * 3600
+ARTIFACT_REAP_INTERVAL = float(os.getenv('ARTIFACT_REAP_INTERVAL', '300'))
+
+# Prometheus-style metrics endpoint (0 disables metrics collection entirely)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PREFIX = os.getenv('METRICS_PREFIX', 'cadbot_')
 
 # Defaults and constants
 DEFAULT_TOTAL_AREA = 100.0
@@ -29,4 +103,5 @@ FILENAME_PREFIX = 'plan'
 # Schema definition constants
 ROOM_TYPES = ['bedroom', 'living_room', 'kitchen', 'bathroom', 'hall', 'stairs', 'basement', 'terrace', 'balcony', 'other']
 
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+if ARTIFACT_ARCHIVE:
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -15,3 +15,9 @@ MIN_ROOM_AREAS = {
 MIN_ROOM_WIDTH = 2.0       # allow smaller for stairs/bath
 MIN_CORRIDOR_WIDTH = 0.9   # meters
 DEFAULT_WALL_THICKNESS = 0.3 # meters
+
+# Openings and layout grid
+GRID = 0.1                 # plan coordinates snap to 10 cm
+DOOR_WIDTH = 0.9           # meters
+WINDOW_WIDTH = 1.2         # meters
+WALL_MARGIN = 0.2          # keep openings this far from corners
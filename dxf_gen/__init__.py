@@ -1 +1 @@
-from .generator import create_plan
+from .generator import DXF_FORMATS, create_plan
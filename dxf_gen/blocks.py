@@ -0,0 +1,46 @@
+from typing import Tuple
+from dxf_gen.components import room_rectangle
+from geometry.symbols import SYMBOLS
+
+# Block geometry lives on layer '0' so each INSERT takes the layer it is placed on.
+_ATTR = {'layer': '0'}
+
+
+def _define_block(block, shapes):
+    """Write a geometry.symbols entry (local meters) into a DXF block."""
+    for shape in shapes:
+        kind = shape[0]
+        if kind == 'rect':
+            _, x, y, w, h = shape
+            block.add_lwpolyline(room_rectangle((x, y), w, h), dxfattribs={**_ATTR, 'closed': True})
+        elif kind == 'line':
+            _, x1, y1, x2, y2, lw = shape
+            block.add_line((x1, y1), (x2, y2), dxfattribs={**_ATTR, 'lineweight': lw})
+        elif kind == 'circle':
+            _, cx, cy, r = shape
+            block.add_circle((cx, cy), radius=r, dxfattribs=_ATTR)
+        elif kind == 'ellipse':
+            # ezdxf needs the long axis as major axis
+            _, cx, cy, rx, ry = shape
+            major = (rx, 0) if rx >= ry else (0, ry)
+            block.add_ellipse((cx, cy), major_axis=major, ratio=min(rx, ry) / max(rx, ry), dxfattribs=_ATTR)
+        elif kind == 'arc':
+            _, cx, cy, r, start, end, lw = shape
+            block.add_arc((cx, cy), radius=r, start_angle=start, end_angle=end,
+                          dxfattribs={**_ATTR, 'lineweight': lw})
+
+
+def insert_symbol(msp, name: str, insert: Tuple[float, float], layer: str,
+                  xscale: float = 1.0, yscale: float = 1.0, rotation: float = 0.0):
+    """Place a library symbol, defining its block on first use in the document."""
+    doc = msp.doc
+    if name not in doc.blocks:
+        _define_block(doc.blocks.new(name=name), SYMBOLS[name])
+    attribs = {'layer': layer}
+    if xscale != 1.0:
+        attribs['xscale'] = xscale
+    if yscale != 1.0:
+        attribs['yscale'] = yscale
+    if rotation:
+        attribs['rotation'] = rotation
+    return msp.add_blockref(name, insert, dxfattribs=attribs)
@@ -0,0 +1,2 @@
+from .walls import WallRun, build_wall_network, wall_rectangles
+from .plan import PlanGeometry, build_plan_geometry
@@ -0,0 +1,302 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from config.standards import DOOR_WIDTH, WINDOW_WIDTH
+from geometry.walls import build_wall_network, wall_rectangles
+
+# All primitives are in *sheet meters*: the sheet is laid out as if drawn at
+# 1:100, so 1 unit is 1 m of building or 10 mm of paper (an A3 sheet is
+# 42.0 x 29.7). Building coordinates are additionally multiplied by the plan
+# scale (2.0 at 1:50). The DXF backend writes these numbers in mm (x1000),
+# the PNG backend plots them as they are.
+
+
+class Rect(NamedTuple):
+    layer: str
+    x: float
+    y: float
+    w: float
+    h: float
+    weight: int = 0
+
+
+class Wall(NamedTuple):
+    """One wall run: the band (x, y, w, h) and the (x, y, w, h) pieces of it to hatch."""
+    x: float
+    y: float
+    w: float
+    h: float
+    exterior: bool
+    pieces: Tuple[Tuple[float, float, float, float], ...] = ()
+
+
+class Line(NamedTuple):
+    layer: str
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    weight: int = 0
+
+
+class Circle(NamedTuple):
+    layer: str
+    x: float
+    y: float
+    r: float
+
+
+class Symbol(NamedTuple):
+    """Instance of a geometry.symbols entry (a DXF block)."""
+    name: str
+    layer: str
+    x: float
+    y: float
+    sx: float
+    sy: float
+    rotation: float = 0.0
+
+
+class Label(NamedTuple):
+    layer: str
+    x: float
+    y: float
+    text: str
+    height: float
+    align: str = 'left'      # 'left' (baseline) or 'center' (middle)
+    masked: bool = False
+    bold: bool = False
+
+
+class Dim(NamedTuple):
+    """Aligned dimension; ``offset`` is measured to the left of p1 -> p2."""
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    offset: float
+    text: str
+
+
+class Sheet(NamedTuple):
+    name: str
+    width: float
+    height: float
+
+
+class PlanGeometry(NamedTuple):
+    sheet: Sheet
+    scale: float
+    scale_label: str
+    primitives: Tuple
+
+
+SHEETS = {
+    'A3': Sheet('A3', 42.0, 29.7),
+    'A2': Sheet('A2', 59.4, 42.0),
+    'A1': Sheet('A1', 84.1, 59.4),
+    'A0': Sheet('A0', 118.9, 84.1),
+}
+# Tried in order; the first one where the plan fits is used
+LAYOUTS = [('A3', 2.0), ('A3', 1.0), ('A2', 1.0), ('A1', 1.0), ('A1', 0.5), ('A0', 0.5), ('A0', 0.25)]
+
+MARGINS = (2.0, 0.5, 0.5, 0.5)   # GOST frame 20/5/5/5 mm: left, right, top, bottom
+SHTAMP = (18.5, 5.5)             # 185x55 mm title block
+AXIS_MARGIN = 1.5                # room for axis bubbles around the plan
+DIM_SPACE = 2.5                  # room for dimension chains below the plan
+FONT_MAIN, FONT_SUB = 0.35, 0.25  # 3.5 / 2.5 mm lettering
+
+# Building dimensions (meters, before plan scale)
+WALL_THICKNESS = 0.12
+FURNITURE_INSET = 0.6
+STAIR_STEPS = 15
+
+_CACHE: 'OrderedDict[str, PlanGeometry]' = OrderedDict()
+_CACHE_SIZE = 16
+
+
+def select_layout(land_w: float, land_h: float) -> Tuple[Sheet, float]:
+    """Pick the smallest sheet and largest scale that fits the land."""
+    ml, mr, mt, mb = MARGINS
+    for name, scale in LAYOUTS:
+        sheet = SHEETS[name]
+        avail_w = sheet.width - ml - mr - SHTAMP[0] - 2 * AXIS_MARGIN
+        avail_h = sheet.height - mt - mb - AXIS_MARGIN - DIM_SPACE
+        if land_w * scale <= avail_w and land_h * scale <= avail_h:
+            return sheet, scale
+    name, scale = LAYOUTS[-1]
+    return SHEETS[name], scale
+
+
+def build_plan_geometry(spec: Dict[str, Any], cache_key: Optional[str] = None) -> PlanGeometry:
+    """Turn a validated spec into drawing primitives (cached per spec hash)."""
+    if cache_key is None:
+        from utils.artifacts import spec_hash
+        cache_key = spec_hash(spec)
+    geom = _CACHE.get(cache_key)
+    if geom is not None:
+        _CACHE.move_to_end(cache_key)
+        return geom
+    geom = _build(spec)
+    _CACHE[cache_key] = geom
+    while len(_CACHE) > _CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return geom
+
+
+def _build(spec: Dict[str, Any]) -> PlanGeometry:
+    land_w = float(spec.get('land_width', 10.0))
+    land_h = float(spec.get('land_height', 10.0))
+    sheet, scale = select_layout(land_w, land_h)
+    scale_label = f"1:{round(100 / scale)}"
+    ml, mr, mt, mb = MARGINS
+
+    # Top-Left Positioning
+    ox = ml + AXIS_MARGIN
+    oy = sheet.height - mt - AXIS_MARGIN - land_h * scale
+
+    prims: List[Any] = []
+    add = prims.append
+
+    add(Rect('A-TITLE-BLOCK', ml, mb, sheet.width - ml - mr, sheet.height - mt - mb, 50))
+    _axes(add, ox, oy, land_w * scale, land_h * scale)
+
+    rooms = spec.get('rooms', [])
+    for x, y, w, h, exterior, pieces in wall_rectangles(build_wall_network(rooms), WALL_THICKNESS * scale,
+                                                        scale, (ox, oy)):
+        add(Wall(x, y, w, h, exterior, pieces))
+
+    columns = set()
+    for r in rooms:
+        rw_m, rh_m = float(r['width']), float(r['height'])
+        x, y = ox + float(r['x']) * scale, oy + float(r['y']) * scale
+        w, h = rw_m * scale, rh_m * scale
+        r_type = r.get('type')
+
+        # Columns, one per shared corner
+        for cx, cy in [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]:
+            key = (round(cx, 4), round(cy, 4))
+            if key not in columns:
+                columns.add(key)
+                add(Symbol('COLUMN', 'A-COLS', cx, cy, scale, scale))
+
+        _furniture(add, r_type, x, y, rw_m, scale)
+        if r_type == 'stairs':
+            _stairs(add, x, y, w, h, scale)
+        for op in r.get('openings', []):
+            _opening(add, x, y, w, h, op, scale)
+
+        # Room Label (masked, smaller font for compact rooms)
+        area_m2 = rw_m * rh_m
+        name = (r.get('name') or r_type or 'room').upper()
+        add(Label('A-ANNO-TEXT', x + w / 2, y + h / 2, f"{name}\n{area_m2:.1f} m2",
+                  FONT_MAIN if area_m2 >= 7.5 else FONT_SUB, 'center', masked=True))
+
+    _dimension_chains(add, rooms, land_w, ox, oy, scale)
+    _title_block(add, spec, rooms, sheet, scale_label)
+    return PlanGeometry(sheet, scale, scale_label, tuple(prims))
+
+
+def _axes(add, ox, oy, w, h):
+    add(Line('A-ANNO-AXES', ox - 1.0, oy, ox + w + 1.0, oy))
+    add(Line('A-ANNO-AXES', ox, oy - 1.0, ox, oy + h + 1.0))
+    add(Label('A-ANNO-AXES', ox, oy + h + 1.3, "1", 0.3, 'center'))
+    add(Label('A-ANNO-AXES', ox - 1.3, oy, "A", 0.3, 'center'))
+
+
+def _furniture(add, r_type, x, y, room_w, scale):
+    """High-detail blocks: beds with pillows, WC with tank, stove."""
+    inset = FURNITURE_INSET * scale
+    if r_type == 'bedroom' and room_w > 3.0:
+        add(Symbol('BED', 'A-FURN', x + inset, y + inset, scale, scale))
+    elif r_type in ['bathroom', 'toilet']:
+        add(Symbol('WC', 'A-PLUM', x + inset, y + inset, scale, scale))
+    elif r_type == 'kitchen':
+        add(Symbol('STOVE', 'A-FURN', x + inset, y + inset, scale, scale))
+
+
+def _stairs(add, x, y, w, h, scale):
+    sw = w / STAIR_STEPS
+    for i in range(STAIR_STEPS + 1):
+        add(Line('A-STAI', x + i * sw, y, x + i * sw, y + h))
+    # Mid-flight landing line and direction arrow
+    cy = y + h / 2
+    add(Line('A-STAI', x, cy, x + w, cy))
+    add(Circle('A-STAI', x + 0.3 * scale, cy, 0.1 * scale))
+    add(Line('A-STAI', x + 0.3 * scale, cy, x + w - 0.3 * scale, cy))
+
+
+def _opening(add, rx, ry, rw, rh, op, scale):
+    """Door (hinged at the start of its span) or window, symbols facing the room.
+
+    ``pos`` is the distance from the wall's south/west end to the start of
+    the opening.
+    """
+    otype = op.get('type', 'door')
+    wall = op['wall']
+    width = float(op.get('width', DOOR_WIDTH if otype == 'door' else WINDOW_WIDTH))
+    start, span = float(op['pos']) * scale, width * scale
+
+    if otype == 'door':
+        # Rotation makes the local +y axis point into the room
+        if wall == 'south': x, y, ang = rx + start, ry, 0
+        elif wall == 'north': x, y, ang = rx + start + span, ry + rh, 180
+        elif wall == 'west': x, y, ang = rx, ry + start + span, 270
+        elif wall == 'east': x, y, ang = rx + rw, ry + start, 90
+        else: return
+        add(Symbol('DOOR', 'A-DOOR', x, y, span, span, ang))
+    else:
+        mid = start + span / 2
+        if wall == 'south': x, y, ang = rx + mid, ry, 0
+        elif wall == 'north': x, y, ang = rx + mid, ry + rh, 180
+        elif wall == 'west': x, y, ang = rx, ry + mid, 270
+        elif wall == 'east': x, y, ang = rx + rw, ry + mid, 90
+        else: return
+        add(Symbol('WINDOW', 'A-WIND', x, y, span, WALL_THICKNESS * scale, ang))
+
+
+def _dimension_chains(add, rooms, land_w, ox, oy, scale):
+    """Overall and per-room GOST dimension chains under the plan."""
+    add(Dim(ox, oy, ox + land_w * scale, oy, -1.9, str(int(round(land_w * 1000)))))
+    xs = sorted({float(r['x']) for r in rooms} | {float(r['x']) + float(r['width']) for r in rooms})
+    for x1, x2 in zip(xs, xs[1:]):
+        if x2 - x1 > 0.3:  # ignore tiny gaps
+            add(Dim(ox + x1 * scale, oy, ox + x2 * scale, oy, -1.2, str(int(round((x2 - x1) * 1000)))))
+
+
+def _title_block(add, spec, rooms, sheet, scale_label):
+    """GOST 21.1101 Form 1 corner stamp plus the room explication table."""
+    ml, mr, mt, mb = MARGINS
+    w, h = SHTAMP
+    x0, y0 = sheet.width - mr - w, mb
+    layer = 'A-TITLE-BLOCK'
+
+    add(Rect(layer, x0, y0, w, h, 30))
+    add(Line(layer, x0, y0 + 1.5, x0 + w, y0 + 1.5, 30))
+    add(Line(layer, x0 + w - 5.0, y0 + 3.5, x0 + w, y0 + 3.5, 30))
+    add(Line(layer, x0 + w - 5.0, y0, x0 + w - 5.0, y0 + h, 30))
+    add(Line(layer, x0 + w - 2.5, y0, x0 + w - 2.5, y0 + 1.5, 30))
+    title = spec.get('style', 'Modern').upper() + " BINO LOYIHASI"
+    add(Label(layer, x0 + 0.5, y0 + 4.2, title, FONT_MAIN, bold=True))
+    if spec.get('floor_name'):
+        add(Label(layer, x0 + 0.5, y0 + 2.3, f"{spec['floor_name'].upper()} REJASI", FONT_SUB))
+    add(Label(layer, x0 + w - 4.7, y0 + 4.2, f"Masshtab: {scale_label}", FONT_SUB))
+    add(Label(layer, x0 + w - 2.3, y0 + 0.5, "AU-01", FONT_MAIN, bold=True))
+
+    # Room explication, capped to the space left above the stamp
+    ye = y0 + h + 1.5
+    cell_h = 0.8
+    max_rows = max(1, int((sheet.height - mt - 1.0 - ye) / cell_h) - 1)
+    rows = [
+        "{}. {}: {:.1f} m2".format(i + 1, (r.get('name') or r.get('type') or 'room').upper(),
+                                   float(r['width']) * float(r['height']))
+        for i, r in enumerate(rooms[:max_rows])
+    ]
+    if len(rooms) > max_rows:
+        rows[-1] = f"... (+{len(rooms) - max_rows + 1})"
+    add(Label(layer, x0, ye + (len(rows) + 1) * cell_h + 0.2, "XONALARNI EXPLIKATSIYASI", FONT_MAIN, bold=True))
+    add(Line(layer, x0, ye, x0 + w, ye))
+    for i, txt in enumerate(rows):
+        y_row = ye + (len(rows) - i) * cell_h
+        add(Label(layer, x0 + 0.5, y_row - 0.55, txt, FONT_SUB))
+        add(Line(layer, x0, y_row, x0 + w, y_row))
@@ -0,0 +1,40 @@
+import math
+from typing import Dict, List, Tuple
+
+# Symbol library in local meters. Every backend draws a Symbol primitive from
+# these shapes: the DXF writer turns each entry into one BLOCK, the preview
+# expands it in place.
+#
+#   ('rect', x, y, w, h)
+#   ('line', x1, y1, x2, y2, lineweight)
+#   ('circle', cx, cy, r)
+#   ('ellipse', cx, cy, rx, ry)
+#   ('arc', cx, cy, r, start_deg, end_deg, lineweight)
+
+_LEAF = math.radians(30)
+
+SYMBOLS: Dict[str, List[Tuple]] = {
+    # 400x400 column centered on the insertion point
+    'COLUMN': [('rect', -0.2, -0.2, 0.4, 0.4)],
+    # Bed with two pillows (2000x1800)
+    'BED': [('rect', 0.0, 0.0, 2.0, 1.8), ('rect', 0.2, 1.3, 0.7, 0.4), ('rect', 1.1, 1.3, 0.7, 0.4)],
+    # WC: tank + 400x600 bowl
+    'WC': [('rect', 0.0, 0.4, 0.6, 0.2), ('ellipse', 0.3, 0.2, 0.2, 0.3)],
+    # Stove with 4 burners
+    'STOVE': [('rect', 0.0, 0.0, 0.6, 0.6)] + [('circle', dx, dy, 0.06) for dx, dy in
+                                               [(0.15, 0.15), (0.45, 0.15), (0.15, 0.45), (0.45, 0.45)]],
+    # Unit door: leaf at 30 degrees plus swing arc; scaled by door width
+    'DOOR': [('line', 0.0, 0.0, math.cos(_LEAF), math.sin(_LEAF), 20), ('arc', 0.0, 0.0, 1.0, 0, 30, 15)],
+    # Unit window: outer line plus glazing line; x scaled by width, y by wall depth
+    'WINDOW': [('line', -0.5, 0.0, 0.5, 0.0, 20), ('line', -0.5, 1.0, 0.5, 1.0, 10)],
+}
+
+
+def transform(x: float, y: float, sx: float, sy: float, rotation: float):
+    """Return a function mapping local symbol coordinates to drawing coordinates."""
+    c, s = math.cos(math.radians(rotation)), math.sin(math.radians(rotation))
+
+    def apply(u: float, v: float) -> Tuple[float, float]:
+        u, v = u * sx, v * sy
+        return x + u * c - v * s, y + u * s + v * c
+    return apply
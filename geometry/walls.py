@@ -0,0 +1,161 @@
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+# Edges closer than this (meters) are treated as lying on the same wall line
+SNAP = 0.01
+
+
+class WallRun(NamedTuple):
+    """A maximal straight piece of wall with a single classification.
+
+    ``orientation`` is 'h' (runs along x at y=coord) or 'v' (along y at x=coord).
+    ``side`` is 0 for interior walls; for exterior walls it is +1 when the room
+    lies on the positive side of the line (above / right) and -1 otherwise.
+    """
+    orientation: str
+    coord: float
+    start: float
+    end: float
+    exterior: bool
+    side: int
+
+
+def _room_edges(rooms: Iterable[Dict[str, Any]]):
+    """Yield (orientation, coord, start, end, side) for every room edge."""
+    for r in rooms:
+        x, y = float(r['x']), float(r['y'])
+        w, h = float(r['width']), float(r['height'])
+        if w <= 0 or h <= 0:
+            continue
+        yield 'h', y, x, x + w, +1        # bottom edge, room above
+        yield 'h', y + h, x, x + w, -1    # top edge, room below
+        yield 'v', x, y, y + h, +1        # left edge, room to the right
+        yield 'v', x + w, y, y + h, -1    # right edge, room to the left
+
+
+def _classify_line(orientation: str, coord: float, spans: List[Tuple[float, float, int]]) -> List[WallRun]:
+    """Split one wall line into runs by how many sides have a room."""
+    events = []
+    for start, end, side in spans:
+        events.append((start, side, +1))
+        events.append((end, side, -1))
+    events.sort()
+
+    runs: List[WallRun] = []
+    cover = {+1: 0, -1: 0}
+    pos = None
+    for at, side, delta in events:
+        if pos is not None and at - pos > SNAP and (cover[+1] or cover[-1]):
+            interior = cover[+1] > 0 and cover[-1] > 0
+            run_side = 0 if interior else (+1 if cover[+1] else -1)
+            last = runs[-1] if runs else None
+            if last and last.side == run_side and abs(last.end - pos) <= SNAP:
+                runs[-1] = last._replace(end=at)
+            else:
+                runs.append(WallRun(orientation, coord, pos, at, not interior, run_side))
+        cover[side] += delta
+        pos = at
+    return runs
+
+
+def _snap_map(values: Iterable[float]) -> Dict[float, float]:
+    """Map each value to the first of its cluster; values at most SNAP apart share a cluster.
+
+    Unlike rounding to a SNAP grid, 3.004 and 3.006 never end up on
+    different lines.
+    """
+    snapped: Dict[float, float] = {}
+    anchor = prev = None
+    for v in sorted(set(values)):
+        if prev is None or v - prev > SNAP:
+            anchor = v
+        snapped[v] = anchor
+        prev = v
+    return snapped
+
+
+def build_wall_network(rooms: Iterable[Dict[str, Any]]) -> List[WallRun]:
+    """Merge the room rectangles of a spec into unique, classified wall runs.
+
+    Shared edges become a single interior run instead of two overlapping
+    room outlines; edges with a room on one side only are exterior. Edge
+    coordinates are snapped first, so runs meeting at a corner share the
+    exact same point.
+    """
+    edges = list(_room_edges(rooms))
+    xs = _snap_map([e[1] for e in edges if e[0] == 'v'] + [v for e in edges if e[0] == 'h' for v in e[2:4]])
+    ys = _snap_map([e[1] for e in edges if e[0] == 'h'] + [v for e in edges if e[0] == 'v' for v in e[2:4]])
+    lines = defaultdict(list)
+    for orientation, coord, start, end, side in edges:
+        across, along = (ys, xs) if orientation == 'h' else (xs, ys)
+        lines[(orientation, across[coord])].append((along[start], along[end], side))
+
+    runs: List[WallRun] = []
+    for (orientation, coord), spans in sorted(lines.items()):
+        runs.extend(_classify_line(orientation, coord, spans))
+    return runs
+
+
+def _band(run: WallRun, thickness: float) -> Tuple[float, float]:
+    """(offset from the line, depth) of a run's band, in the units of ``thickness``."""
+    if run.side == 0:
+        return -thickness, 2 * thickness
+    if run.side > 0:
+        return 0.0, thickness
+    return -thickness, thickness
+
+
+Rect4 = Tuple[float, float, float, float]
+
+
+def wall_rectangles(runs: Iterable[WallRun], thickness: float, scale: float = 1.0,
+                    origin: Tuple[float, float] = (0.0, 0.0)
+                    ) -> List[Tuple[float, float, float, float, bool, Tuple[Rect4, ...]]]:
+    """Turn wall runs into (x, y, w, h, exterior, pieces) bands in drawing units, one per run.
+
+    Coordinates are ``origin + meters * scale``; ``thickness`` is already in
+    drawing units. Exterior walls sit inside the room, interior walls are
+    centered on the shared edge and twice as thick (one band per room).
+    ``pieces`` are the parts of the band to fill: horizontal bands are
+    whole, vertical bands leave out where a horizontal one crosses them,
+    so corners and junctions are hatched once.
+    """
+    runs = list(runs)
+    h_lines = defaultdict(list)
+    for run in runs:
+        if run.orientation == 'h':
+            h_lines[run.coord].append(run)
+    h_coords = sorted(h_lines)
+
+    ox, oy = origin
+    bands = []
+    for run in runs:
+        c = run.coord * scale
+        a, b = run.start * scale, run.end * scale
+        offset, depth = _band(run, thickness)
+        if run.orientation == 'h':
+            band = (ox + a, oy + c + offset, b - a, depth)
+            bands.append((*band, run.exterior, (band,)))
+            continue
+        band = (ox + c + offset, oy + a, depth, b - a)
+        cuts = []
+        for k in range(bisect_left(h_coords, run.start - SNAP), len(h_coords)):
+            y = h_coords[k]
+            if y > run.end + SNAP:
+                break
+            for other in h_lines[y]:
+                if other.start - SNAP <= run.coord <= other.end + SNAP:
+                    o_offset, o_depth = _band(other, thickness)
+                    cuts.append((y * scale + o_offset, y * scale + o_offset + o_depth))
+        pieces = []
+        for lo, hi in sorted(cuts):
+            if lo - a > 1e-9:
+                pieces.append((ox + c + offset, oy + a, depth, min(lo, b) - a))
+            a = max(a, hi)
+            if a >= b:
+                break
+        if b - a > 1e-9:
+            pieces.append((ox + c + offset, oy + a, depth, b - a))
+        bands.append((*band, run.exterior, tuple(pieces)))
+    return bands
@@ -1 +1 @@
-from .renderer import render_preview
+from .renderer import compose_previews, render_preview
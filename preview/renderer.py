@@ -1,200 +1,253 @@
-import matplotlib.pyplot as plt
-from typing import Dict, Any
+import io
 import math
+import matplotlib.pyplot as plt
+import numpy as np
+from collections import defaultdict
+from matplotlib.collections import LineCollection, PatchCollection, PolyCollection
+from matplotlib.patches import Circle, Ellipse, Polygon, Rectangle
+from typing import Dict, Any, List, Optional, Union
+from PIL import Image
+from geometry import plan
+from geometry.plan import build_plan_geometry
+from geometry.symbols import SYMBOLS, transform
+from schema.schema import floor_plans
+
+
+class _Canvas:
+    """Collects preview geometry per style, then draws one artist per style.
+
+    With ``batched=False`` every element becomes its own Artist again, which
+    is only kept to benchmark against.
+    """
+
+    def __init__(self, batched: bool = True):
+        self.batched = batched
+        self._rects = defaultdict(list)    # style -> [(x, y, w, h)]
+        self._polys = defaultdict(list)    # style -> [[(x, y), ...]]
+        self._lines = defaultdict(list)    # style -> [((x1, y1), (x2, y2))]
+        self._patches = defaultdict(list)  # style -> [Patch]
+
+    @staticmethod
+    def _key(style):
+        return tuple(sorted(style.items()))
+
+    def rect(self, x, y, w, h, **style):
+        self._rects[self._key(style)].append((x, y, w, h))
+
+    def poly(self, points, **style):
+        self._polys[self._key(style)].append(points)
+
+    def line(self, x1, y1, x2, y2, **style):
+        self._lines[self._key(style)].append(((x1, y1), (x2, y2)))
+
+    def patch(self, patch, **style):
+        self._patches[self._key(style)].append(patch)
+
+    def flush(self, ax):
+        for key, rects in self._rects.items():
+            style = dict(key)
+            if self.batched:
+                r = np.asarray(rects, dtype=float)
+                x0, y0, x1, y1 = r[:, 0], r[:, 1], r[:, 0] + r[:, 2], r[:, 1] + r[:, 3]
+                verts = np.stack([np.stack([x0, y0], 1), np.stack([x1, y0], 1),
+                                  np.stack([x1, y1], 1), np.stack([x0, y1], 1)], 1)
+                ax.add_collection(PolyCollection(verts, closed=True, **style))
+            else:
+                for x, y, w, h in rects:
+                    ax.add_patch(Rectangle((x, y), w, h, **style))
+        for key, polys in self._polys.items():
+            style = dict(key)
+            if self.batched:
+                ax.add_collection(PolyCollection(polys, closed=True, **style))
+            else:
+                for points in polys:
+                    ax.add_patch(Polygon(points, closed=True, **style))
+        for key, segments in self._lines.items():
+            style = dict(key)
+            if self.batched:
+                ax.add_collection(LineCollection(np.asarray(segments, dtype=float), **style))
+            else:
+                for (x1, y1), (x2, y2) in segments:
+                    ax.plot([x1, x2], [y1, y2], **style)
+        for key, patches in self._patches.items():
+            style = dict(key)
+            if self.batched:
+                ax.add_collection(PatchCollection(patches, **style))
+            else:
+                for p in patches:
+                    p.set(**style)
+                    ax.add_patch(p)
+
+
+_THIN = {'color': 'black', 'linewidth': 0.8}
+_OUTLINE = {'facecolor': 'none', 'edgecolor': 'black'}
+_FIGSIZE = (14, 10)
+# Axes width in points for the default subplot (matplotlib's 0.775 of figure width)
+_AXES_PT = _FIGSIZE[0] * 0.775 * 72
+_FILL = {'facecolor': (0, 0, 0, 0.05), 'edgecolor': 'black', 'linewidth': 0.4}
+# Composite of several floors: sheets per row and the longest side Telegram shows sharply
+_COMPOSITE_COLUMNS = 2
+_COMPOSITE_MAX_SIDE = 4096
+
+
+def _lw(weight):
+    """DXF lineweight (1/100 mm) to preview linewidth."""
+    return weight * 0.03 if weight else 0.8
+
+
+def render_preview(spec: Dict[str, Any], filename: Optional[str] = None,
+                   batched: bool = True) -> Union[str, bytes]:
+    """Render the PNG preview from the same plan geometry as the DXF.
+
+    Multi-storey specs give one image with every floor (see
+    ``compose_previews``). Returns the PNG bytes instead of writing a file
+    when ``filename`` is None.
+    """
+    floors = floor_plans(spec)
+    if len(floors) == 1:
+        return _render_sheet(spec, filename, batched)
+    data = compose_previews([_render_sheet(floor, None, batched) for floor in floors])
+    if filename is None:
+        return data
+    with open(filename, 'wb') as f:
+        f.write(data)
+    return filename
 
-def render_preview(spec: Dict[str, Any], filename: str) -> str:
-    # Scale: Everything in SPEC is meters, but GENERATOR uses mm.
-    # We stay in meters for plotting to keep axis readable, 
-    # but we add professional visuals.
-    # Master GOST Styles (at 1:100)
-    # GOST Paper Sizes (Meters at 1:100)
-    PAPERS = {
-        'A4_V': (21.0, 29.7),
-        'A4_H': (29.7, 21.0),
-        'A3': (42.0, 29.7),
-        'A2': (59.4, 42.0)
-    }
-    
-    ml, mr, mt, mb = 2.0, 0.5, 0.5, 0.5
-    sw_blk, sh_blk = 18.5, 5.5
-    
-    land_w = float(spec.get('land_width', 10.0))
-    land_h = float(spec.get('land_height', 10.0))
-    
-    # Auto-Select (Match generator.py logic Version 5.7)
-    if land_w <= 15.0 and land_h <= 25.0:
-        sheet_w, sheet_h = PAPERS['A3']
-        SCALE_VAL = 2.0 # 1:50
-        # Re-calc sheet to A3 for preview stability
-    elif land_w > 25.0 or land_h > 35.0:
-        sheet_w, sheet_h = PAPERS['A2']
-        SCALE_VAL = 1.0 # 1:100
-    else:
-        sheet_w, sheet_h = PAPERS['A3']
-        SCALE_VAL = 1.0 # 1:100
 
-    fig, ax = plt.subplots(figsize=(14, 10))
+def compose_previews(pngs: List[bytes]) -> bytes:
+    """Tile per-floor previews into one PNG, ground floor first, two per row."""
+    images = [Image.open(io.BytesIO(data)).convert('RGB') for data in pngs]
+    cols = min(len(images), _COMPOSITE_COLUMNS)
+    rows = math.ceil(len(images) / cols)
+    cell_w = max(im.width for im in images)
+    cell_h = max(im.height for im in images)
+    sheet = Image.new('RGB', (cell_w * cols, cell_h * rows), 'white')
+    for i, im in enumerate(images):
+        row, col = divmod(i, cols)
+        sheet.paste(im, (col * cell_w, row * cell_h))
+    sheet.thumbnail((_COMPOSITE_MAX_SIDE, _COMPOSITE_MAX_SIDE))
+    out = io.BytesIO()
+    sheet.save(out, format='PNG', optimize=False)
+    return out.getvalue()
+
+
+def _render_sheet(spec: Dict[str, Any], filename: Optional[str], batched: bool) -> Union[str, bytes]:
+    geom = build_plan_geometry(spec)
+    sheet = geom.sheet
+    # Text heights are in sheet meters, like everything else
+    pt_per_m = _AXES_PT / sheet.width
+
+    fig, ax = plt.subplots(figsize=_FIGSIZE)
     ax.set_facecolor('white')
-
-    # Draw Frame
-    ax.add_patch(plt.Rectangle((ml, mb), sheet_w - ml - mr, sheet_h - mt - mb, fill=False, edgecolor='black', linewidth=1.5))
-
-    # Top-Left Positioning (Match Level 5.7)
-    ox = ml
-    oy = sheet_h - mt - land_h
-
-    rooms = spec.get('rooms', [])
-    for r in rooms:
-        x, y = float(r['x']) + ox, float(r['y']) + oy
-        w, h = float(r['width']), float(r['height'])
-        r_type = r.get('type')
-        
-        # Professional Master Walls
-        ax.add_patch(plt.Rectangle((x, y), w, h, fill=False, edgecolor='black', linewidth=1.5, zorder=2))
-        ax.add_patch(plt.Rectangle((x+0.1, y+0.1), w-0.2, h-0.2, fill=False, edgecolor='black', linewidth=0.5, alpha=0.3, zorder=2))
-
-        # Columns
-        for cp in [(x, y), (x+w, y), (x+w, y+h), (x, y+h)]:
-            ax.add_patch(plt.Rectangle((cp[0]-0.2, cp[1]-0.2), 0.4, 0.4, color='black', alpha=0.8, zorder=5))
-
-        if w > 2.0 and h > 2.0:
-            _draw_preview_items_platinum(ax, r_type, x + 0.3, y + 0.3, w)
-
-        if r_type == 'stairs':
-            _draw_preview_stairs(ax, x, y, w, h)
-        
-        # 4. Room Label (with Masking & Dynamic Scaling - Level 5.6)
-        name = r.get('name', r_type).upper()
-        area_m2 = w * h
-        
-        # Dynamic Scaling to fit room bounds
-        fs = 7 if area_m2 >= 7.5 else 5.5
-        
-        ax.text(x + w/2, y + h/2, f"{name}\n{area_m2:.1f} m2",
-                fontsize=fs, ha='center', va='center', fontweight='medium', color='black',
-                zorder=10, bbox={'facecolor': 'white', 'alpha': 0.9, 'edgecolor': 'none', 'pad': 1})
-
-        _draw_preview_dims(ax, x, y, w, h, ox, safe_w, ml, mr, sheet_w)
-
-        for op in r.get('openings', []):
-            _draw_preview_opening(ax, x, y, w, h, op)
-
-    # 3. GOST Official Corner Shtamp (185x55mm)
-    sx = sheet_w - mr - sw_blk
-    sy = mb
-    
-    # Industrial Tabular Grid
-    ax.add_patch(plt.Rectangle((sx, sy), sw_blk, sh_blk, fill=False, edgecolor='black', linewidth=1.2))
-    ax.plot([sx, sx + sw_blk], [sy + 1.5, sy + 1.5], color='black', linewidth=0.8)
-    ax.plot([sx, sx + sw_blk], [sy + 3.5, sy + 3.5], color='black', linewidth=0.8)
-    ax.plot([sx + sw_blk - 5.0, sx + sw_blk - 5.0], [sy, sy + 5.5], color='black', linewidth=0.8)
-    ax.plot([sx + sw_blk - 2.5, sx + sw_blk - 2.5], [sy, sy + 1.5], color='black', linewidth=0.8)
-    
-    # Clean Text (No branding)
-    ax.text(sx + 0.5, sy + 4.2, spec.get('style', 'Modern').upper() + " BINO LOYIHASI", fontsize=8, fontweight='bold', ha='left')
-    ax.text(sx + sw_blk - 4.5, sy + 4.2, "Masshtab: 1:100", fontsize=6, ha='left')
-    ax.text(sx + sw_blk - 2.0, sy + 0.5, "AU-1", fontsize=9, fontweight='bold')
-
-    # Explication Table in Structured Cells
-    ye = sy + sh_blk + 1.5 # 15mm padding
-    cell_h = 0.8
-    ax.text(sx, ye + (len(rooms)+1)*cell_h + 0.2, "XONALARNI EXPLIKATSIYASI", fontsize=9, fontweight='bold')
-    ax.plot([sx, sx+sw_blk], [ye, ye], color='black', linewidth=0.8)
-    for i, r in enumerate(rooms):
-        y_row = ye + (len(rooms)-i)*cell_h
-        txt = "{}. {}: {:.1f} m2".format(i+1, r.get('name', r_type).upper(), float(r['width'])*float(r['height']))
-        ax.text(sx+0.5, y_row - 0.5, txt, fontsize=6, ha='left')
-        ax.plot([sx, sx+sw_blk], [y_row, y_row], color='black', linewidth=0.8)
-
-    ax.set_xlim(0, sheet_w)
-    ax.set_ylim(0, sheet_h)
+    cv = _Canvas(batched)
+
+    for prim in geom.primitives:
+        kind = type(prim)
+        if kind is plan.Wall:
+            cv.rect(prim.x, prim.y, prim.w, prim.h, facecolor='0.85', edgecolor='black',
+                    linewidth=1.2 if prim.exterior else 0.6, zorder=2)
+        elif kind is plan.Rect:
+            cv.rect(prim.x, prim.y, prim.w, prim.h, linewidth=_lw(prim.weight), **_OUTLINE)
+        elif kind is plan.Line:
+            cv.line(prim.x1, prim.y1, prim.x2, prim.y2, **_line_style(prim))
+        elif kind is plan.Circle:
+            cv.patch(Circle((prim.x, prim.y), prim.r), facecolor='none', edgecolor='black', linewidth=0.5)
+        elif kind is plan.Symbol:
+            _draw_preview_symbol(cv, prim)
+        elif kind is plan.Label:
+            _draw_preview_label(ax, prim, pt_per_m)
+        elif kind is plan.Dim:
+            _draw_preview_dim(cv, ax, prim, pt_per_m)
+
+    cv.flush(ax)
+    ax.set_xlim(0, sheet.width)
+    ax.set_ylim(0, sheet.height)
     ax.set_aspect('equal')
     ax.axis('off')
-    fig.savefig(filename, dpi=180, bbox_inches='tight')
+    out = io.BytesIO() if filename is None else filename
+    fig.savefig(out, format='png', dpi=180, bbox_inches='tight')
     plt.close(fig)
-    return filename
+    return out.getvalue() if filename is None else filename
+
+
+def _line_style(prim):
+    if prim.layer == 'A-ANNO-AXES':
+        return {'color': '0.5', 'linewidth': 0.5, 'linestyle': '--'}
+    if prim.layer == 'A-STAI':
+        return {'color': 'black', 'linewidth': 0.5, 'alpha': 0.3}
+    return {**_THIN, 'linewidth': _lw(prim.weight)}
+
 
-def _draw_preview_opening(ax, rx, ry, rw, rh, op):
-    """Draw professional Door/Window symbols in preview (Level 5.5)."""
-    otype = op.get('type', 'door')
-    wall = op['wall']
-    pos = float(op['pos'])
-    w = float(op.get('width', 1.0))
-    attr = {'color': 'black', 'linewidth': 0.8}
-    
-    if wall == 'south': x, y, ang = rx + pos, ry, 0
-    elif wall == 'north': x, y, ang = rx + pos, ry + rh, 180
-    elif wall == 'west': x, y, ang = rx, ry + pos, 270
-    elif wall == 'east': x, y, ang = rx + rw, ry + pos, 90
-    else: return
-
-    if otype == 'door':
-        # Door Leaf Line
-        import math
-        leaf_x = x + w * math.cos(math.radians(ang + 30))
-        leaf_y = y + w * math.sin(math.radians(ang + 30))
-        ax.plot([x, leaf_x], [y, leaf_y], **attr)
-        # Swing Arc (Style approximation)
-        from matplotlib.patches import Arc
-        ax.add_patch(Arc((x, y), 2*w, 2*w, angle=ang, theta1=0, theta2=30, color='black', alpha=0.5, linewidth=0.5))
+def _draw_preview_symbol(cv, prim):
+    """Expand a library symbol in place (the DXF uses a block insert)."""
+    to_sheet = transform(prim.x, prim.y, prim.sx, prim.sy, prim.rotation)
+    if prim.name == 'COLUMN':
+        fill, zorder = {'color': 'black', 'alpha': 0.8}, 5
     else:
-        # Window: 3-line glazing
-        if wall in ['north', 'south']:
-            ax.plot([x-w/2, x+w/2], [y, y], **attr)
-            ax.plot([x-w/2, x+w/2], [y+0.1 if wall=='south' else y-0.1, y+0.1 if wall=='south' else y-0.1], color='gray', linewidth=0.4)
-            ax.plot([x-w/2, x+w/2], [y+0.2 if wall=='south' else y-0.2, y+0.2 if wall=='south' else y-0.2], **attr)
-        else:
-            ax.plot([x, x], [y-w/2, y+w/2], **attr)
-            ax.plot([x+0.1 if wall=='west' else x-0.1, x+0.1 if wall=='west' else x-0.1], [y-w/2, y+w/2], color='gray', linewidth=0.4)
-            ax.plot([x+0.2 if wall=='west' else x-0.2, x+0.2 if wall=='west' else x-0.2], [y-w/2, y+w/2], **attr)
-
-def _draw_preview_dims(ax, x, y, w, h, _ox, _safe_w, _ml, _mr, _sheet_w):
-    """Draw professional dimension chains in preview."""
-    # Simple detail dimension (Chain 1 approximation)
-    yo = y - 0.8
-    ax.plot([x, x+w], [yo, yo], color='black', linewidth=0.5)
-    # 45-degree ticks
-    for px in [x, x+w]:
-        ax.plot([px-0.1, px+0.1], [yo-0.1, yo+0.1], color='black', linewidth=0.8)
-    ax.text(x+w/2, yo - 0.1, "{:.1f} m".format(w), fontsize=5, ha='center', va='top')
-
-def _draw_preview_items_platinum(ax, r_type, x, y, _w):
-    """B&W High-Contrast Furniture Preview."""
-    if r_type == 'bedroom':
-        ax.add_patch(plt.Rectangle((x, y), 2.0, 1.8, fill=True, color='black', alpha=0.05))
-        ax.add_patch(plt.Rectangle((x+0.2, y+1.3), 0.7, 0.4, fill=True, color='black', alpha=0.15))
-        ax.add_patch(plt.Rectangle((x+1.1, y+1.3), 0.7, 0.4, fill=True, color='black', alpha=0.15))
-    elif r_type in ['bathroom', 'toilet']:
-        ax.add_patch(plt.Circle((x+0.3, y+0.2), 0.2, color='black', alpha=0.1))
-        ax.add_patch(plt.Rectangle((x, y+0.4), 0.6, 0.2, color='black', alpha=0.05))
-    elif r_type == 'kitchen':
-        ax.add_patch(plt.Rectangle((x, y), 0.6, 0.6, color='black', alpha=0.05))
-        for dx, dy in [(0.15, 0.15), (0.45, 0.15), (0.15, 0.45), (0.45, 0.45)]:
-            ax.add_patch(plt.Circle((x+dx, y+dy), 0.05, color='black', alpha=0.2))
-
-def _draw_preview_stairs(ax, x, y, w, h):
-    """B&W Industrial Stairs."""
-    steps = 12
-    sw = w / steps
-    for i in range(steps + 1):
-        ax.plot([x + i*sw, x + i*sw], [y, y + h], color='black', linewidth=0.5, alpha=0.3)
-    ax.plot([x, x+w], [y+h/2, y+h/2], color='black', linewidth=0.5, alpha=0.3)
-
-def _draw_preview_opening(ax, x, y, w, h, op):
-    """High-Contrast Openings (B&W)."""
-    wall, pos, op_type = op['wall'], float(op['pos']), op['type']
-    size = 0.9 if op_type == 'door' else 1.5
-    lw = 3
-    
-    if wall == 'north': 
-        ax.plot([x + pos, x + pos + size], [y + h, y + h], color='white', linewidth=lw+2, zorder=3)
-        ax.plot([x + pos, x + pos + size], [y + h, y + h], color='black', linewidth=lw, zorder=4)
-    elif wall == 'south': 
-        ax.plot([x + pos, x + pos + size], [y, y], color='white', linewidth=lw+2, zorder=3)
-        ax.plot([x + pos, x + pos + size], [y, y], color='black', linewidth=lw, zorder=4)
-    elif wall == 'east': 
-        ax.plot([x + w, x + w], [y + pos, y + pos + size], color='white', linewidth=lw+2, zorder=3)
-        ax.plot([x + w, x + w], [y + pos, y + pos + size], color='black', linewidth=lw, zorder=4)
-    elif wall == 'west': 
-        ax.plot([x, x], [y + pos, y + pos + size], color='white', linewidth=lw+2, zorder=3)
-        ax.plot([x, x], [y + pos, y + pos + size], color='black', linewidth=lw, zorder=4)
+        fill, zorder = _FILL, 4
+
+    # Openings cut a white gap into the wall band first
+    if prim.name == 'DOOR':
+        cv.line(*to_sheet(0, 0), *to_sheet(1, 0), color='white', linewidth=3, zorder=3)
+    elif prim.name == 'WINDOW':
+        cv.poly([to_sheet(-0.5, 0), to_sheet(0.5, 0), to_sheet(0.5, 1), to_sheet(-0.5, 1)],
+                color='white', zorder=3)
+
+    for shape in SYMBOLS[prim.name]:
+        kind = shape[0]
+        if kind == 'rect':
+            _, x, y, w, h = shape
+            if prim.rotation == 0:
+                x0, y0 = to_sheet(x, y)
+                cv.rect(x0, y0, w * prim.sx, h * prim.sy, zorder=zorder, **fill)
+            else:
+                cv.poly([to_sheet(x, y), to_sheet(x + w, y), to_sheet(x + w, y + h), to_sheet(x, y + h)],
+                        zorder=zorder, **fill)
+        elif kind == 'line':
+            _, x1, y1, x2, y2, weight = shape
+            cv.line(*to_sheet(x1, y1), *to_sheet(x2, y2), color='black', linewidth=_lw(weight), zorder=4)
+        elif kind == 'circle':
+            _, cx, cy, r = shape
+            cv.patch(Circle(to_sheet(cx, cy), r * prim.sx), zorder=zorder, **fill)
+        elif kind == 'ellipse':
+            _, cx, cy, rx, ry = shape
+            cv.patch(Ellipse(to_sheet(cx, cy), 2 * rx * prim.sx, 2 * ry * prim.sy, angle=prim.rotation),
+                     zorder=zorder, **fill)
+        elif kind == 'arc':
+            # Short polyline instead of an Arc patch so it can be batched
+            _, cx, cy, r, start, end, weight = shape
+            angles = np.radians(np.linspace(start, end, 9))
+            pts = [to_sheet(cx + r * np.cos(a), cy + r * np.sin(a)) for a in angles]
+            for p1, p2 in zip(pts, pts[1:]):
+                cv.line(*p1, *p2, color='black', linewidth=_lw(weight), zorder=4)
+
+
+def _draw_preview_label(ax, prim, pt_per_m):
+    center = prim.align == 'center'
+    bbox = {'facecolor': 'white', 'alpha': 0.9, 'edgecolor': 'none', 'pad': 1} if prim.masked else None
+    ax.text(prim.x, prim.y, prim.text, fontsize=prim.height * pt_per_m,
+            ha='center' if center else 'left', va='center' if center else 'baseline',
+            fontweight='bold' if prim.bold else 'medium', color='black', zorder=10, bbox=bbox)
+
+
+def _draw_preview_dim(cv, ax, prim, pt_per_m):
+    """Aligned dimension with extension lines and 45-degree ticks."""
+    dx, dy = prim.x2 - prim.x1, prim.y2 - prim.y1
+    length = float(np.hypot(dx, dy))
+    if length == 0:
+        return
+    ux, uy = dx / length, dy / length
+    nx, ny = -uy, ux
+    a = (prim.x1 + nx * prim.offset, prim.y1 + ny * prim.offset)
+    b = (prim.x2 + nx * prim.offset, prim.y2 + ny * prim.offset)
+    attr = {'color': 'black', 'linewidth': 0.5}
+    cv.line(prim.x1, prim.y1, *a, **attr)
+    cv.line(prim.x2, prim.y2, *b, **attr)
+    cv.line(*a, *b, **attr)
+    t = 0.15
+    for px, py in (a, b):
+        cv.line(px - (ux + nx) * t / 2, py - (uy + ny) * t / 2,
+                px + (ux + nx) * t / 2, py + (uy + ny) * t / 2, **_THIN)
+    ax.text((a[0] + b[0]) / 2 + nx * 0.1, (a[1] + b[1]) / 2 + ny * 0.1, prim.text,
+            fontsize=plan.FONT_SUB * pt_per_m, ha='center', va='bottom',
+            rotation=float(np.degrees(np.arctan2(dy, dx))))
@@ -1,2 +1,5 @@
-from .schema import SCHEMA
+from .schema import SCHEMA, floor_plans
 from .validator import validate_and_fill
+from .synthetic import generate_spec, iter_specs
+from .repair import repair_spec
+from .scoring import score_spec
@@ -0,0 +1,220 @@
+"""Deterministic fixes for specs that narrowly fail validation.
+
+Models often return a plan that is almost right: two rooms overlapping by
+a few centimetres, a room poking just past the land, a room without a
+door or a bathroom slightly under the standard. ``repair_spec`` fixes
+those in well under a millisecond so the bot does not need another multi-second
+LLM round trip. Anything bigger than ``SPEC_REPAIR_TOLERANCE`` is left to
+the model.
+"""
+import math
+from copy import deepcopy
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from config.standards import DOOR_WIDTH, GRID, MIN_ROOM_AREAS, WALL_MARGIN, WINDOW_WIDTH
+from .schema import SCHEMA, floor_plans
+from .spatial_logic import OVERLAP_TOLERANCE, bounds_overshoot, overlap_size, overlapping_pairs
+from .validator import _fast_fill, _fill_defaults, _schema_validator, validate_and_fill
+
+# Neighbours a new door should open onto, best first
+HALL_TYPES = ('hall', 'corridor')
+DOOR_TARGETS = HALL_TYPES + ('living_room',)
+# Passes over overlaps (trimming one pair can uncover the next)
+OVERLAP_PASSES = 3
+
+Rect = Tuple[float, float, float, float]
+
+
+def _r(v: float) -> float:
+    return round(v, 2)
+
+
+def _rect(r: Dict[str, Any]) -> Rect:
+    return float(r['x']), float(r['y']), float(r['width']), float(r['height'])
+
+
+def _name(r: Dict[str, Any], i: int) -> str:
+    return r.get('name', f"Room {i}")
+
+
+def _fix_bounds(rooms, land_w: float, land_h: float, tol: float) -> List[str]:
+    """Shift (and if needed trim) rooms that reach at most ``tol`` past the land."""
+    fixes = []
+    for i, r in enumerate(rooms):
+        over = bounds_overshoot(r, land_w, land_h)
+        if not 0 < over <= tol:
+            continue
+        for pos, size, limit in (('x', 'width', land_w), ('y', 'height', land_h)):
+            start, length = float(r[pos]), float(r[size])
+            length = min(length, limit)
+            start = min(max(start, 0.0), limit - length)
+            r[pos], r[size] = _r(start), _r(length)
+        fixes.append(f"{_name(r, i)} moved inside the land (was {over:.2f}m out)")
+    return fixes
+
+
+def _trim(a: Dict[str, Any], b: Dict[str, Any], axis: str, size: str) -> bool:
+    """Cut ``a`` back so it ends where ``b`` starts (or starts where ``b`` ends)."""
+    a0, al = float(a[axis]), float(a[size])
+    b0, bl = float(b[axis]), float(b[size])
+    if a0 < b0 < a0 + al <= b0 + bl:
+        a[size] = _r(b0 - a0)
+    elif b0 <= a0 < b0 + bl < a0 + al:
+        a[axis], a[size] = _r(b0 + bl), _r(a0 + al - b0 - bl)
+    else:
+        return False  # one contains the other on this axis
+    # Openings on the shortened walls keep their place but stay on the wall
+    walls = ('north', 'south') if axis == 'x' else ('east', 'west')
+    for op in a['openings']:
+        if op['wall'] in walls:
+            width = DOOR_WIDTH if op['type'] == 'door' else WINDOW_WIDTH
+            pos = float(op['pos']) - (float(a[axis]) - a0)
+            op['pos'] = _r(max(0.0, min(pos, float(a[size]) - width)))
+    return True
+
+
+def _fix_overlaps(rooms, tol: float) -> List[str]:
+    """Close overlaps no thicker than ``tol`` by trimming the larger room along the thin side."""
+    fixes = []
+    for _ in range(OVERLAP_PASSES):
+        pairs = [p for p in overlapping_pairs(rooms) if min(p[2], p[3]) <= tol]
+        if not pairs:
+            break
+        for i, j, _, _ in pairs:
+            a, b = rooms[i], rooms[j]
+            overlap_w, overlap_h = overlap_size(a, b)  # earlier trims may have changed it
+            if min(overlap_w, overlap_h) <= OVERLAP_TOLERANCE:
+                continue
+            axis, size = ('x', 'width') if overlap_w <= overlap_h else ('y', 'height')
+            order = sorted([(a, b, i), (b, a, j)], key=lambda t: -float(t[0]['width']) * float(t[0]['height']))
+            for big, small, k in order:
+                if _trim(big, small, axis, size):
+                    fixes.append(f"{_name(big, k)} trimmed by {min(overlap_w, overlap_h):.2f}m "
+                                 f"to clear {_name(small, j if k == i else i)}")
+                    break
+    return fixes
+
+
+def _shared_wall(a: Rect, b: Rect) -> Optional[Tuple[str, float, float]]:
+    """Wall of ``a`` touching ``b``: (wall, start, end) along the wall from its south/west end."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    span_x = (max(ax, bx) - ax, min(ax + aw, bx + bw) - ax)
+    span_y = (max(ay, by) - ay, min(ay + ah, by + bh) - ay)
+    if abs(ay - (by + bh)) <= OVERLAP_TOLERANCE:
+        return ('south',) + span_x
+    if abs(ay + ah - by) <= OVERLAP_TOLERANCE:
+        return ('north',) + span_x
+    if abs(ax - (bx + bw)) <= OVERLAP_TOLERANCE:
+        return ('west',) + span_y
+    if abs(ax + aw - bx) <= OVERLAP_TOLERANCE:
+        return ('east',) + span_y
+    return None
+
+
+def _door_on(wall: str, start: float, end: float) -> Optional[Dict[str, Any]]:
+    if end - start < DOOR_WIDTH + 2 * WALL_MARGIN:
+        return None
+    return {'type': 'door', 'wall': wall, 'pos': _r((start + end - DOOR_WIDTH) / 2)}
+
+
+def _fix_doors(rooms, land_w: float, land_h: float) -> List[str]:
+    """Give door-less rooms a door onto a hall, else another room, else outside."""
+    fixes = []
+    rects = [_rect(r) for r in rooms]
+    for i, r in enumerate(rooms):
+        if any(op['type'] == 'door' for op in r['openings']):
+            continue
+        candidates = []
+        for j, other in enumerate(rooms):
+            if j == i:
+                continue
+            shared = _shared_wall(rects[i], rects[j])
+            door = shared and _door_on(*shared)
+            if door:
+                rank = DOOR_TARGETS.index(other.get('type')) if other.get('type') in DOOR_TARGETS else len(DOOR_TARGETS)
+                candidates.append((rank, j, door, _name(other, j)))
+        x, y, w, h = rects[i]
+        for wall, on_edge, length in (('south', y <= 0, w), ('north', y + h >= land_h, w),
+                                      ('west', x <= 0, h), ('east', x + w >= land_w, h)):
+            door = on_edge and _door_on(wall, 0.0, length)
+            if door:
+                candidates.append((len(DOOR_TARGETS) + 1, -1, door, 'outside'))
+        if candidates:
+            _, _, door, target = min(candidates, key=lambda c: c[:2])
+            r['openings'].append(door)
+            fixes.append(f"{_name(r, i)} got a door on its {door['wall']} wall to {target}")
+    return fixes
+
+
+def _fits(rect: Rect, i: int, rects: List[Rect], land_w: float, land_h: float) -> bool:
+    x, y, w, h = rect
+    if x < 0 or y < 0 or x + w > land_w + 1e-9 or y + h > land_h + 1e-9:
+        return False
+    for j, (ox, oy, ow, oh) in enumerate(rects):
+        if j != i and (min(x + w, ox + ow) - max(x, ox) > OVERLAP_TOLERANCE
+                       and min(y + h, oy + oh) - max(y, oy) > OVERLAP_TOLERANCE):
+            return False
+    return True
+
+
+def _fix_areas(rooms, land_w: float, land_h: float) -> List[str]:
+    """Grow undersized rooms to their minimum area into free space next to them."""
+    fixes = []
+    rects = [_rect(r) for r in rooms]
+    for i, r in enumerate(rooms):
+        min_area = MIN_ROOM_AREAS.get(r.get('type'), 0)
+        x, y, w, h = rects[i]
+        if w <= 0 or h <= 0 or w * h >= min_area:
+            continue
+        dw = math.ceil((min_area / h - w) / GRID - 1e-9) * GRID
+        dh = math.ceil((min_area / w - h) / GRID - 1e-9) * GRID
+        options = sorted([
+            (dw, 'east', (x, y, w + dw, h)),
+            (dw, 'west', (x - dw, y, w + dw, h)),
+            (dh, 'north', (x, y, w, h + dh)),
+            (dh, 'south', (x, y - dh, w, h + dh)),
+        ], key=lambda o: o[0])
+        for grow, side, rect in options:
+            if not _fits(rect, i, rects, land_w, land_h):
+                continue
+            # Keep openings where they were when the origin moves
+            shifted = {'west': ('north', 'south'), 'south': ('east', 'west')}.get(side, ())
+            for op in r['openings']:
+                if op['wall'] in shifted:
+                    op['pos'] = _r(float(op['pos']) + grow)
+            r['x'], r['y'], r['width'], r['height'] = (_r(v) for v in rect)
+            rects[i] = rect
+            fixes.append(f"{_name(r, i)} grown {grow:.1f}m {side} to {min_area}m2")
+            break
+    return fixes
+
+
+def repair_spec(data: Dict[str, Any], tolerance: float = None) -> Tuple[Dict[str, Any], List[str]]:
+    """Fix small spatial and standards errors; returns the validated spec and what was changed.
+
+    Raises ValueError, worded like ``validate_and_fill``, when the spec is
+    still invalid after the repair (or has schema errors, which are never
+    guessed at). ``data`` itself is not modified.
+    """
+    tol = settings.SPEC_REPAIR_TOLERANCE if tolerance is None else tolerance
+    spec = deepcopy(data)
+    fast = _fast_fill()
+    if fast is None or not fast(spec):
+        spec = _fill_defaults(SCHEMA, spec)
+        if next(_schema_validator().iter_errors(spec), None) is not None:
+            return validate_and_fill(spec), []  # raises the schema errors
+
+    land_w, land_h = float(spec['land_width']), float(spec['land_height'])
+    fixes = []
+    for floor in floor_plans(spec):
+        # Floor copies share their room lists with ``spec``
+        rooms = floor['rooms']
+        found = _fix_bounds(rooms, land_w, land_h, tol)
+        found += _fix_overlaps(rooms, tol)
+        found += _fix_doors(rooms, land_w, land_h)
+        found += _fix_areas(rooms, land_w, land_h)
+        prefix = f"{floor['floor_name']}: " if 'floor_name' in floor else ''
+        fixes += [prefix + fix for fix in found]
+    return validate_and_fill(spec), fixes
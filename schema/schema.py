@@ -1,6 +1,33 @@
-from typing import Any, Dict
+from typing import Any, Dict, List
 from config import settings
 
+ROOM_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'name': {'type': 'string'},
+        'type': {'type': 'string'},
+        'x': {'type': 'number'},
+        'y': {'type': 'number'},
+        'width': {'type': 'number'},
+        'height': {'type': 'number'},
+        'separate': {'type': 'boolean', 'default': False},
+        'openings': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'type': {'type': 'string', 'enum': ['door', 'window']},
+                    'wall': {'type': 'string', 'enum': ['north', 'south', 'east', 'west']},
+                    'pos': {'type': 'number'}
+                },
+                'required': ['type', 'wall', 'pos']
+            },
+            'default': []
+        }
+    },
+    'required': ['type', 'x', 'y', 'width', 'height']
+}
+
 SCHEMA = {
     'type': 'object',
     'properties': {
@@ -8,35 +35,18 @@ SCHEMA = {
         'land_width': {'type': 'number', 'default': 10.0},
         'land_height': {'type': 'number', 'default': 10.0},
         'floor_count': {'type': 'integer', 'default': settings.DEFAULT_FLOOR_COUNT},
-        'rooms': {
+        'rooms': {'type': 'array', 'items': ROOM_SCHEMA, 'default': []},
+        # Multi-storey plans: one entry per floor, ground floor first (replaces 'rooms')
+        'floors': {
             'type': 'array',
             'items': {
                 'type': 'object',
                 'properties': {
                     'name': {'type': 'string'},
-                    'type': {'type': 'string'},
-                    'x': {'type': 'number'},
-                    'y': {'type': 'number'},
-                    'width': {'type': 'number'},
-                    'height': {'type': 'number'},
-                    'separate': {'type': 'boolean', 'default': False},
-                    'openings': {
-                        'type': 'array',
-                        'items': {
-                            'type': 'object',
-                            'properties': {
-                                'type': {'type': 'string', 'enum': ['door', 'window']},
-                                'wall': {'type': 'string', 'enum': ['north', 'south', 'east', 'west']},
-                                'pos': {'type': 'number'}
-                            },
-                            'required': ['type', 'wall', 'pos']
-                        },
-                        'default': []
-                    }
+                    'rooms': {'type': 'array', 'items': ROOM_SCHEMA, 'default': []},
                 },
-                'required': ['type', 'x', 'y', 'width', 'height']
-            },
-            'default': []
+                'required': ['rooms']
+            }
         },
         'entrance': {'type': 'string', 'enum': ['north', 'south', 'east', 'west'], 'default': settings.DEFAULT_ENTRANCE},
         'style': {'type': 'string', 'enum': ['Modern', 'Classic'], 'default': 'Modern'},
@@ -45,3 +55,18 @@ SCHEMA = {
     },
     'required': ['land_width', 'land_height', 'rooms']
 }
+
+
+def floor_plans(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One single-floor spec per storey.
+
+    A spec with ``floors`` gives a copy of itself per floor, with that
+    floor's ``rooms`` and a ``floor_name``; top-level ``rooms`` is then
+    ignored. Without ``floors`` the spec is its own only floor.
+    """
+    floors = spec.get('floors') or []
+    if not floors:
+        return [spec]
+    base = {k: v for k, v in spec.items() if k not in ('floors', 'rooms')}
+    return [{**base, 'rooms': floor.get('rooms', []), 'floor_name': floor.get('name') or f"{i + 1}-qavat"}
+            for i, floor in enumerate(floors)]
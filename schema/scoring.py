@@ -0,0 +1,75 @@
+"""Cheap quality score for a validated spec, used to rank layout variants.
+
+Only the spec data is looked at (no geometry, no rendering), so scoring a
+plan takes microseconds next to the seconds spent drawing it.
+"""
+from typing import Any, Dict, List, Tuple
+
+from config.standards import DOOR_WIDTH, WINDOW_WIDTH
+
+from .schema import floor_plans
+
+HALL_TYPES = ('hall', 'corridor')
+# Rooms that do not need daylight
+DARK_TYPES = HALL_TYPES + ('bathroom', 'stairs', 'basement')
+# Circulation share of the floor area that costs nothing; all of it above this share costs the full weight
+CORRIDOR_FREE_SHARE = 0.15
+CORRIDOR_MAX_SHARE = 0.5
+# Exterior windows per living room that earn the full ``windows`` part
+WINDOWS_PER_ROOM = 1.5
+WEIGHTS = {'area_fit': 0.4, 'corridor': 0.2, 'daylight': 0.25, 'windows': 0.15}
+# How far outside a wall to probe for a neighbouring room (m)
+_PROBE = 0.05
+
+
+def _outside(op: Dict[str, Any], r: Dict[str, Any]) -> Tuple[float, float]:
+    """Point just beyond the middle of an opening's wall segment."""
+    x, y, w, h = float(r['x']), float(r['y']), float(r['width']), float(r['height'])
+    width = float(op.get('width', DOOR_WIDTH if op['type'] == 'door' else WINDOW_WIDTH))
+    pos = float(op['pos']) + width / 2
+    return {
+        'north': (x + pos, y + h + _PROBE),
+        'south': (x + pos, y - _PROBE),
+        'east': (x + w + _PROBE, y + pos),
+        'west': (x - _PROBE, y + pos),
+    }[op['wall']]
+
+
+def _inside(px: float, py: float, rooms: List[Dict[str, Any]]) -> bool:
+    return any(float(r['x']) < px < float(r['x']) + float(r['width'])
+               and float(r['y']) < py < float(r['y']) + float(r['height']) for r in rooms)
+
+
+def score_spec(spec: Dict[str, Any]) -> Tuple[float, Dict[str, float]]:
+    """Score in [0, 1] (higher is better) and its parts.
+
+    * ``area_fit``: built room area against ``total_area``
+    * ``corridor``: penalty for halls and corridors taking more than their share
+    * ``daylight``: share of living rooms with a window on an exterior wall
+    * ``windows``: exterior windows per living room, up to ``WINDOWS_PER_ROOM``
+    """
+    built = circulation = 0.0
+    needs_light = lit = windows = 0
+    for floor in floor_plans(spec):
+        rooms = floor['rooms']
+        for r in rooms:
+            area = float(r['width']) * float(r['height'])
+            built += area
+            if r.get('type') in HALL_TYPES:
+                circulation += area
+            outer = [op for op in r.get('openings', [])
+                     if op['type'] == 'window' and not _inside(*_outside(op, r), rooms)]
+            windows += len(outer)
+            if r.get('type') not in DARK_TYPES:
+                needs_light += 1
+                lit += bool(outer)
+
+    target = float(spec.get('total_area') or built or 1.0)
+    area_fit = max(0.0, 1.0 - abs(built - target) / target)
+    share = circulation / built if built else 0.0
+    corridor = 1.0 - min(1.0, max(0.0, share - CORRIDOR_FREE_SHARE) / (CORRIDOR_MAX_SHARE - CORRIDOR_FREE_SHARE))
+    daylight = lit / needs_light if needs_light else 1.0
+    window_fit = min(1.0, windows / (WINDOWS_PER_ROOM * needs_light)) if needs_light else 1.0
+    parts = {'area_fit': area_fit, 'corridor': corridor, 'daylight': daylight, 'windows': window_fit}
+    score = sum(WEIGHTS[k] * v for k, v in parts.items())
+    return round(score, 4), dict(parts, corridor_share=share, exterior_windows=windows)
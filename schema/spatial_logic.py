@@ -1,39 +1,120 @@
-from typing import Dict, Any, List, Tuple
+import heapq
+import math
+from bisect import bisect_left, insort
+from typing import Dict, Any, List, Optional, Tuple
+
+OVERLAP_TOLERANCE = 0.05  # meters; smaller overlaps are treated as rounding noise
+
+
+def overlapping_pairs(rooms: List[Dict[str, Any]]) -> List[Tuple[int, int, float, float]]:
+    """``(i, j, overlap_w, overlap_h)`` for every overlapping pair, ``i < j``, in (i, j) order.
+
+    Sweep-line over x: rooms are visited by their left edge and compared only
+    with rooms whose x-extent is still open. Open rooms are bucketed by
+    height (powers of two) and kept sorted by bottom edge, so a lookup only
+    walks rooms that can reach the query's y-range, however tall the tallest
+    room is.
+    """
+    if len(rooms) < 2:
+        return []
+
+    rects = []
+    for i, r in enumerate(rooms):
+        x, y = float(r['x']), float(r['y'])
+        w, h = float(r['width']), float(r['height'])
+        # Degenerate or non-finite rooms can never exceed the tolerance
+        if not (w > 0 and h > 0 and math.isfinite(x + w) and math.isfinite(y + h)):
+            continue
+        rects.append((x, y, x + w, y + h, i))
+    box = {rect[4]: rect for rect in rects}
+    rects.sort()
+
+    hits = []
+    # height class -> open rooms of at most 2**class height, ordered by bottom edge
+    by_y: Dict[int, List[Tuple[float, int]]] = {}
+    by_x1: List[Tuple[float, int, float, int]] = []  # heap of open rooms by right edge
+    for x0, y0, x1, y1, i in rects:
+        while by_x1 and by_x1[0][0] <= x0:
+            _, oc, oy0, oi = heapq.heappop(by_x1)
+            bucket = by_y[oc]
+            del bucket[bisect_left(bucket, (oy0, oi))]
+        for oc, bucket in by_y.items():
+            # Candidates start below y1; anything starting a class height below y0 ends before it
+            reach = math.ldexp(1.0, oc)
+            k = bisect_left(bucket, (y1, -1))
+            while k > 0:
+                k -= 1
+                oy0, oi = bucket[k]
+                if oy0 + reach <= y0:
+                    break
+                ox0, _, ox1, oy1, _ = box[oi]
+                overlap_w = min(ox1, x1) - max(ox0, x0)
+                overlap_h = min(oy1, y1) - max(oy0, y0)
+                if overlap_w > OVERLAP_TOLERANCE and overlap_h > OVERLAP_TOLERANCE:
+                    hits.append((min(i, oi), max(i, oi), overlap_w, overlap_h))
+        c = math.frexp(y1 - y0)[1]  # y1 - y0 <= 2**c
+        insort(by_y.setdefault(c, []), (y0, i))
+        heapq.heappush(by_x1, (x1, c, y0, i))
+
+    return sorted(hits)
+
 
 def check_overlaps(rooms: List[Dict[str, Any]]) -> List[str]:
-    """Detect overlapping rooms and return error messages."""
-    errors = []
-    for i, r1 in enumerate(rooms):
-        for j, r2 in enumerate(rooms):
-            if i >= j: continue
-            
-            x1, y1 = float(r1['x']), float(r1['y'])
-            w1, h1 = float(r1['width']), float(r1['height'])
-            
-            x2, y2 = float(r2['x']), float(r2['y'])
-            w2, h2 = float(r2['width']), float(r2['height'])
-            
-            # Simple rectangle intersection
-            if not (x1 + w1 <= x2 or x2 + w2 <= x1 or y1 + h1 <= y2 or y2 + h2 <= y1):
-                # Tolerance check (e.g. 0.01m overlap might be rounding error)
-                overlap_w = min(x1 + w1, x2 + w2) - max(x1, x2)
-                overlap_h = min(y1 + h1, y2 + h2) - max(y1, y2)
-                if overlap_w > 0.05 and overlap_h > 0.05:
-                    n1 = r1.get('name', f"Room {i}")
-                    n2 = r2.get('name', f"Room {j}")
-                    errors.append(f"{n1} and {n2} overlap by {overlap_w:.2f}m x {overlap_h:.2f}m")
-    return errors
+    """Detect overlapping rooms and return error messages.
+
+    Errors come out in the same (i, j) order as a full pairwise scan.
+    """
+    return [_overlap_message(rooms[i], i, rooms[j], j, overlap_w, overlap_h)
+            for i, j, overlap_w, overlap_h in overlapping_pairs(rooms)]
+
+
+def _overlap_message(a, i, b, j, overlap_w, overlap_h) -> str:
+    n1 = a.get('name', f"Room {i}")
+    n2 = b.get('name', f"Room {j}")
+    return f"{n1} and {n2} overlap by {overlap_w:.2f}m x {overlap_h:.2f}m"
+
+
+def overlap_size(a: Dict[str, Any], b: Dict[str, Any]) -> Tuple[float, float]:
+    """Width and height of the intersection of two rooms (negative when apart)."""
+    overlap_w = (min(float(a['x']) + float(a['width']), float(b['x']) + float(b['width']))
+                 - max(float(a['x']), float(b['x'])))
+    overlap_h = (min(float(a['y']) + float(a['height']), float(b['y']) + float(b['height']))
+                 - max(float(a['y']), float(b['y'])))
+    return overlap_w, overlap_h
+
+
+def overlap_error(a: Dict[str, Any], i: int, b: Dict[str, Any], j: int) -> Optional[str]:
+    """Overlap message for one pair of rooms (``i < j``), None if they do not overlap."""
+    overlap_w, overlap_h = overlap_size(a, b)
+    if overlap_w > OVERLAP_TOLERANCE and overlap_h > OVERLAP_TOLERANCE:
+        return _overlap_message(a, i, b, j, overlap_w, overlap_h)
+    return None
+
+
+def door_error(r: Dict[str, Any], i: int) -> Optional[str]:
+    if any(op['type'] == 'door' for op in r.get('openings', [])):
+        return None
+    name = r.get('name', f"Room {i}")
+    return f"{name} has no doors - it must be accessible."
+
+
+def bounds_overshoot(r: Dict[str, Any], land_w: float, land_h: float) -> float:
+    """How far (m) the room reaches past the land on its worst side; 0 when inside."""
+    x, y = float(r['x']), float(r['y'])
+    w, h = float(r['width']), float(r['height'])
+    return max(0.0, -x, -y, x + w - land_w, y + h - land_h)
+
+
+def bounds_error(r: Dict[str, Any], i: int, land_w: float, land_h: float) -> Optional[str]:
+    if bounds_overshoot(r, land_w, land_h) > 0:
+        name = r.get('name', f"Room {i}")
+        return f"{name} is outside land boundaries ({land_w}x{land_h})."
+    return None
 
 def check_connectivity(rooms: List[Dict[str, Any]]) -> List[str]:
     """Check if rooms are connected (have doors/openings to other rooms or exterior)."""
     # This is a bit more complex, for now we just check if every room has at least one door
-    errors = []
-    for i, r in enumerate(rooms):
-        doors = [op for op in r.get('openings', []) if op['type'] == 'door']
-        if not doors:
-            name = r.get('name', f"Room {i}")
-            errors.append(f"{name} has no doors - it must be accessible.")
-    return errors
+    return [e for e in (door_error(r, i) for i, r in enumerate(rooms)) if e]
 
 def validate_spatial_integrity(data: Dict[str, Any]):
     """Run all spatial checks."""
@@ -46,11 +127,9 @@ def validate_spatial_integrity(data: Dict[str, Any]):
     land_w = float(data.get('land_width', 0))
     land_h = float(data.get('land_height', 0))
     for i, r in enumerate(rooms):
-        x, y = float(r['x']), float(r['y'])
-        w, h = float(r['width']), float(r['height'])
-        if x < 0 or y < 0 or x + w > land_w or y + h > land_h:
-            name = r.get('name', f"Room {i}")
-            errors.append(f"{name} is outside land boundaries ({land_w}x{land_h}).")
+        error = bounds_error(r, i, land_w, land_h)
+        if error:
+            errors.append(error)
             
     if errors:
         raise ValueError("\n".join(errors))
@@ -0,0 +1,155 @@
+"""Seeded synthetic floor plans for load and scale testing.
+
+The land is cut into rows and every row into rooms of jittered size, so
+rooms tile the land without overlaps. Every room gets a door and the
+biggest cells get the types with the biggest minimum areas, so the output
+passes ``validate_and_fill`` as is.
+"""
+import itertools
+import math
+import random
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from config.standards import DOOR_WIDTH, GRID, MIN_ROOM_AREAS, MIN_ROOM_WIDTH, WALL_MARGIN, WINDOW_WIDTH
+
+DEFAULT_MIX = {
+    'bedroom': 3,
+    'living_room': 1,
+    'kitchen': 1,
+    'bathroom': 2,
+    'hall': 1,
+    'other': 1,
+}
+
+IntRange = Union[int, Tuple[int, int]]
+
+
+def _pick(rng: random.Random, value: IntRange) -> int:
+    return rng.randint(*value) if isinstance(value, tuple) else value
+
+
+def _snap(v: float) -> float:
+    return round(round(v / GRID) * GRID, 2)
+
+
+def _partition(rng: random.Random, length: float, parts: int) -> List[Tuple[float, float]]:
+    """Cut ``length`` into ``parts`` snapped (start, size) spans, none below MIN_ROOM_WIDTH."""
+    least = MIN_ROOM_WIDTH + GRID
+    slack = length - parts * least
+    if slack < 0:
+        raise ValueError(f"{length:g}m is too short for {parts} rooms of {MIN_ROOM_WIDTH:g}m.")
+    weights = [rng.uniform(0.6, 1.4) for _ in range(parts)]
+    total = sum(weights)
+    cuts, acc = [0.0], 0.0
+    for wt in weights[:-1]:
+        acc += least + slack * wt / total
+        cuts.append(_snap(acc))
+    cuts.append(length)
+    return [(a, round(b - a, 2)) for a, b in zip(cuts, cuts[1:])]
+
+
+def _layout(rng: random.Random, land_w: float, land_h: float, n: int) -> List[Tuple[float, float, float, float]]:
+    """Rows of rooms filling the land; returns (x, y, w, h) cells."""
+    rows = min(n, max(1, round(math.sqrt(n * land_h / land_w))))
+    per_row = [n // rows + (i < n % rows) for i in range(rows)]
+    rng.shuffle(per_row)
+    cells = []
+    for (y, h), count in zip(_partition(rng, land_h, rows), per_row):
+        cells.extend((x, y, w, h) for x, w in _partition(rng, land_w, count))
+    return cells
+
+
+def _assign_types(rng: random.Random, cells, mix: Dict[str, float], stairs: bool) -> List[str]:
+    """Pair the largest cells with the most demanding room types."""
+    types = rng.choices(list(mix), weights=list(mix.values()), k=len(cells))
+    if stairs and 'stairs' not in types:
+        types[rng.randrange(len(types))] = 'stairs'
+    types.sort(key=lambda t: MIN_ROOM_AREAS.get(t, 0), reverse=True)
+    order = sorted(range(len(cells)), key=lambda i: cells[i][2] * cells[i][3], reverse=True)
+
+    fallback = sorted(mix, key=lambda t: MIN_ROOM_AREAS.get(t, 0))
+    assigned = [''] * len(cells)
+    for i, r_type in zip(order, types):
+        area = cells[i][2] * cells[i][3]
+        if area < MIN_ROOM_AREAS.get(r_type, 0):
+            fits = [t for t in fallback if MIN_ROOM_AREAS.get(t, 0) <= area]
+            r_type = fits[-1] if fits else 'other'
+        assigned[i] = r_type
+    return assigned
+
+
+def _openings(rng: random.Random, x, y, w, h, land_w, land_h, density: float) -> List[Dict[str, Any]]:
+    walls = {'south': w, 'north': w, 'west': h, 'east': h}
+    door_wall = rng.choice(list(walls))
+    openings = [{'type': 'door', 'wall': door_wall,
+                 'pos': _snap(rng.uniform(WALL_MARGIN, walls[door_wall] - DOOR_WIDTH - WALL_MARGIN))}]
+
+    # Windows go on walls that lie on the land boundary
+    exterior = [name for name, on_edge in [('south', y <= 0), ('north', y + h >= land_h),
+                                           ('west', x <= 0), ('east', x + w >= land_w)]
+                if on_edge and walls[name] >= WINDOW_WIDTH + 2 * WALL_MARGIN]
+    count = int(density) + (rng.random() < density - int(density))
+    for wall in rng.sample(exterior, min(count, len(exterior))):
+        openings.append({'type': 'window', 'wall': wall,
+                         'pos': _snap(rng.uniform(WALL_MARGIN, walls[wall] - WINDOW_WIDTH - WALL_MARGIN))})
+    return openings
+
+
+def generate_spec(seed: Union[int, str] = 0, rooms: IntRange = 8, land_width: Optional[float] = None,
+                  land_height: Optional[float] = None, floors: IntRange = 1, opening_density: float = 1.0,
+                  type_mix: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Build one schema-valid spec; the same arguments always give the same plan.
+
+    ``rooms`` and ``floors`` take an int or an inclusive (min, max) range.
+    Land size is derived from the room mix when not given. ``opening_density``
+    is the expected number of windows per room on top of its door.
+    """
+    rng = random.Random(seed)
+    mix = type_mix or DEFAULT_MIX
+    n = _pick(rng, rooms)
+    floor_count = _pick(rng, floors)
+    if n < 1:
+        raise ValueError("A plan needs at least one room.")
+
+    if land_width is None or land_height is None:
+        avg_min = sum(MIN_ROOM_AREAS.get(t, 0) * wt for t, wt in mix.items()) / sum(mix.values())
+        area = n * max(avg_min * 1.8, MIN_ROOM_WIDTH ** 2 * 3)
+        aspect = rng.uniform(1.0, 1.6)
+        land_width = land_width or math.ceil(math.sqrt(area * aspect) * 2) / 2
+        land_height = land_height or math.ceil(area / land_width * 2) / 2
+    land_w, land_h = float(land_width), float(land_height)
+
+    cells = _layout(rng, land_w, land_h, n)
+    types = _assign_types(rng, cells, mix, stairs=floor_count > 1)
+
+    counters: Dict[str, int] = {}
+    room_list = []
+    for (x, y, w, h), r_type in zip(cells, types):
+        counters[r_type] = counters.get(r_type, 0) + 1
+        room_list.append({
+            'name': f"{r_type.replace('_', ' ').title()} {counters[r_type]}",
+            'type': r_type,
+            'x': x, 'y': y, 'width': w, 'height': h,
+            'openings': _openings(rng, x, y, w, h, land_w, land_h, opening_density),
+        })
+
+    return {
+        'land_width': land_w,
+        'land_height': land_h,
+        'total_area': round(sum(r['width'] * r['height'] for r in room_list) * floor_count, 2),
+        'floor_count': floor_count,
+        'entrance': rng.choice(['north', 'south', 'east', 'west']),
+        'style': rng.choice(['Modern', 'Classic']),
+        'rooms': room_list,
+    }
+
+
+def iter_specs(count: Optional[int] = None, seed: Union[int, str] = 0, **params) -> Iterator[Dict[str, Any]]:
+    """Lazily yield ``count`` specs (endless when None) for soak tests.
+
+    Spec ``i`` depends only on ``seed`` and ``i``, so any slice of the stream
+    can be reproduced on its own.
+    """
+    indices = itertools.count() if count is None else range(count)
+    for i in indices:
+        yield generate_spec(seed=f"{seed}:{i}", **params)
@@ -1,20 +1,25 @@
+from copy import deepcopy
+from functools import lru_cache
 from jsonschema import Draft7Validator
-from .schema import SCHEMA
-from .spatial_logic import validate_spatial_integrity
+from .schema import SCHEMA, floor_plans
+from .spatial_logic import (bounds_error, bounds_overshoot, door_error, overlap_error, overlap_size,
+                            validate_spatial_integrity)
 from config.standards import MIN_ROOM_AREAS
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Optional
+
+
+def area_error(r: Dict[str, Any], i: int) -> Optional[str]:
+    area = float(r['width']) * float(r['height'])
+    min_area = MIN_ROOM_AREAS.get(r.get('type'), 0)
+    if area < min_area:
+        name = r.get('name', f"Room {i}")
+        return f"{name} area ({area:.1f}m2) is below standard ({min_area}m2)."
+    return None
 
 
 def check_standards(data: Dict[str, Any]):
     """Check if rooms meet minimum area standards."""
-    errors = []
-    for i, r in enumerate(data.get('rooms', [])):
-        r_type = r.get('type')
-        area = float(r['width']) * float(r['height'])
-        min_area = MIN_ROOM_AREAS.get(r_type, 0)
-        if area < min_area:
-            name = r.get('name', f"Room {i}")
-            errors.append(f"{name} area ({area:.1f}m2) is below standard ({min_area}m2).")
+    errors = [e for e in (area_error(r, i) for i, r in enumerate(data.get('rooms', []))) if e]
     if errors:
         raise ValueError("\n".join(errors))
 
@@ -39,20 +44,196 @@ def _fill_defaults(schema, instance):
     return instance
 
 
+@lru_cache(maxsize=None)
+def _schema_validator() -> Draft7Validator:
+    """Draft7 validator for SCHEMA, built once per process."""
+    return Draft7Validator(SCHEMA)
+
+
+_FAST_KEYWORDS = {'type', 'properties', 'required', 'items', 'enum', 'default'}
+_TYPE_CHECKS = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'boolean': lambda v: isinstance(v, bool),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'integer': lambda v: (isinstance(v, int) and not isinstance(v, bool)) or (isinstance(v, float) and v.is_integer()),
+}
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _compile_fast(schema) -> Callable[[Any], bool]:
+    """Compile a schema node into a single-pass fill-and-check function.
+
+    The returned function fills defaults in place exactly like
+    ``_fill_defaults`` and returns False as soon as the instance is not valid
+    or takes a shape it does not handle; the caller then falls back to the
+    full validator so error messages stay identical.
+    """
+    if set(schema) - _FAST_KEYWORDS or schema.get('type') not in _TYPE_CHECKS:
+        raise _Unsupported(schema)
+    is_type = _TYPE_CHECKS[schema['type']]
+
+    if schema['type'] == 'object':
+        props = []
+        for prop, sub in schema.get('properties', {}).items():
+            props.append((prop, _compile_fast(sub), 'default' in sub, sub.get('default')))
+        required = tuple(schema.get('required', ()))
+
+        def check_object(inst):
+            if not isinstance(inst, dict) or not inst:
+                return False
+            for prop, check, has_default, default in props:
+                if prop in inst:
+                    value = inst[prop]
+                    if value is None and has_default:
+                        inst[prop] = deepcopy(default)
+                    elif not check(value):
+                        return False
+                elif has_default:
+                    inst[prop] = deepcopy(default)
+            return all(r in inst for r in required)
+        return check_object
+
+    if schema['type'] == 'array':
+        check_item = _compile_fast(schema['items']) if 'items' in schema else (lambda v: True)
+
+        def check_array(inst):
+            return isinstance(inst, list) and all(check_item(it) for it in inst)
+        return check_array
+
+    enum = schema.get('enum')
+    if enum is not None:
+        return lambda v: is_type(v) and isinstance(v, str) and v in enum
+    return is_type
+
+
+@lru_cache(maxsize=None)
+def _fast_fill() -> Optional[Callable[[Any], bool]]:
+    try:
+        return _compile_fast(SCHEMA)
+    except _Unsupported:
+        return None
+
+
+# Substring of each error line -> rule name (for metrics and logs)
+_RULES = [
+    ('Schema errors', 'schema'),
+    (' overlap by ', 'overlap'),
+    (' has no doors', 'connectivity'),
+    (' outside land boundaries', 'bounds'),
+    (' is below standard', 'min_area'),
+]
+
+
+def failed_rules(error: str) -> List[str]:
+    """Name the rule behind every line of a ``validate_and_fill`` error."""
+    rules = []
+    for line in error.splitlines():
+        rules.append(next((rule for marker, rule in _RULES if marker in line), 'other'))
+    return rules
+
+
 def validate_and_fill(data: Dict[str, Any]) -> Dict[str, Any]:
     '''Validate incoming dict against schema and fill defaults.'''
-    validator = Draft7Validator(SCHEMA)
-    
-    filled = _fill_defaults(SCHEMA, data)
+    fast = _fast_fill()
+    if fast is not None and fast(data):
+        filled = data
+    else:
+        # Slow path: reproduce the exact jsonschema error report
+        validator = _schema_validator()
+        filled = _fill_defaults(SCHEMA, data)
+
+        # Standard JSON Schema Validation
+        errors = sorted(validator.iter_errors(filled), key=lambda e: e.path)
+        if errors:
+            msgs = '; '.join([f"{'/'.join(map(str,e.path))}: {e.message}" for e in errors])
+            raise ValueError(f"Schema errors: {msgs}")
     
-    # Standard JSON Schema Validation
-    errors = sorted(validator.iter_errors(filled), key=lambda e: e.path)
+    # Advanced Architectural Validation, floor by floor
+    floors = floor_plans(filled)
+    if len(floors) == 1:
+        validate_spatial_integrity(filled)
+        check_standards(filled)
+        return filled
+
+    filled['floor_count'] = len(floors)
+    errors = []
+    for floor in floors:
+        try:
+            validate_spatial_integrity(floor)
+            check_standards(floor)
+        except ValueError as e:
+            errors.extend(f"{floor['floor_name']}: {line}" for line in str(e).splitlines())
     if errors:
-        msgs = '; '.join([f"{'/'.join(map(str,e.path))}: {e.message}" for e in errors])
-        raise ValueError(f"Schema errors: {msgs}")
-    
-    # Advanced Architectural Validation
-    validate_spatial_integrity(filled)
-    check_standards(filled)
-    
+        raise ValueError("\n".join(errors))
     return filled
+
+
+@lru_cache(maxsize=None)
+def _room_validator() -> Draft7Validator:
+    return Draft7Validator(SCHEMA['properties']['rooms']['items'])
+
+
+class RoomChecker:
+    """Checks rooms one at a time as they stream in from the model.
+
+    Uses the same rules and messages as ``validate_and_fill``, so an error
+    found early reads exactly like the one the full check would report.
+    Land bounds are checked once both land fields have arrived. With a
+    ``tolerance`` (local repair is on) only errors ``repair_spec`` cannot
+    fix abort the stream: overlaps and overshoots up to the tolerance,
+    missing doors and undersized rooms are left for the repair. Rooms of
+    ``floors[i]`` go to ``floor(i)``, which checks them against each other
+    and the same land.
+    """
+
+    def __init__(self, tolerance: float = 0.0):
+        self.tolerance = tolerance
+        self.fields: Dict[str, Any] = {}
+        self.rooms: List[Dict[str, Any]] = []
+        self.floors: Dict[int, 'RoomChecker'] = {}
+        self._land = self.fields
+        self._index: Optional[int] = None
+
+    def field(self, name: str, value: Any):
+        self.fields[name] = value
+
+    def floor(self, index: int) -> 'RoomChecker':
+        """Checker for the rooms of ``floors[index]``; its fields are that floor's."""
+        checker = self.floors.get(index)
+        if checker is None:
+            checker = self.floors[index] = RoomChecker(self.tolerance)
+            checker._land = self.fields
+            checker._index = index
+        return checker
+
+    def check(self, room: Any) -> List[str]:
+        """Error lines for the next room; empty when it is fine so far."""
+        i = len(self.rooms)
+        errors = sorted(_room_validator().iter_errors(room), key=lambda e: e.path)
+        if errors:
+            path = ['rooms', i] if self._index is None else ['floors', self._index, 'rooms', i]
+            msgs = '; '.join(f"{'/'.join(map(str, [*path, *e.path]))}: {e.message}" for e in errors)
+            return [f"Schema errors: {msgs}"]
+        room = _fill_defaults(SCHEMA['properties']['rooms']['items'], deepcopy(room))
+        lenient = self.tolerance > 0
+        found = [overlap_error(other, j, room, i) for j, other in enumerate(self.rooms)
+                 if not lenient or min(overlap_size(other, room)) > self.tolerance]
+        if not lenient:
+            found.append(door_error(room, i))
+        land_w, land_h = self._land.get('land_width'), self._land.get('land_height')
+        if isinstance(land_w, (int, float)) and isinstance(land_h, (int, float)):
+            if not lenient or bounds_overshoot(room, float(land_w), float(land_h)) > self.tolerance:
+                found.append(bounds_error(room, i, float(land_w), float(land_h)))
+        if not lenient:
+            found.append(area_error(room, i))
+        self.rooms.append(room)
+        if self._index is None:
+            return [e for e in found if e]
+        # Same prefix as validate_and_fill puts on a floor's errors
+        name = self.fields.get('name') or f"{self._index + 1}-qavat"
+        return [f"{name}: {e}" for e in found if e]
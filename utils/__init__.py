@@ -1 +1,3 @@
 from .files import unique_name
+from .artifacts import ArtifactStore, artifact_store, spec_hash
+from .metrics import metrics
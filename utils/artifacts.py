@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from config import settings
+from utils.files import date_shard, unique_stem
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Bump when the drawing code changes so stale artifacts are not served
+ARTIFACT_VERSION = '2'
+
+
+def spec_hash(spec: Dict[str, Any]) -> str:
+    """Content hash of a validated spec (key order and whitespace independent)."""
+    canonical = json.dumps(spec, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(f"{ARTIFACT_VERSION}\0{canonical}".encode('utf-8')).hexdigest()
+
+
+class ArtifactStore:
+    """DXF/PNG pairs under OUTPUT_DIR with an SQLite index and retention budgets.
+
+    Workers write into ``.staging`` and finished pairs are renamed into place,
+    so a stored path is always a complete file. Content-addressed entries go
+    to ``cache/ab/cd/<hash>``, one-off ones to ``YYYY/MM/DD/<name>``. The
+    index holds size and last access of every entry, so ``reap`` drops the
+    expired and least recently used entries without scanning directories.
+    """
+
+    EXTS = ('dxf', 'png')
+    # Everything the store may hold (zipped DXF replaces .dxf)
+    SCAN_EXTS = ('dxf', 'zip', 'png')
+    # Entries used this recently are never evicted (they may still be uploading)
+    GRACE = 600
+    STAGING = '.staging'
+
+    def __init__(self, root: Path = None, index_path: Path = None, max_bytes: int = None,
+                 max_age: float = None):
+        self.root = Path(root or settings.OUTPUT_DIR)
+        self.index_path = Path(index_path or settings.ARTIFACT_INDEX_PATH)
+        self.max_bytes = max_bytes or settings.ARTIFACT_MAX_BYTES
+        self.max_age = max_age or settings.ARTIFACT_MAX_AGE
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            fresh = not self.index_path.exists()
+            db = sqlite3.connect(str(self.index_path), timeout=10, isolation_level=None,
+                                 check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS artifacts ('
+                'key TEXT PRIMARY KEY, relpath TEXT NOT NULL, exts TEXT NOT NULL, size INTEGER NOT NULL, '
+                'created REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS artifacts_accessed ON artifacts(accessed)')
+            self._db = db
+            if fresh:
+                self._rebuild_index()
+        return self._db
+
+    def _rebuild_index(self):
+        """Index files already on disk (first start, or the index was deleted).
+
+        Files from before the store, including the old flat OUTPUT_DIR, are
+        indexed where they are and age out like everything else.
+        """
+        entries: Dict[str, list] = {}
+        for ext in self.SCAN_EXTS:
+            for p in self.root.rglob(f'*.{ext}'):
+                rel = p.relative_to(self.root).with_suffix('')
+                if rel.parts[0] == self.STAGING:
+                    continue
+                st = p.stat()
+                entry = entries.setdefault(rel.as_posix(), [[], 0, st.st_mtime])
+                entry[0].append(ext)
+                entry[1] += st.st_size
+                entry[2] = max(entry[2], st.st_mtime)
+        for relpath, (exts, size, mtime) in entries.items():
+            self._db.execute('INSERT OR IGNORE INTO artifacts VALUES (?, ?, ?, ?, ?, ?)',
+                             (Path(relpath).name, relpath, ','.join(exts), size, mtime, mtime))
+        if entries:
+            logger.info(f"Indexed {len(entries)} existing artifacts in {self.root}")
+
+    def _paths(self, relpath: str, exts=EXTS) -> Tuple[Path, ...]:
+        base = self.root / relpath
+        return tuple(base.with_name(f"{base.name}.{ext}") for ext in exts)
+
+    def staging_path(self, ext: str) -> Path:
+        """Private path on the store's filesystem for a worker to write into."""
+        folder = self.root / self.STAGING
+        folder.mkdir(parents=True, exist_ok=True)
+        return folder / f"{uuid.uuid4().hex}.{ext}"
+
+    def lookup(self, key: str) -> Optional[Tuple[Path, Path]]:
+        with self._lock:
+            db = self._conn()
+            row = db.execute('SELECT relpath, exts FROM artifacts WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                paths = self._paths(row[0], row[1].split(','))
+                if len(paths) == 2 and paths[1].suffix == '.png' and all(p.exists() for p in paths):
+                    db.execute('UPDATE artifacts SET accessed = ? WHERE key = ?', (time.time(), key))
+                    self.hits += 1
+                    return paths
+                self._forget(key, row[0], row[1])
+            self.misses += 1
+            return None
+
+    def _stage(self, data: bytes, ext: str) -> Path:
+        path = self.staging_path(ext)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def store(self, key: Optional[str], dxf: Union[Path, bytes], png: Union[Path, bytes],
+              dxf_ext: str = 'dxf') -> Tuple[Path, Path]:
+        """Rename finished files (or contents written to staging) into the store.
+
+        With a content ``key`` the pair can be found again by ``lookup``;
+        without one it gets a unique name in today's directory.
+        """
+        exts = (dxf_ext, 'png')
+        dxf_path, png_path = (self._stage(data, ext) if isinstance(data, bytes) else data
+                              for data, ext in zip((dxf, png), exts))
+        if key:
+            relpath = f"cache/{key[:2]}/{key[2:4]}/{key}"
+        else:
+            relpath = f"{date_shard()}/{unique_stem()}"
+        targets = self._paths(relpath, exts)
+        targets[0].parent.mkdir(parents=True, exist_ok=True)
+        size = 0
+        for src, dst in zip((dxf_path, png_path), targets):
+            os.replace(src, dst)
+            size += dst.stat().st_size
+        now = time.time()
+        with self._lock:
+            self._conn().execute('INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?)',
+                                 (key or Path(relpath).name, relpath, ','.join(exts), size, now, now))
+        return targets
+
+    def _forget(self, key: str, relpath: str, exts: str):
+        self._db.execute('DELETE FROM artifacts WHERE key = ?', (key,))
+        for p in self._paths(relpath, exts.split(',')):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+        # Drop emptied shard directories up to the store root
+        folder = (self.root / relpath).parent
+        while folder != self.root:
+            try:
+                folder.rmdir()
+            except OSError:
+                break
+            folder = folder.parent
+
+    def reap(self) -> Dict[str, int]:
+        """Enforce the age and size budgets; returns how many entries each removed."""
+        now = time.time()
+        removed = {'age': 0, 'size': 0, 'staging': 0}
+        with self._lock:
+            db = self._conn()
+            for key, relpath, exts in db.execute('SELECT key, relpath, exts FROM artifacts WHERE accessed < ?',
+                                                 (now - self.max_age,)).fetchall():
+                self._forget(key, relpath, exts)
+                removed['age'] += 1
+
+            total = db.execute('SELECT COALESCE(SUM(size), 0) FROM artifacts').fetchone()[0]
+            while total > self.max_bytes:
+                batch = db.execute('SELECT key, relpath, exts, size FROM artifacts WHERE accessed < ? '
+                                   'ORDER BY accessed LIMIT 256', (now - self.GRACE,)).fetchall()
+                if not batch:
+                    break
+                for key, relpath, exts, size in batch:
+                    if total <= self.max_bytes:
+                        break
+                    self._forget(key, relpath, exts)
+                    total -= size
+                    removed['size'] += 1
+
+        # Leftovers of crashed or timed-out jobs
+        staging = self.root / self.STAGING
+        if staging.is_dir():
+            for p in staging.iterdir():
+                try:
+                    if p.stat().st_mtime < now - self.GRACE:
+                        p.unlink()
+                        removed['staging'] += 1
+                except FileNotFoundError:
+                    pass
+
+        for reason in ('age', 'size'):
+            if removed[reason]:
+                metrics.inc('artifact_evictions_total', removed[reason], reason=reason)
+        metrics.set('artifact_store_bytes', total)
+        if removed['age'] or removed['size']:
+            logger.info(f"Artifact reaper removed {removed['age']} expired and {removed['size']} "
+                        f"over-budget entries, {total / 1024 / 1024:.1f} MB left")
+        return removed
+
+    async def run_reaper(self, interval: float = None):
+        """Background task: ``reap`` every ``interval`` seconds until cancelled."""
+        interval = interval or settings.ARTIFACT_REAP_INTERVAL
+        while True:
+            try:
+                await asyncio.to_thread(self.reap)
+            except Exception:
+                logger.exception("Artifact reaper failed")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, total = self._conn().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts').fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'bytes': total,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+artifact_store = ArtifactStore()
@@ -4,8 +4,28 @@ from pathlib import Path
 from config.settings import OUTPUT_DIR, FILENAME_PREFIX
 
 
-def unique_name(ext: str, prefix: str = FILENAME_PREFIX) -> Path:
+def date_shard(when: datetime = None) -> str:
+    """Relative ``YYYY/MM/DD`` directory, so no single directory grows without bound."""
+    return (when or datetime.utcnow()).strftime('%Y/%m/%d')
+
+
+def unique_stem(prefix: str = FILENAME_PREFIX) -> str:
     stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
     uid = uuid.uuid4().hex[:8]
-    name = f"{prefix}_{stamp}_{uid}.{ext}"
-    return OUTPUT_DIR / name
+    return f"{prefix}_{stamp}_{uid}"
+
+
+def unique_name(ext: str, prefix: str = FILENAME_PREFIX) -> Path:
+    folder = OUTPUT_DIR / date_shard()
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder / f"{unique_stem(prefix)}.{ext}"
+
+
+def human_size(size: float) -> str:
+    """Byte count for people: 1536 -> '1.5 KB'."""
+    if size < 1024:
+        return f"{int(size)} B"
+    for unit in ('KB', 'MB', 'GB'):
+        size /= 1024
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}"
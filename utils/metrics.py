@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds (LLM calls and renders of large plans run long)
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES = tuple(2 ** p for p in range(10, 27, 2))   # 1 KiB .. 64 MiB
+COUNTS = (0, 1, 2, 3, 5, 10)
+
+# name -> (kind, help, buckets)
+METRICS = {
+    'llm_request_seconds': ('histogram', "LLM call latency per attempt", SECONDS),
+    'llm_attempts': ('histogram', "LLM attempts needed per user request", COUNTS),
+    'llm_in_flight': ('gauge', "LLM requests currently in flight", None),
+    'llm_stream_aborts_total': ('counter', "LLM streams cut short by a rejected room", None),
+    'validation_seconds': ('histogram', "validate_and_fill duration", SECONDS),
+    'validation_failures_total': ('counter', "Validation failures by rule", None),
+    'spec_repairs_total': ('counter', "Local repairs of invalid specs by result", None),
+    'llm_calls_saved_total': ('counter', "LLM retries avoided by local spec repair", None),
+    'solver_seconds': ('histogram', "Local layout solver time including validation", SECONDS),
+    'solver_plans_total': ('counter', "Plans made by the local solver, by reason", None),
+    'variant_candidates_total': ('counter', "Layout variant candidates by result", None),
+    'generation_queue_seconds': ('histogram', "Time a job waited for a free worker", SECONDS),
+    'generation_seconds': ('histogram', "Worker time per generation stage", SECONDS),
+    'generation_queue_depth': ('gauge', "Jobs waiting for a generation worker", None),
+    'generation_in_flight': ('gauge', "Jobs running in generation workers", None),
+    'jobs_queued': ('gauge', "Pipeline jobs waiting in the scheduler", None),
+    'jobs_running': ('gauge', "Pipeline jobs running", None),
+    'jobs_rejected_total': ('counter', "Pipeline jobs rejected or replaced, by reason", None),
+    'artifact_bytes': ('histogram', "Size of generated artifacts", BYTES),
+    'artifact_cache_total': ('counter', "Artifact cache lookups by result", None),
+    'artifact_store_bytes': ('gauge', "Bytes held in the artifact store", None),
+    'artifact_evictions_total': ('counter', "Artifact entries removed by the reaper, by reason", None),
+    'upload_seconds': ('histogram', "Telegram upload time per file", SECONDS),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """In-process counters, gauges and histograms in Prometheus text format.
+
+    When disabled every call returns right away, so instrumentation can stay
+    in hot paths.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[Labels, float]] = {}
+        self._hists: Dict[str, Dict[Labels, list]] = {}
+
+    @staticmethod
+    def _labels(labels) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = self._labels(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def dec(self, name: str, value: float = 1, **labels):
+        self.inc(name, -value, **labels)
+
+    def set(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._values.setdefault(name, {})[self._labels(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        buckets = METRICS[name][2]
+        key = self._labels(labels)
+        with self._lock:
+            series = self._hists.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            hist[0][bisect_left(buckets, value)] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the duration of the ``with`` block (even if it raises)."""
+        if not self.enabled:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in METRICS.items():
+                values = self._values.get(name)
+                hists = self._hists.get(name)
+                if not values and not hists:
+                    continue
+                full = f"{settings.METRICS_PREFIX}{name}"
+                lines.append(f"# HELP {full} {help_text}")
+                lines.append(f"# TYPE {full} {kind}")
+                for key, value in sorted((values or {}).items()):
+                    lines.append(f"{full}{_fmt_labels(key)} {value:g}")
+                for key, (counts, total, count) in sorted((hists or {}).items()):
+                    acc = 0
+                    for bound, n in zip(list(buckets) + ['+Inf'], counts):
+                        acc += n
+                        le = bound if bound == '+Inf' else f"{bound:g}"
+                        lines.append(f"{full}_bucket{_fmt_labels(key + (('le', le),))} {acc}")
+                    lines.append(f"{full}_sum{_fmt_labels(key)} {total:g}")
+                    lines.append(f"{full}_count{_fmt_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _fmt_labels(key: Labels) -> str:
+    if not key:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in key)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + '}'
+
+
+async def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None):
+    """Serve ``/metrics`` on a local aiohttp server; returns the runner to clean up."""
+    from aiohttp import web
+
+    async def handle(_request):
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host or settings.METRICS_HOST, port or settings.METRICS_PORT)
+    await site.start()
+    logger.info(f"Metrics endpoint on http://{host or settings.METRICS_HOST}:{port or settings.METRICS_PORT}/metrics")
+    return runner
+
+
+metrics = Metrics(enabled=settings.METRICS_PORT > 0)
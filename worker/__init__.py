@@ -0,0 +1,5 @@
+from .executor import GenerationExecutor, JobTimeout, WorkerCrashed, warm_up
+from .scheduler import JobExpired, JobScheduler, JobSuperseded, QueueFull
+
+generation_executor = GenerationExecutor()
+job_scheduler = JobScheduler()
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from config import settings
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerCrashed(RuntimeError):
+    """The worker process died while running a job."""
+
+
+class JobTimeout(TimeoutError):
+    """The job did not finish within its time budget."""
+
+
+def warm_up():
+    """Import the heavy drawing stack once per worker process (also a pool initializer)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+    import ezdxf  # noqa: F401
+    import dxf_gen.generator  # noqa: F401
+    import preview.renderer  # noqa: F401
+
+
+def _worker_main(conn):
+    warm_up()
+    conn.send(('ready', None))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        fn, args, kwargs = job
+        try:
+            conn.send(('ok', fn(*args, **kwargs)))
+        except Exception as e:
+            tb = traceback.format_exc()
+            try:
+                conn.send(('error', (e, tb)))
+            except Exception:
+                # Exception itself is not picklable
+                conn.send(('error', (RuntimeError(repr(e)), tb)))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def wait_ready(self):
+        status, _ = self.conn.recv()
+        return status == 'ready'
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self, grace: float = 5.0):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(grace)
+        self.kill()
+
+
+class GenerationExecutor:
+    """Pool of warm worker processes for CPU-heavy DXF/PNG generation.
+
+    Every worker owns its own pipe, so a job that hangs or crashes only takes
+    down its own process; the executor kills it and spawns a replacement.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: Optional[float] = None):
+        self.workers = workers or settings.GEN_WORKERS
+        self.timeout = timeout or settings.GEN_JOB_TIMEOUT
+        self._ctx = multiprocessing.get_context('spawn')
+        self._idle: Optional[asyncio.Queue] = None
+        self._all: List[_Worker] = []
+        self._io: Optional[ThreadPoolExecutor] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._closed = False
+
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
+
+    async def start(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.started:
+                return
+            self._closed = False
+            # One blocking recv per busy worker plus one per respawn
+            self._io = ThreadPoolExecutor(max_workers=self.workers * 2, thread_name_prefix='gen-io')
+            idle = asyncio.Queue()
+            spawned = await asyncio.gather(*[self._spawn() for _ in range(self.workers)])
+            for w in spawned:
+                idle.put_nowait(w)
+            self._idle = idle
+            logger.info(f"Generation executor started with {self.workers} workers")
+
+    async def _spawn(self) -> _Worker:
+        loop = asyncio.get_running_loop()
+        worker = _Worker(self._ctx)
+        self._all.append(worker)
+        await loop.run_in_executor(self._io, worker.wait_ready)
+        return worker
+
+    async def _replace(self, worker: _Worker):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._io, worker.kill)
+        if worker in self._all:
+            self._all.remove(worker)
+        if self._closed:
+            return
+        try:
+            self._idle.put_nowait(await self._spawn())
+        except Exception:
+            logger.exception("Failed to respawn generation worker")
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` in a worker and await its result.
+
+        ``fn`` must be a picklable module-level function.
+        """
+        if not self.started:
+            await self.start()
+        if self._closed:
+            raise RuntimeError("Generation executor is shut down")
+        loop = asyncio.get_running_loop()
+        budget = timeout or self.timeout
+        queued = time.perf_counter()
+        metrics.inc('generation_queue_depth')
+        try:
+            worker = await self._idle.get()
+        finally:
+            metrics.dec('generation_queue_depth')
+        metrics.observe('generation_queue_seconds', time.perf_counter() - queued)
+        metrics.inc('generation_in_flight')
+        try:
+            worker.conn.send((fn, args, kwargs))
+            status, payload = await asyncio.wait_for(
+                loop.run_in_executor(self._io, worker.conn.recv), budget
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Generation job {fn.__name__} timed out, restarting worker")
+            asyncio.ensure_future(self._replace(worker))
+            raise JobTimeout(f"{fn.__name__} exceeded {budget:g}s")
+        except (EOFError, OSError):
+            logger.error(f"Generation worker died while running {fn.__name__}, restarting")
+            asyncio.ensure_future(self._replace(worker))
+            raise WorkerCrashed(f"worker died while running {fn.__name__}")
+        except asyncio.CancelledError:
+            # The worker is still busy with an abandoned job
+            asyncio.ensure_future(self._replace(worker))
+            raise
+        finally:
+            metrics.dec('generation_in_flight')
+
+        self._idle.put_nowait(worker)
+        if status == 'error':
+            exc, tb = payload
+            logger.error(f"Generation job {fn.__name__} failed:\n{tb}")
+            raise exc
+        return payload
+
+    async def shutdown(self):
+        if not self.started:
+            return
+        self._closed = True
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self._io, w.stop) for w in self._all], return_exceptions=True)
+        self._all.clear()
+        self._idle = None
+        self._io.shutdown(wait=False)
+        logger.info("Generation executor stopped")
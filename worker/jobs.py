@@ -0,0 +1,50 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from dxf_gen.generator import create_plan
+from preview.renderer import compose_previews, render_preview
+
+
+def build_artifacts(spec: Dict[str, Any], dxf_path: str, png_path: str) -> Tuple[str, str, Dict[str, float]]:
+    """Worker job: write the DXF plan and its PNG preview for a validated spec.
+
+    Also returns the seconds spent per stage so the bot process can record them.
+    """
+    t0 = time.perf_counter()
+    create_plan(spec, dxf_path)
+    t1 = time.perf_counter()
+    render_preview(spec, png_path)
+    t2 = time.perf_counter()
+    return dxf_path, png_path, {'dxf': t1 - t0, 'png': t2 - t1}
+
+
+def render_artifacts(spec: Dict[str, Any], dxf_format: Optional[str] = None,
+                     name: str = 'plan') -> Tuple[bytes, bytes, Dict[str, float]]:
+    """Worker job: like ``build_artifacts`` but returns the file contents, no disk I/O."""
+    t0 = time.perf_counter()
+    dxf = create_plan(spec, fmt=dxf_format, arcname=f"{name}.dxf")
+    t1 = time.perf_counter()
+    png = render_preview(spec)
+    t2 = time.perf_counter()
+    return dxf, png, {'dxf': t1 - t0, 'png': t2 - t1}
+
+
+def render_plan_dxf(spec: Dict[str, Any], dxf_format: Optional[str] = None,
+                    name: str = 'plan') -> Tuple[bytes, float]:
+    """Worker job: the DXF alone (all floors), run alongside the per-floor previews."""
+    t0 = time.perf_counter()
+    dxf = create_plan(spec, fmt=dxf_format, arcname=f"{name}.dxf")
+    return dxf, time.perf_counter() - t0
+
+
+def render_floor_preview(floor: Dict[str, Any]) -> Tuple[bytes, float]:
+    """Worker job: PNG preview of one floor (an item of ``floor_plans``)."""
+    t0 = time.perf_counter()
+    png = render_preview(floor)
+    return png, time.perf_counter() - t0
+
+
+def compose_floor_previews(pngs: List[bytes]) -> Tuple[bytes, float]:
+    """Worker job: tile the per-floor previews into the composite the user gets."""
+    t0 = time.perf_counter()
+    png = compose_previews(pngs)
+    return png, time.perf_counter() - t0
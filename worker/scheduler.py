@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import math
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+from config import settings
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(RuntimeError):
+    """The waiting queue is at capacity; the job was not accepted."""
+
+
+class JobExpired(TimeoutError):
+    """The job could not start before its deadline."""
+
+
+class JobSuperseded(Exception):
+    """The same user submitted a newer job that replaced this one."""
+
+
+class _Job:
+    __slots__ = ('user_id', 'factory', 'future', 'deadline', 'task')
+
+    def __init__(self, user_id, factory, future, deadline):
+        self.user_id = user_id
+        self.factory = factory
+        self.future = future
+        self.deadline = deadline
+        self.task: Optional[asyncio.Task] = None
+
+
+class JobScheduler:
+    """Admission control in front of the LLM + generation pipeline.
+
+    At most ``concurrency`` jobs run at once and at most ``max_queue`` wait.
+    Each user has a single job: a new submission replaces their queued job
+    in place, or cancels their running one and takes over its slot. Jobs
+    that cannot start before their deadline are rejected, up front when the
+    estimated wait is already too long, or when they reach the head of the
+    queue too late.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, max_queue: Optional[int] = None,
+                 deadline: Optional[float] = None):
+        self.concurrency = concurrency or settings.JOB_CONCURRENCY
+        self.max_queue = max_queue if max_queue is not None else settings.JOB_QUEUE_SIZE
+        self.deadline = deadline or settings.JOB_DEADLINE
+        self._queue: Deque[_Job] = deque()
+        self._queued: Dict[Hashable, _Job] = {}
+        self._running: Dict[Hashable, _Job] = {}
+        self._active = 0
+        # Moving average of job run time, used to estimate queue waits
+        self._avg_run: Optional[float] = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running(self) -> int:
+        return self._active
+
+    def position(self, user_id: Hashable) -> int:
+        """1-based queue position of the user's job, 0 when not queued."""
+        job = self._queued.get(user_id)
+        return self._queue.index(job) + 1 if job else 0
+
+    def estimated_wait(self, position: int) -> float:
+        if not self._avg_run or position <= 0:
+            return 0.0
+        return math.ceil(position / self.concurrency) * self._avg_run
+
+    async def submit(self, user_id: Hashable, factory: Callable[[], Awaitable[Any]],
+                     on_queued: Optional[Callable[[int], Awaitable[Any]]] = None) -> Any:
+        """Run ``factory()`` under the limits and return its result.
+
+        ``on_queued(position)`` is awaited when the job has to wait.
+        Raises QueueFull, JobExpired or JobSuperseded.
+        """
+        loop = asyncio.get_running_loop()
+        job = _Job(user_id, factory, loop.create_future(), loop.time() + self.deadline)
+
+        previous = self._queued.get(user_id)
+        if previous is not None:
+            # Keep the user's place in line, run the newer request instead
+            self._queue[self._queue.index(previous)] = job
+            self._queued[user_id] = job
+            self._reject(previous, JobSuperseded("replaced by a newer request"), 'superseded')
+        else:
+            running = self._running.get(user_id)
+            if running is not None and running.task is not None:
+                # The newer request takes over the slot of the one it cancels
+                running.task.cancel()
+                self._start(job)
+            elif self._active < self.concurrency and not self._queue:
+                self._start(job)
+            else:
+                position = len(self._queue) + 1
+                if len(self._queue) >= self.max_queue:
+                    metrics.inc('jobs_rejected_total', reason='queue_full')
+                    raise QueueFull(f"{len(self._queue)} jobs already waiting")
+                if self.estimated_wait(position) > self.deadline:
+                    metrics.inc('jobs_rejected_total', reason='deadline')
+                    raise JobExpired(f"estimated wait {self.estimated_wait(position):.0f}s "
+                                     f"exceeds {self.deadline:g}s")
+                self._queue.append(job)
+                self._queued[user_id] = job
+                metrics.set('jobs_queued', len(self._queue))
+                if on_queued is not None:
+                    try:
+                        await on_queued(position)
+                    except Exception:
+                        logger.exception("Queue position callback failed")
+
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            # The caller gave up; free the slot or the queue entry
+            self._cancel(job)
+            raise
+
+    def _start(self, job: _Job):
+        self._active += 1
+        self._running[job.user_id] = job
+        metrics.set('jobs_running', self._active)
+        job.task = asyncio.ensure_future(self._run(job))
+
+    async def _run(self, job: _Job):
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        try:
+            result = await job.factory()
+        except asyncio.CancelledError:
+            if not job.future.done():
+                job.future.set_exception(JobSuperseded("cancelled by a newer request"))
+                metrics.inc('jobs_rejected_total', reason='superseded')
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+            elapsed = loop.time() - t0
+            self._avg_run = elapsed if self._avg_run is None else 0.8 * self._avg_run + 0.2 * elapsed
+        finally:
+            self._active -= 1
+            if self._running.get(job.user_id) is job:
+                del self._running[job.user_id]
+            metrics.set('jobs_running', self._active)
+            self._pump()
+
+    def _pump(self):
+        """Start queued jobs while there are free slots, dropping expired ones."""
+        now = asyncio.get_running_loop().time()
+        while self._queue and self._active < self.concurrency:
+            job = self._queue.popleft()
+            del self._queued[job.user_id]
+            if now > job.deadline:
+                self._reject(job, JobExpired("waited past its deadline"), 'deadline')
+                continue
+            self._start(job)
+        metrics.set('jobs_queued', len(self._queue))
+
+    def _cancel(self, job: _Job):
+        if self._queued.get(job.user_id) is job:
+            self._queue.remove(job)
+            del self._queued[job.user_id]
+            metrics.set('jobs_queued', len(self._queue))
+        elif job.task is not None and not job.task.done():
+            job.task.cancel()
+
+    def _reject(self, job: _Job, exc: Exception, reason: str):
+        metrics.inc('jobs_rejected_total', reason=reason)
+        if not job.future.done():
+            job.future.set_exception(exc)